@@ -0,0 +1,341 @@
+"""Ограничение параллельности запросов к AI провайдерам."""
+
+import asyncio
+import functools
+import inspect
+import logging
+import random
+import re
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+# Длительности в заголовках OpenAI: "1s", "6m0s", "250ms"
+DURATION_PATTERN = re.compile(r'(\d+(?:\.\d+)?)(ms|s|m|h)')
+DURATION_UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """
+    Преобразует длительность из заголовков rate limit в секунды.
+
+    Args:
+        value: Строка вида "20", "1s", "6m0s" или "250ms"
+
+    Returns:
+        Количество секунд или None, если строку не удалось разобрать
+    """
+    if not value:
+        return None
+
+    try:
+        return float(value)
+    except ValueError:
+        pass
+
+    parts = DURATION_PATTERN.findall(value)
+    if not parts:
+        return None
+    return sum(float(number) * DURATION_UNITS[unit] for number, unit in parts)
+
+
+class AIMDLimiter:
+    """
+    Адаптивный ограничитель параллельных запросов (additive increase / multiplicative decrease).
+
+    Пока задержка ответа не превышает целевую, лимит растет на alpha за каждый запрос;
+    при превышении задержки или сигнале перегрузки (429/502) лимит умножается на beta.
+    Задержка учитывается для одной попытки запроса, без повторов и пауз между ними.
+    Состояние привязано к одному event loop: все вызовы AI клиента выполняются в общем фоновом loop.
+    """
+
+    def __init__(self, name: str = 'llm', c_min: int = 1, c_max: int = 32,
+                 alpha: float = 0.5, beta: float = 0.5, latency_target_ms: int = 2000,
+                 initial: Optional[int] = None):
+        self.name = name
+        self.c_min = c_min
+        self.c_max = c_max
+        self.alpha = alpha
+        self.beta = beta
+        self.latency_target = latency_target_ms / 1000
+        # Старт с половины потолка: с c_min лимит долго разгонялся бы после каждого перезапуска
+        self.limit = float(initial if initial is not None else max(c_min, c_max // 2))
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._cond: Optional[asyncio.Condition] = None
+
+    def _get_cond(self) -> asyncio.Condition:
+        # Condition создается лениво, внутри работающего event loop
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    @property
+    def concurrency(self) -> int:
+        """Текущее допустимое количество параллельных запросов."""
+        return max(self.c_min, int(self.limit))
+
+    @asynccontextmanager
+    async def slot(self, measure_latency: bool = True) -> AsyncIterator[None]:
+        """
+        Занимает слот на время запроса и корректирует лимит по его задержке.
+        
+        Args:
+            measure_latency: Учитывать длительность слота как задержку запроса. Отключается
+                для потоковых ответов и вызовов с повторами внутри: их задержку либо не с чем
+                сравнивать, либо она записывается отдельно через record_latency
+        """
+        delay = self._paused_until - time.monotonic()
+        if delay > 0:
+            logger.info(f'{self.name}: пауза {delay:.1f} с по лимитам провайдера')
+            await asyncio.sleep(delay)
+
+        cond = self._get_cond()
+        async with cond:
+            await cond.wait_for(lambda: self._in_flight < self.concurrency)
+            self._in_flight += 1
+
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            if measure_latency:
+                self.record_latency(time.monotonic() - started)
+            async with cond:
+                self._in_flight -= 1
+                cond.notify_all()
+
+    def record_latency(self, latency: float) -> None:
+        """Корректирует лимит по задержке одной попытки запроса (в секундах)."""
+        if latency > self.latency_target:
+            self._decrease()
+        else:
+            self.limit = min(self.c_max, self.limit + self.alpha)
+
+    def _decrease(self) -> None:
+        self.limit = max(self.c_min, self.limit * self.beta)
+
+    def record_overload(self, retry_after: Optional[float] = None) -> None:
+        """
+        Сообщает о перегрузке провайдера (429/502).
+
+        Args:
+            retry_after: Через сколько секунд провайдер разрешает повторить запрос
+        """
+        self._decrease()
+        logger.warning(f'{self.name}: перегрузка провайдера, лимит снижен до {self.concurrency}')
+        if retry_after:
+            self.pause(retry_after)
+
+    def pause(self, seconds: float) -> None:
+        """Приостанавливает выдачу новых слотов на указанное время."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def update_from_headers(self, headers: Mapping[str, str]) -> None:
+        """
+        Учитывает заголовки rate limit ответа.
+
+        Если осталось меньше 10% запросов в окне, приостанавливает выдачу слотов
+        до сброса окна, не дожидаясь 429.
+        """
+        retry_after = parse_duration(headers.get('retry-after'))
+        if retry_after:
+            self.pause(retry_after)
+
+        try:
+            remaining = int(headers.get('x-ratelimit-remaining-requests', ''))
+            total = int(headers.get('x-ratelimit-limit-requests', ''))
+        except ValueError:
+            return
+
+        if total and remaining < total * 0.1:
+            reset = parse_duration(headers.get('x-ratelimit-reset-requests'))
+            if reset:
+                logger.info(f'{self.name}: осталось {remaining}/{total} запросов, пауза {reset:.1f} с')
+                self.pause(reset)
+
+    def get_state(self) -> dict:
+        """Возвращает текущее состояние для мониторинга."""
+        return {
+            'limit': self.concurrency,
+            'in_flight': self._in_flight,
+        }
+
+
+class SlidingWindowLimiter:
+    """
+    Локальный лимит запросов и токенов в минуту (RPM/TPM) по скользящему окну.
+
+    Запрос ждет на стороне клиента, пока в окне не освободится место,
+    вместо того чтобы получить 429 от провайдера.
+    """
+
+    WINDOW_SECONDS = 60.0
+
+    def __init__(self, name: str = 'llm', rpm: Optional[int] = None, tpm: Optional[int] = None):
+        self.name = name
+        self.rpm = rpm
+        self.tpm = tpm
+        self._events: deque[tuple[float, int]] = deque()
+        self._tokens = 0
+        self._lock: Optional[asyncio.Lock] = None
+
+    def _evict(self, now: float) -> None:
+        while self._events and self._events[0][0] <= now - self.WINDOW_SECONDS:
+            _, tokens = self._events.popleft()
+            self._tokens -= tokens
+
+    def _is_throttled(self, estimated_tokens: int) -> bool:
+        if self.rpm and len(self._events) >= self.rpm:
+            return True
+        # Одиночный запрос больше TPM все равно пропускаем, иначе он будет ждать вечно
+        if self.tpm and self._events and self._tokens + estimated_tokens > self.tpm:
+            return True
+        return False
+
+    async def wait_if_throttled(self, estimated_tokens: int = 0) -> None:
+        """
+        Ждет, пока запрос укладывается в лимиты окна, и регистрирует его.
+
+        Args:
+            estimated_tokens: Оценка токенов запроса (prompt + max_tokens)
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._evict(now)
+                if not self._is_throttled(estimated_tokens):
+                    break
+
+                delay = max(self._events[0][0] + self.WINDOW_SECONDS - now, 0.01)
+                logger.info(f'{self.name}: локальный лимит RPM/TPM, ожидание {delay:.1f} с')
+                await asyncio.sleep(delay)
+
+            self._events.append((time.monotonic(), estimated_tokens))
+            self._tokens += estimated_tokens
+
+
+def estimate_tokens(instructions: str, prompt: str, max_tokens: int) -> int:
+    """Грубая оценка токенов запроса: ~4 символа на токен плюс лимит ответа."""
+    return (len(instructions) + len(prompt)) // 4 + max_tokens
+
+
+class TransientProviderError(Exception):
+    """Временная ошибка провайдера (пустой ответ, перегрузка) - запрос можно повторить."""
+
+
+def backoff_delay(attempt: int, min_wait: float = 1, max_wait: float = 30) -> float:
+    """Экспоненциальная задержка со случайным jitter для попытки с номером attempt (с нуля)."""
+    return random.uniform(min_wait, min(max_wait, min_wait * 2 ** (attempt + 1)))
+
+
+def with_retry(retry_on: tuple[type[BaseException], ...], attempts: int = 4,
+               min_wait: float = 1, max_wait: float = 30) -> Callable:
+    """
+    Декоратор повтора вызова при временных ошибках.
+
+    Поддерживает как обычные функции, так и корутины. После исчерпания
+    попыток пробрасывает последнее исключение.
+
+    Args:
+        retry_on: Типы исключений, при которых вызов повторяется
+        attempts: Максимальное количество попыток
+        min_wait: Минимальная задержка между попытками в секундах
+        max_wait: Максимальная задержка между попытками в секундах
+    """
+    def decorator(func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                for attempt in range(attempts):
+                    try:
+                        return await func(*args, **kwargs)
+                    except retry_on as e:
+                        if attempt == attempts - 1:
+                            raise
+                        delay = backoff_delay(attempt, min_wait, max_wait)
+                        logger.warning(f'{func.__name__}: попытка {attempt + 1} не удалась ({e}), повтор через {delay:.1f} с')
+                        await asyncio.sleep(delay)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            for attempt in range(attempts):
+                try:
+                    return func(*args, **kwargs)
+                except retry_on as e:
+                    if attempt == attempts - 1:
+                        raise
+                    delay = backoff_delay(attempt, min_wait, max_wait)
+                    logger.warning(f'{func.__name__}: попытка {attempt + 1} не удалась ({e}), повтор через {delay:.1f} с')
+                    time.sleep(delay)
+        return wrapper
+
+    return decorator
+
+
+class CircuitBreaker:
+    """
+    Предохранитель для провайдера.
+
+    После fail_threshold подряд неудачных запросов провайдер пропускается
+    на reset_timeout секунд, затем пропускается одна пробная попытка.
+    """
+
+    def __init__(self, name: str, fail_threshold: int = 5, reset_timeout: float = 60):
+        self.name = name
+        self.fail_threshold = fail_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self._opened_at: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def allow(self) -> bool:
+        """Можно ли отправлять запрос провайдеру."""
+        return self.state != 'open'
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._opened_at = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.failures >= self.fail_threshold:
+            if self._opened_at is None:
+                logger.warning(f'{self.name}: {self.failures} ошибок подряд, провайдер отключен на {self.reset_timeout} с')
+            self._opened_at = time.monotonic()
+
+    def get_state(self) -> dict:
+        """Возвращает текущее состояние для мониторинга."""
+        return {
+            'state': self.state,
+            'failures': self.failures,
+        }
+
+
+class SuccessRate:
+    """Скользящая (EWMA) доля успешных запросов к провайдеру."""
+
+    def __init__(self, alpha: float = 0.1):
+        self.alpha = alpha
+        self.value = 1.0
+
+    def update(self, success: bool) -> None:
+        self.value = (1 - self.alpha) * self.value + self.alpha * (1.0 if success else 0.0)
+
+    @property
+    def failure_rate(self) -> float:
+        return 1.0 - self.value
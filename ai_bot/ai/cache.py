@@ -0,0 +1,218 @@
+"""Кэш ответов LLM для повторных запросов с одинаковыми параметрами."""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Protocol
+
+from ai_bot.config import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import redis
+    HAS_REDIS = True
+except ImportError:
+    HAS_REDIS = False
+    logger.warning("redis not available, LLM cache will use in-memory backend")
+
+
+class CacheBackend(Protocol):
+    """Интерфейс хранилища для кэша ответов."""
+
+    def get(self, key: str) -> Optional[str]:
+        ...
+
+    def set(self, key: str, value: str, ttl: Optional[int] = None) -> None:
+        ...
+
+    def delete(self, key: str) -> None:
+        ...
+
+    def clear(self) -> None:
+        ...
+
+    def incr_stat(self, name: str) -> None:
+        ...
+
+    def get_stats(self) -> dict[str, int]:
+        ...
+
+
+class MemoryCache:
+    """
+    LRU-кэш в памяти процесса с поддержкой TTL (для разработки).
+    
+    Вызывается из потоков asyncio.to_thread, поэтому операции с OrderedDict защищены блокировкой.
+    """
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._data: OrderedDict[str, tuple[str, Optional[float]]] = OrderedDict()
+        self._stats = {'hits': 0, 'misses': 0}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+
+            value, expires_at = item
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                return None
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl: Optional[int] = None) -> None:
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def incr_stat(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def get_stats(self) -> dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
+
+
+class RedisCache:
+    """Кэш в Redis, общий для API и Celery воркеров (счетчики попаданий тоже общие)."""
+
+    def __init__(self, client: "redis.Redis", prefix: str = 'llm_cache:', stats_key: str = 'llm_cache_stats'):
+        self.client = client
+        self.prefix = prefix
+        self.stats_key = stats_key
+
+    def get(self, key: str) -> Optional[str]:
+        return self.client.get(self.prefix + key)
+
+    def set(self, key: str, value: str, ttl: Optional[int] = None) -> None:
+        self.client.set(self.prefix + key, value, ex=ttl)
+
+    def delete(self, key: str) -> None:
+        self.client.delete(self.prefix + key)
+
+    def clear(self) -> None:
+        keys = list(self.client.scan_iter(match=f'{self.prefix}*'))
+        if keys:
+            self.client.delete(*keys)
+
+    def incr_stat(self, name: str) -> None:
+        self.client.hincrby(self.stats_key, name, 1)
+
+    def get_stats(self) -> dict[str, int]:
+        stats = self.client.hgetall(self.stats_key)
+        return {name: int(stats.get(name, 0)) for name in ('hits', 'misses')}
+
+
+class LLMCache:
+    """
+    Кэш ответов LLM поверх произвольного хранилища.
+
+    Ошибки хранилища не пробрасываются наружу: при недоступности кэша
+    запрос просто уходит к провайдеру. Методы синхронные (Redis клиент блокирующий),
+    из async кода их нужно вызывать через asyncio.to_thread.
+    """
+
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+
+    @staticmethod
+    def make_key(model: str, instructions: str, prompt: str, temperature: float, max_tokens: int) -> str:
+        """Формирует ключ кэша как sha256 от параметров запроса."""
+        payload = json.dumps({
+            'model': model,
+            'instructions': instructions,
+            'prompt': prompt,
+            'temperature': temperature,
+            'max_tokens': max_tokens,
+        }, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            logger.warning(f'LLM cache get error: {e}')
+            value = None
+
+        try:
+            self.backend.incr_stat('misses' if value is None else 'hits')
+        except Exception as e:
+            logger.warning(f'LLM cache stats error: {e}')
+        return value
+
+    def set(self, key: str, value: str, ttl: Optional[int] = None) -> None:
+        try:
+            self.backend.set(key, value, ttl)
+        except Exception as e:
+            logger.warning(f'LLM cache set error: {e}')
+
+    def delete(self, key: str) -> None:
+        try:
+            self.backend.delete(key)
+        except Exception as e:
+            logger.warning(f'LLM cache delete error: {e}')
+
+    def clear(self) -> None:
+        try:
+            self.backend.clear()
+        except Exception as e:
+            logger.warning(f'LLM cache clear error: {e}')
+
+    def get_stats(self) -> dict:
+        """Возвращает статистику попаданий для эндпоинта /stats/ (для Redis - по всем процессам)."""
+        try:
+            stats = self.backend.get_stats()
+        except Exception as e:
+            logger.warning(f'LLM cache stats error: {e}')
+            stats = {}
+        return {
+            'backend': type(self.backend).__name__,
+            **stats,
+        }
+
+
+def _create_backend() -> CacheBackend:
+    """Выбирает Redis, если брокер Celery указывает на Redis, иначе память процесса."""
+    broker_url = settings.CELERY_BROKER_URL
+    if HAS_REDIS and broker_url.startswith(('redis://', 'rediss://')):
+        try:
+            client = redis.Redis.from_url(broker_url, decode_responses=True, socket_timeout=1)
+            client.ping()
+            logger.info('LLM cache uses Redis backend')
+            return RedisCache(client)
+        except redis.RedisError as e:
+            logger.warning(f'Redis недоступен для кэша LLM, используем память: {e}')
+
+    return MemoryCache()
+
+
+_llm_cache: Optional[LLMCache] = None
+
+
+def get_llm_cache() -> LLMCache:
+    """Возвращает общий экземпляр кэша (создается при первом обращении)."""
+    global _llm_cache
+    if _llm_cache is None:
+        _llm_cache = LLMCache(_create_backend())
+    return _llm_cache
@@ -1,27 +1,160 @@
+import asyncio
 import logging
+import re
 
-from ai_bot.ai.openai_client import make_request
+from ai_bot.ai.openai_client import make_request, make_request_many, make_batch_request
+from ai_bot.ai.semantic_cache import get_semantic_cache
 from ai_bot.db.models import NewsItem, Keyword
 
 logger = logging.getLogger(__name__)
 
-INSTRUCTIONS = """
+# Тематические emoji для fallback постов: одна регулярка, тема определяется по группе
+TOPIC_PATTERN = re.compile(r'(?P<tech>технолог|программ)|(?P<games>игр)|(?P<business>бизнес)', re.IGNORECASE)
+TOPIC_EMOJI = {
+    'tech': "💻",  # Технологии
+    'games': "🎮",  # Игры
+    'business': "💼",  # Бизнес
+}
+DEFAULT_EMOJI = "📰"  # Новости
+
+# Системный промпт неизменен и всегда идет первым сообщением: OpenAI кэширует
+# одинаковые префиксы длиннее 1024 токенов, поэтому промпт содержит подробные
+# правила и примеры. Строку нельзя форматировать - любое изменение сбрасывает кэш.
+# Общая часть системных промптов: роль, правила оформления 1-12, подбор emoji и примеры
+POST_RULES = """
 Вы являетесь профессиональным новостным агентом, специализирующимся на создании привлекательных и информативных новостей.
 Сделай краткое, интересное описание новости для Telegram-канала, добавь emoji, call to action
+
+Правила оформления поста:
+1. Первая строка - цепляющий заголовок с одним тематическим emoji в начале. Заголовок не длиннее 90 символов.
+2. Затем пустая строка и 2-4 коротких предложения о сути новости: что произошло, почему это важно, кого касается.
+3. Пиши простым живым языком, без канцелярита и без оценочных суждений, которых нет в исходной новости.
+4. Не выдумывай факты, цифры, даты, имена и цитаты. Используй только то, что есть в данных новости.
+5. Если в данных есть ссылка (Link), добавь ее в конце поста отдельной строкой после фразы "Подробнее:".
+6. Заверши пост коротким призывом к действию: предложи обсудить в комментариях, поделиться мнением или сохранить пост.
+7. Добавь в последней строке 2-3 хэштега по теме новости на русском языке, в нижнем регистре.
+8. Используй не больше 4 emoji на весь пост. Не ставь emoji подряд и не заменяй ими слова.
+9. Не используй Markdown-разметку (звездочки, решетки для заголовков, подчеркивания) - пост публикуется как обычный текст.
+10. Общая длина поста - не больше 700 символов.
+11. Не упоминай, что текст сгенерирован, и не обращайся к читателю как ассистент ("Конечно!", "Вот пост:" и т.п.).
+12. Если новость рекламная или не содержит полезной информации, все равно напиши нейтральный информативный пост без рекламных призывов.
 """
 
+POST_EXAMPLES = """
+Подбор emoji по теме:
+- технологии, программирование, IT - 💻 🤖 ⚙️
+- наука и исследования - 🔬 🧪 🚀
+- игры и развлечения - 🎮 🕹️ 🎬
+- бизнес, финансы, рынки - 💼 📈 💰
+- безопасность и утечки данных - 🔐 ⚠️
+- общество и события - 📰 🌍
+- образование и карьера - 🎓 📚
 
-def generate_posts(news: NewsItem) -> str | None:
-    """
-    Генерирует пост для новости с использованием AI.
-    
-    Args:
-        news: Объект новости для генерации поста
-        
-    Returns:
-        Сгенерированный текст поста или None в случае ошибки
-    """
-    prompt = f"""
+Пример 1.
+Данные новости:
+Source: habr
+News: Вышел Python 3.13 с экспериментальным режимом без GIL
+Summary: Новая версия языка добавляет сборку без глобальной блокировки интерпретатора и JIT-компилятор.
+Link: https://habr.com/ru/articles/000001/
+
+Пост:
+💻 Python 3.13 учится работать без GIL
+
+Вышла новая версия Python. Главное изменение - экспериментальная сборка без глобальной блокировки интерпретатора: потоки смогут по-настоящему выполняться параллельно. Еще в релизе появился JIT-компилятор, который в будущем должен ускорить код.
+
+Подробнее: https://habr.com/ru/articles/000001/
+
+А вы уже пробовали новую версию? Делитесь впечатлениями в комментариях 👇
+#python #программирование #новости
+
+Пример 2.
+Данные новости:
+Source: tg_free_gaming
+News: В Steam бесплатно раздают инди-хит на выходных
+Summary: До понедельника игру можно добавить в библиотеку и оставить навсегда.
+Link: https://t.me/free_gaming/000002
+
+Пост:
+🎮 Инди-хит бесплатно в Steam
+
+До понедельника игру можно забрать в библиотеку Steam и оставить себе навсегда. Отличный повод пополнить коллекцию на выходных.
+
+Подробнее: https://t.me/free_gaming/000002
+
+Сохраняйте пост, чтобы не пропустить раздачу, и расскажите друзьям!
+#игры #steam #халява
+
+Пример 3.
+Данные новости:
+Source: tproger
+News: Исследование: компании чаще нанимают разработчиков с опытом в ИИ
+Summary: Число вакансий с требованием опыта работы с ИИ выросло за год почти вдвое.
+Link: https://tproger.ru/news/000003
+
+Пост:
+📈 Опыт с ИИ стал конкурентным преимуществом
+
+По данным исследования, за год число вакансий для разработчиков с требованием опыта работы с ИИ выросло почти вдвое. Работодатели все чаще ждут, что инженер умеет встраивать модели в продукты.
+
+Подробнее: https://tproger.ru/news/000003
+
+Как думаете, стоит ли прокачивать навыки в ИИ уже сейчас? Пишите в комментариях 💬
+#карьера #ии #it
+
+Пример 4.
+Данные новости:
+Source: habr
+News: В популярной библиотеке для работы с архивами нашли критическую уязвимость
+Summary: Ошибка позволяет выполнить произвольный код при распаковке специально подготовленного архива. Разработчики уже выпустили исправление и рекомендуют обновиться.
+Link: https://habr.com/ru/articles/000004/
+
+Пост:
+🔐 Критическая уязвимость в библиотеке для архивов
+
+В популярной библиотеке для распаковки архивов нашли ошибку, из-за которой специально подготовленный архив может запустить на компьютере чужой код. Исправление уже вышло - разработчики советуют обновиться как можно скорее.
+
+Подробнее: https://habr.com/ru/articles/000004/
+
+Проверьте зависимости своих проектов и поделитесь постом с коллегами ⚠️
+#безопасность #уязвимости #разработка
+
+Пример того, как поступать с неполными данными.
+Данные новости:
+Source: unknown
+News: Компания представила новый смартфон
+Summary: Без описания
+Link: None
+
+Пост:
+📱 Компания представила новый смартфон
+
+Производитель показал новую модель смартфона. Подробности о характеристиках и цене пока не раскрываются - следим за новостями.
+
+Как думаете, чем новинка сможет удивить? Пишите в комментариях 💬
+#смартфоны #технологии
+
+Обрати внимание: когда ссылки нет (Link: None), строку "Подробнее:" не добавляй, а когда описания нет, не придумывай детали.
+"""
+
+INSTRUCTIONS = POST_RULES + """13. Отвечай только текстом поста, без пояснений до или после него.
+""" + POST_EXAMPLES + """
+Теперь напиши пост по данным новости из следующего сообщения, строго соблюдая правила выше.
+"""
+
+# Системный промпт пакетной генерации (make_request_many): вместо правила "только текст поста"
+# и завершающей фразы про одну новость - описание JSON-ответа для нескольких новостей
+MANY_INSTRUCTIONS = POST_RULES + """13. Текст каждого поста - только сам пост, без пояснений до или после него.
+""" + POST_EXAMPLES + """
+Тебе передано несколько новостей, у каждой есть идентификатор (id).
+Напиши отдельный пост по данным каждой новости, строго соблюдая правила выше, и верни JSON-объект вида
+{"posts": [{"id": "<id новости>", "text": "<текст поста>"}]}.
+Ответ должен содержать только этот JSON-объект.
+"""
+
+
+def build_prompt(news: NewsItem) -> str:
+    """Формирует пользовательский запрос к AI по данным новости."""
+    return f"""
     Source: {news.source if news.source else 'unknown'}
     News: {news.title}
     Summary: {news.summary}
@@ -32,13 +165,60 @@ def generate_posts(news: NewsItem) -> str | None:
 
     """
 
+
+# Строка со ссылкой на источник, которую модель добавляет в пост (см. INSTRUCTIONS)
+LINK_LINE_RE = re.compile(r'^Подробнее:[^\n]*(\n|\Z)', re.MULTILINE)
+
+
+def relink_post(post_text: str, url: str | None) -> str:
+    """
+    Заменяет ссылку в строке "Подробнее: <url>" готового поста ссылкой на указанную новость.
+    
+    Args:
+        post_text: Текст поста (например, из семантического кэша)
+        url: URL новости или None, если ссылки быть не должно
+        
+    Returns:
+        Текст поста со ссылкой на url
+    """
+    if not url:
+        return re.sub(r'\n{3,}', '\n\n', LINK_LINE_RE.sub('', post_text)).rstrip()
+
+    text, count = LINK_LINE_RE.subn(lambda match: f'Подробнее: {url}{match.group(1)}', post_text)
+    return text if count else f'{post_text.rstrip()}\n\nПодробнее: {url}'
+
+
+async def generate_posts(news: NewsItem) -> str | None:
+    """
+    Генерирует пост для новости с использованием AI.
+    
+    Args:
+        news: Объект новости для генерации поста
+        
+    Returns:
+        Сгенерированный текст поста или None в случае ошибки
+    """
+    prompt = build_prompt(news)
+
     logger.info(f'Генерация поста для новости: {news.id}')
 
+    # Перепечатки одной новости разными источниками обслуживаем из семантического кэша
+    semantic_cache = get_semantic_cache()
+    cache_query = f"{news.title} {(news.summary or '')[:200]}"
+    if semantic_cache:
+        post_text = await asyncio.to_thread(semantic_cache.lookup, cache_query)
+        if post_text:
+            logger.info(f'Пост для новости {news.id} взят из семантического кэша')
+            # Пост был сгенерирован для другой перепечатки: ссылка должна вести на эту новость
+            return relink_post(post_text, news.url)
+
     # Пытаемся использовать OpenAI
-    post_text = make_request(INSTRUCTIONS, prompt)
+    post_text = await make_request(INSTRUCTIONS, prompt)
 
     if post_text:
         logger.info('Пост сгенерирован через OpenAI')
+        if semantic_cache:
+            await asyncio.to_thread(semantic_cache.add, cache_query, post_text)
         return post_text
 
     # Fallback: простая генерация без AI
@@ -53,6 +233,45 @@ def generate_posts(news: NewsItem) -> str | None:
     return None
 
 
+async def generate_posts_many(news_items: list[NewsItem]) -> dict[str, str]:
+    """
+    Генерирует посты для набора новостей сразу, объединяя их в общие запросы к AI.
+
+    Новости, для которых пакетный ответ не содержит поста, генерируются по одной.
+
+    Args:
+        news_items: Список новостей для генерации
+
+    Returns:
+        Словарь ID новости -> текст поста
+    """
+    items = [(news.id, MANY_INSTRUCTIONS, build_prompt(news)) for news in news_items]
+    results = await make_request_many(items)
+
+    for news in news_items:
+        if news.id not in results:
+            post_text = await generate_posts(news)
+            if post_text:
+                results[news.id] = post_text
+
+    return results
+
+
+async def generate_posts_batch(news_items: list[NewsItem]) -> str | None:
+    """
+    Отправляет генерацию постов для набора новостей в OpenAI Batch API.
+
+    Args:
+        news_items: Список новостей для генерации
+
+    Returns:
+        ID батча в OpenAI или None в случае ошибки
+    """
+    items = [(news.id, INSTRUCTIONS, build_prompt(news)) for news in news_items]
+    logger.info(f'Отправка батча генерации для {len(items)} новостей')
+    return await make_batch_request(items)
+
+
 def generate_fallback_post(news: NewsItem) -> str:
     """
     Fallback генерация поста без AI.
@@ -68,13 +287,8 @@ def generate_fallback_post(news: NewsItem) -> str:
             summary += "..."
 
         # Добавляем emoji и call to action
-        emoji = "📰"  # Новости
-        if "технолог" in (news.title or "").lower() or "программ" in (news.title or "").lower():
-            emoji = "💻"  # Технологии
-        elif "игр" in (news.title or "").lower():
-            emoji = "🎮"  # Игры
-        elif "бизнес" in (news.title or "").lower():
-            emoji = "💼"  # Бизнес
+        match = TOPIC_PATTERN.search(news.title or "")
+        emoji = TOPIC_EMOJI[match.lastgroup] if match else DEFAULT_EMOJI
 
         # Формируем пост
         post_parts = [
@@ -1,32 +1,217 @@
+import asyncio
+import io
+import json
 import logging
+import threading
+import time
+from collections.abc import AsyncIterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 import httpx
 import sys
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-from openai import OpenAI, RateLimitError, OpenAIError
+from openai import (
+    AsyncOpenAI, RateLimitError, APIStatusError, APITimeoutError, APIConnectionError, InternalServerError, OpenAIError
+)
 
 from ai_bot.config import settings
+from ai_bot.ai.cache import LLMCache, get_llm_cache
+from ai_bot.ai.backpressure import (
+    AIMDLimiter, SlidingWindowLimiter, CircuitBreaker, SuccessRate, TransientProviderError,
+    estimate_tokens, parse_duration, with_retry
+)
 
 logger = logging.getLogger(__name__)
 
+try:
+    import h2  # noqa: F401  (нужен httpx для HTTP/2)
+    HAS_HTTP2 = True
+except ImportError:
+    HAS_HTTP2 = False
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+
+def json_loads(data: bytes | str):
+    """Разбирает JSON через orjson (в 2-3 раза быстрее), если он установлен."""
+    if HAS_ORJSON:
+        return orjson.loads(data)
+    return json.loads(data)
+
 proxy_url = settings.PROXY_URL
-http_client = httpx.Client(proxy=proxy_url)
+# Лимиты пула выше дефолтных (10 соединений), иначе при параллельных
+# запросах из API и Celery возникает httpx.PoolTimeout
+http_client = httpx.AsyncClient(
+    proxy=proxy_url,
+    http2=HAS_HTTP2,
+    limits=httpx.Limits(max_connections=200, max_keepalive_connections=50, keepalive_expiry=30.0),
+    timeout=httpx.Timeout(60.0, connect=10.0)
+)
 
 client = None
 if settings.OPENAI_API_KEY:
-    client = OpenAI(
+    # Повторы выполняет with_retry; встроенные повторы SDK отключены, иначе они умножаются
+    # на попытки with_retry и проходят мимо record_overload
+    client = AsyncOpenAI(
         api_key=settings.OPENAI_API_KEY,
-        http_client=http_client
+        http_client=http_client,
+        max_retries=0
     )
 
+# Общая сессия для Ollama и Together AI: keep-alive вместо нового TCP/TLS соединения на каждый запрос.
+# Повторы выполняет with_retry, поэтому у адаптера они отключены.
+http_session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=20, pool_maxsize=100, max_retries=Retry(total=0))
+http_session.mount("http://", _adapter)
+http_session.mount("https://", _adapter)
+
+# Статусы ответа, означающие перегрузку провайдера
+OVERLOAD_STATUS_CODES = (429, 502, 503)
+
+OPENAI_CHAT_COMPLETIONS_URL = 'https://api.openai.com/v1/chat/completions'
+
+# Отдельный ограничитель параллельности для каждого провайдера
+limiters = {
+    provider: AIMDLimiter(
+        name=provider,
+        c_max=settings.LLM_MAX_CONCURRENCY,
+        latency_target_ms=settings.LLM_LATENCY_TARGET_MS
+    )
+    for provider in ('ollama', 'together', 'openai')
+}
+
+# Лимиты RPM/TPM, соблюдаемые до отправки запроса
+rate_limiters = {
+    'ollama': SlidingWindowLimiter('ollama', rpm=settings.OLLAMA_RPM),
+    'together': SlidingWindowLimiter('together', rpm=settings.TOGETHER_RPM),
+    'openai': SlidingWindowLimiter('openai', rpm=settings.OPENAI_RPM, tpm=settings.OPENAI_TPM),
+}
+
+# Скользящая доля успешных ответов: провайдеры с частыми ошибками уходят в конец очереди
+success_rates = {provider: SuccessRate() for provider in ('ollama', 'together', 'openai')}
+
+# Пороги маршрутизации по размеру запроса (в токенах)
+LOCAL_PREFERRED_MAX_TOKENS = 1024  # Короткие запросы сначала отдаем локальной модели
+LOCAL_MAX_TOKENS = 4096  # Длинные запросы локальная модель обрабатывает плохо
+MAX_FAILURE_RATE = 0.2
+
+# Пул потоков для синхронных провайдеров (requests); размер совпадает с потолком AIMD,
+# поэтому перегруженная LLM не может занять все потоки процесса
+LLM_EXECUTOR = ThreadPoolExecutor(max_workers=settings.LLM_MAX_CONCURRENCY, thread_name_prefix='llm')
+
+# Предохранители: провайдер, который падает подряд, временно пропускается в каскаде
+breakers = {
+    provider: CircuitBreaker(provider, fail_threshold=5, reset_timeout=60)
+    for provider in ('ollama', 'together', 'openai')
+}
+
+# Постоянный event loop для синхронных вызовов (Celery).
+# Общий http_client привязывается к loop, в котором открыты соединения,
+# поэтому все синхронные вызовы выполняются в одном фоновом loop.
+_sync_loop: asyncio.AbstractEventLoop | None = None
+_sync_loop_lock = threading.Lock()
+
+
+def _get_sync_loop() -> asyncio.AbstractEventLoop:
+    """Возвращает фоновый event loop, запуская его при первом обращении."""
+    global _sync_loop
+    with _sync_loop_lock:
+        if _sync_loop is None or _sync_loop.is_closed():
+            _sync_loop = asyncio.new_event_loop()
+            threading.Thread(target=_sync_loop.run_forever, name='ai-sync-loop', daemon=True).start()
+    return _sync_loop
+
+
+def run_sync(coro):
+    """
+    Выполняет корутину из синхронного кода и возвращает ее результат.
+    
+    Используется Celery задачами, которые не имеют своего event loop.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, _get_sync_loop()).result()
+
+
+async def run_on_llm_loop(coro):
+    """
+    Выполняет корутину AI клиента в общем фоновом loop и ожидает ее из текущего loop.
+    
+    http_client, лимитеры и in-flight словарь привязаны к фоновому loop, поэтому
+    асинхронный код с собственным loop (FastAPI) вызывает AI функции через эту обертку.
+    """
+    loop = _get_sync_loop()
+    if asyncio.get_running_loop() is loop:
+        return await coro
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+
+_STREAM_END = object()
+
+
+async def iter_on_llm_loop(agen: AsyncIterator) -> AsyncIterator:
+    """
+    Перебирает асинхронный генератор AI клиента в общем фоновом loop (см. run_on_llm_loop).
+    
+    Элементы передаются в текущий loop через очередь; исключение генератора пробрасывается
+    вызывающему. Если вызывающий прекращает перебор (клиент отключился), генератор отменяется.
+    """
+    caller_loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def produce():
+        try:
+            async for item in agen:
+                caller_loop.call_soon_threadsafe(queue.put_nowait, (item, None))
+        except Exception as e:
+            caller_loop.call_soon_threadsafe(queue.put_nowait, (_STREAM_END, e))
+        else:
+            caller_loop.call_soon_threadsafe(queue.put_nowait, (_STREAM_END, None))
+
+    future = asyncio.run_coroutine_threadsafe(produce(), _get_sync_loop())
+    try:
+        while True:
+            item, error = await queue.get()
+            if item is _STREAM_END:
+                if error:
+                    raise error
+                return
+            yield item
+    finally:
+        future.cancel()
+
+
+@with_retry(retry_on=(requests.exceptions.Timeout, TransientProviderError))
+def _post_ollama(data: dict) -> str:
+    """Отправляет запрос в Ollama; пустой ответ и перегрузка считаются временными ошибками."""
+    started = time.monotonic()
+    response = http_session.post(f"{settings.OLLAMA_BASE_URL}/api/generate", json=data, timeout=60)
+
+    if response.status_code in OVERLOAD_STATUS_CODES:
+        limiters['ollama'].record_overload(parse_duration(response.headers.get('retry-after')))
+        raise TransientProviderError(f'Ollama overloaded: {response.status_code}')
+    # Задержка одной попытки: слот в _request_in_thread охватывает все повторы
+    limiters['ollama'].record_latency(time.monotonic() - started)
+
+    if response.status_code != 200:
+        raise requests.exceptions.HTTPError(f'{response.status_code} - {response.text}')
+
+    text = json_loads(response.content).get('response', '').strip()
+    if not text:
+        raise TransientProviderError('Ollama returned empty response')
+    return text
+
 
 def make_request_ollama(instructions: str, prompt: str, temperature: float = 0.7, max_tokens: int = 500) -> str | None:
     """
     Запрос к локальной Ollama LLM.
     """
     try:
-        url = f"{settings.OLLAMA_BASE_URL}/api/generate"
-
         full_prompt = f"{instructions}\n\n{prompt}"
 
         data = {
@@ -40,18 +225,13 @@ def make_request_ollama(instructions: str, prompt: str, temperature: float = 0.7
         }
 
         logger.info(f'Запрос к Ollama: {settings.OLLAMA_MODEL}')
-        response = requests.post(url, json=data, timeout=60)
-
-        if response.status_code == 200:
-            result = response.json()
-            text = result.get('response', '').strip()
-            if text:
-                logger.info(f'Ollama response received, length: {len(text)}')
-                return text
+        text = _post_ollama(data)
+        logger.info(f'Ollama response received, length: {len(text)}')
+        return text
 
-        logger.error(f'Ollama error: {response.status_code} - {response.text}')
+    except TransientProviderError as e:
+        logger.error(f'Ollama error: {e}')
         return None
-
     except requests.exceptions.RequestException as e:
         logger.error(f'Ollama connection error: {e}')
         return None
@@ -60,6 +240,28 @@ def make_request_ollama(instructions: str, prompt: str, temperature: float = 0.7
         return None
 
 
+@with_retry(retry_on=(requests.exceptions.Timeout, TransientProviderError))
+def _post_together(headers: dict, data: dict) -> str:
+    """Отправляет запрос в Together AI; пустой ответ и перегрузка считаются временными ошибками."""
+    started = time.monotonic()
+    response = http_session.post("https://api.together.xyz/v1/chat/completions", headers=headers, json=data, timeout=30)
+
+    if response.status_code in OVERLOAD_STATUS_CODES:
+        limiters['together'].record_overload(parse_duration(response.headers.get('retry-after')))
+        raise TransientProviderError(f'Together AI overloaded: {response.status_code}')
+    # Задержка одной попытки: слот в _request_in_thread охватывает все повторы
+    limiters['together'].record_latency(time.monotonic() - started)
+
+    if response.status_code != 200:
+        raise requests.exceptions.HTTPError(f'{response.status_code} - {response.text}')
+
+    result = json_loads(response.content)
+    text = result.get('choices', [{}])[0].get('message', {}).get('content', '').strip()
+    if not text:
+        raise TransientProviderError('Together AI returned empty response')
+    return text
+
+
 def make_request_together(instructions: str, prompt: str, temperature: float = 0.7, max_tokens: int = 500) -> str | None:
     """
     Запрос к Together AI (есть бесплатный tier).
@@ -68,8 +270,6 @@ def make_request_together(instructions: str, prompt: str, temperature: float = 0
         return None
 
     try:
-        url = "https://api.together.xyz/v1/chat/completions"
-
         headers = {
             "Authorization": f"Bearer {settings.TOGETHER_API_KEY}",
             "Content-Type": "application/json"
@@ -86,18 +286,13 @@ def make_request_together(instructions: str, prompt: str, temperature: float = 0
         }
 
         logger.info('Запрос к Together AI')
-        response = requests.post(url, headers=headers, json=data, timeout=30)
-
-        if response.status_code == 200:
-            result = response.json()
-            text = result.get('choices', [{}])[0].get('message', {}).get('content', '').strip()
-            if text:
-                logger.info(f'Together AI response received, length: {len(text)}')
-                return text
+        text = _post_together(headers, data)
+        logger.info(f'Together AI response received, length: {len(text)}')
+        return text
 
-        logger.error(f'Together AI error: {response.status_code} - {response.text}')
+    except TransientProviderError as e:
+        logger.error(f'Together AI error: {e}')
         return None
-
     except requests.exceptions.RequestException as e:
         logger.error(f'Together AI connection error: {e}')
         return None
@@ -106,12 +301,241 @@ def make_request_together(instructions: str, prompt: str, temperature: float = 0
         return None
 
 
-def make_request(instructions: str, prompt: str, temperature: float = 0.7, max_tokens: int = 500) -> str | None:
+@with_retry(retry_on=(RateLimitError, InternalServerError, APITimeoutError, APIConnectionError))
+async def _create_chat_completion(instructions: str, prompt: str, temperature: float, max_tokens: int,
+                                  response_format: dict | None = None):
+    """Вызывает Chat Completions API с учетом локальных лимитов и заголовков rate limit."""
+    extra = {"response_format": response_format} if response_format else {}
+
+    await rate_limiters['openai'].wait_if_throttled(estimate_tokens(instructions, prompt, max_tokens))
+
+    # raw response нужен для заголовков rate limit
+    async with limiters['openai'].slot():
+        try:
+            raw_response = await client.chat.completions.with_raw_response.create(
+                model=settings.OPENAI_MODEL,
+                messages=[
+                    {"role": "system", "content": instructions},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=temperature,
+                max_tokens=max_tokens,
+                **extra
+            )
+        except APIStatusError as e:
+            if e.status_code in OVERLOAD_STATUS_CODES:
+                limiters['openai'].record_overload(parse_duration(e.response.headers.get('retry-after')))
+            raise
+
+    limiters['openai'].update_from_headers(raw_response.headers)
+    return raw_response.parse()
+
+
+@dataclass
+class ChatCompletionResult:
+    """Минимальный результат Chat Completions без моделей SDK."""
+    content: str | None
+    cached_tokens: int = 0
+
+
+@with_retry(retry_on=(TransientProviderError, httpx.TransportError))
+async def raw_openai_call(instructions: str, prompt: str, temperature: float, max_tokens: int,
+                          response_format: dict | None = None) -> ChatCompletionResult:
+    """
+    Вызывает /v1/chat/completions напрямую через общий httpx клиент.
+    
+    Обходит построение pydantic-моделей SDK, что заметно при большом числе
+    параллельных запросов. Лимиты и заголовки rate limit учитываются так же, как в SDK-пути.
+    """
+    payload = {
+        "model": settings.OPENAI_MODEL,
+        "messages": [
+            {"role": "system", "content": instructions},
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+    }
+    if response_format:
+        payload["response_format"] = response_format
+
+    await rate_limiters['openai'].wait_if_throttled(estimate_tokens(instructions, prompt, max_tokens))
+
+    async with limiters['openai'].slot():
+        response = await http_client.post(
+            OPENAI_CHAT_COMPLETIONS_URL,
+            headers={"Authorization": f"Bearer {settings.OPENAI_API_KEY}"},
+            json=payload
+        )
+
+    if response.status_code in OVERLOAD_STATUS_CODES:
+        limiters['openai'].record_overload(parse_duration(response.headers.get('retry-after')))
+        raise TransientProviderError(f'OpenAI HTTP {response.status_code}')
+    # Остальные 5xx (500, 504) тоже временные: SDK-путь повторяет их как InternalServerError
+    if response.status_code >= 500:
+        raise TransientProviderError(f'OpenAI HTTP {response.status_code}')
+    response.raise_for_status()
+    limiters['openai'].update_from_headers(response.headers)
+
+    data = json_loads(response.content)
+    usage = data.get('usage') or {}
+    return ChatCompletionResult(
+        content=data['choices'][0]['message']['content'],
+        cached_tokens=(usage.get('prompt_tokens_details') or {}).get('cached_tokens', 0) or 0
+    )
+
+
+async def _openai_completion(instructions: str, prompt: str, temperature: float, max_tokens: int,
+                             response_format: dict | None = None) -> ChatCompletionResult:
+    """
+    Выполняет запрос напрямую (OPENAI_RAW_HTTP) с fallback на SDK.
+    
+    На SDK переходим только если ответ не удалось разобрать. Сетевые ошибки и перегрузку
+    уже повторил raw_openai_call, а 4xx (неверный запрос, ключ) повторять бессмысленно,
+    поэтому они пробрасываются.
+    """
+    if settings.OPENAI_RAW_HTTP:
+        try:
+            return await raw_openai_call(instructions, prompt, temperature, max_tokens, response_format)
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            logger.warning(f"Raw OpenAI response could not be parsed, falling back to SDK: {e}")
+
+    response = await _create_chat_completion(instructions, prompt, temperature, max_tokens, response_format)
+    # Сколько токенов промпта взято из кэша префиксов OpenAI
+    details = getattr(response.usage, 'prompt_tokens_details', None) if response.usage else None
+    return ChatCompletionResult(
+        content=response.choices[0].message.content,
+        cached_tokens=getattr(details, 'cached_tokens', 0) or 0
+    )
+
+
+async def make_request_openai(instructions: str, prompt: str, temperature: float = 0.7, max_tokens: int = 500,
+                              response_format: dict | None = None) -> str | None:
+    """
+    Запрос к OpenAI Chat Completions API.
+    """
+    if not client:
+        logger.error("OPENAI_API_KEY is not set")
+        return None
+
+    if not settings.OPENAI_MODEL:
+        logger.error("OPENAI_MODEL is not set")
+        return None
+
+    try:
+        completion = await _openai_completion(instructions, prompt, temperature, max_tokens, response_format)
+
+        result = completion.content
+        cached_tokens = completion.cached_tokens
+        logger.info(f"OpenAI response received, length: {len(result) if result else 0}, cached prompt tokens: {cached_tokens}")
+        return result
+
+    except RateLimitError as e:
+        logger.error(f"Rate limit error: {e}")
+        return None
+    except OpenAIError as e:
+        logger.error(f"OpenAI error: {e}")
+        return None
+    except Exception as e:
+        logger.error(f"Unexpected error: {e}")
+        return None
+
+
+class StreamInterruptedError(Exception):
+    """Потоковая генерация не завершилась штатно (ошибка провайдера или finish_reason не 'stop')."""
+
+
+async def make_request_stream(instructions: str, prompt: str, temperature: float = 0.7,
+                              max_tokens: int = 500) -> AsyncIterator[str]:
     """
-    Синхронный запрос к AI API с автоматическим fallback.
+    Потоковый запрос к OpenAI: отдает текст частями по мере генерации.
     
-    Автоматически выбирает между доступными провайдерами в порядке приоритета:
-    1. Ollama (локальная LLM, если USE_LOCAL_LLM=True)
+    Первые токены приходят через доли секунды, поэтому клиент может показывать
+    пост, не дожидаясь окончания генерации. Fallback на другие провайдеры и кэш
+    здесь не используются.
+    
+    Args:
+        instructions: Системные инструкции для AI
+        prompt: Пользовательский запрос
+        temperature: Температура генерации (0.0-1.0)
+        max_tokens: Максимальное количество токенов в ответе
+        
+    Yields:
+        Очередные фрагменты сгенерированного текста
+        
+    Raises:
+        StreamInterruptedError: Если поток оборвался или завершился не по 'stop' (например, по max_tokens)
+    """
+    if not client or not settings.OPENAI_MODEL:
+        logger.error("OPENAI_API_KEY or OPENAI_MODEL is not set")
+        raise StreamInterruptedError("OpenAI is not configured")
+
+    await rate_limiters['openai'].wait_if_throttled(estimate_tokens(instructions, prompt, max_tokens))
+
+    # Длительность потока зависит от длины ответа, а не от перегрузки: задержку не учитываем
+    async with limiters['openai'].slot(measure_latency=False):
+        try:
+            stream = await client.chat.completions.create(
+                model=settings.OPENAI_MODEL,
+                messages=[
+                    {"role": "system", "content": instructions},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True
+            )
+            finish_reason = None
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                if chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+                finish_reason = chunk.choices[0].finish_reason or finish_reason
+        except APIStatusError as e:
+            if e.status_code in OVERLOAD_STATUS_CODES:
+                limiters['openai'].record_overload(parse_duration(e.response.headers.get('retry-after')))
+            logger.error(f"OpenAI stream error: {e}")
+            raise StreamInterruptedError(str(e)) from e
+        except OpenAIError as e:
+            logger.error(f"OpenAI stream error: {e}")
+            raise StreamInterruptedError(str(e)) from e
+
+    if finish_reason != 'stop':
+        logger.error(f"OpenAI stream finished with finish_reason={finish_reason}")
+        raise StreamInterruptedError(f"finish_reason={finish_reason}")
+
+
+def get_providers_state() -> dict:
+    """Возвращает состояние предохранителей и лимитов провайдеров для /health/."""
+    return {
+        provider: {
+            **breakers[provider].get_state(),
+            'success_rate': round(success_rates[provider].value, 3),
+            'concurrency': limiters[provider].get_state(),
+        }
+        for provider in breakers
+    }
+
+
+# Запросы к LLM, выполняемые в данный момент (single-flight): ключ -> задача с запросом и число ожидающих.
+# Словари изменяются только из event loop без await между проверкой и вставкой, поэтому lock не нужен.
+_inflight: dict[str, asyncio.Task] = {}
+_inflight_waiters: dict[str, int] = {}
+
+
+def _forget_inflight(key: str, task: asyncio.Task) -> None:
+    """Убирает завершенную задачу из _inflight (если ключ еще не занят новой задачей)."""
+    if _inflight.get(key) is task:
+        del _inflight[key]
+
+
+async def make_request(instructions: str, prompt: str, temperature: float = 0.7, max_tokens: int = 500) -> str | None:
+    """
+    Асинхронный запрос к AI API с автоматическим fallback.
+    
+    Автоматически выбирает между доступными провайдерами (см. route_providers):
+    1. Ollama (локальная LLM, если USE_LOCAL_LLM=True и запрос короткий)
     2. Together AI (бесплатный tier)
     3. OpenAI (основной провайдер)
     
@@ -124,62 +548,294 @@ def make_request(instructions: str, prompt: str, temperature: float = 0.7, max_t
     Returns:
         Сгенерированный текст или None в случае ошибки
     """
+    # Кэшируем только запросы с низкой температурой, иначе ответы должны различаться.
+    # Генерация постов (0.7) в кэш не попадает: он нужен детерминированным вызовам.
+    # Клиент Redis синхронный, поэтому обращения к кэшу выполняются в потоке, не блокируя loop
+    cache_key = LLMCache.make_key(settings.OPENAI_MODEL, instructions, prompt, temperature, max_tokens)
+    cache = await asyncio.to_thread(get_llm_cache) if temperature <= settings.LLM_CACHE_MAX_TEMPERATURE else None
+    if cache:
+        cached = await asyncio.to_thread(cache.get, cache_key)
+        if cached:
+            logger.info('LLM response served from cache')
+            return cached
+
+    async def request_and_cache() -> str | None:
+        result = await _make_request_uncached(instructions, prompt, temperature, max_tokens)
+        if cache and result:
+            await asyncio.to_thread(cache.set, cache_key, result, settings.LLM_CACHE_TTL)
+        return result
 
-    # 1. Ollama (если включена локальная LLM)
-    if settings.USE_LOCAL_LLM:
-        logger.info("Используем локальную LLM (Ollama)")
-        result = make_request_ollama(instructions, prompt, temperature, max_tokens)
-        if result:
-            return result
-        logger.warning("Ollama недоступна, пробуем Together AI")
+    # Одинаковые одновременные запросы (например, задача Celery и ручная генерация) ждут один ответ.
+    # Запрос выполняется отдельной задачей loop, а вызывающие ждут ее через shield: отмена одного
+    # вызывающего не отменяет запрос для остальных. Задача отменяется, только когда ждать больше некому
+    inflight_key = cache_key
+    task = _inflight.get(inflight_key)
+    if task:
+        logger.info('Identical LLM request already in flight, waiting for its result')
+    else:
+        task = asyncio.create_task(request_and_cache())
+        _inflight[inflight_key] = task
+        task.add_done_callback(lambda done, key=inflight_key: _forget_inflight(key, done))
+
+    _inflight_waiters[inflight_key] = _inflight_waiters.get(inflight_key, 0) + 1
+    try:
+        return await asyncio.shield(task)
+    except asyncio.CancelledError:
+        if _inflight_waiters[inflight_key] == 1:
+            task.cancel()
+        raise
+    finally:
+        _inflight_waiters[inflight_key] -= 1
+        if not _inflight_waiters[inflight_key]:
+            del _inflight_waiters[inflight_key]
+
+
+async def _request_in_thread(provider: str, func, instructions: str, prompt: str,
+                             temperature: float, max_tokens: int) -> str | None:
+    """Выполняет синхронный запрос к провайдеру в LLM_EXECUTOR, соблюдая его лимиты."""
+    await rate_limiters[provider].wait_if_throttled(estimate_tokens(instructions, prompt, max_tokens))
+    async with limiters[provider].slot(measure_latency=False):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(LLM_EXECUTOR, func, instructions, prompt, temperature, max_tokens)
+
+
+def _record_result(provider: str, result: str | None) -> None:
+    """Обновляет предохранитель и статистику успешности провайдера по результату запроса."""
+    success_rates[provider].update(bool(result))
+    if result:
+        breakers[provider].record_success()
+    else:
+        breakers[provider].record_failure()
+
+
+def route_providers(instructions: str, prompt: str) -> list[str]:
+    """
+    Определяет порядок провайдеров для запроса.
+    
+    Короткие запросы сначала отправляются в локальную Ollama, длинные ее пропускают.
+    Провайдеры, у которых больше 20% ошибок, переносятся в конец очереди.
+    OpenAI всегда остается последним резервом среди рабочих провайдеров.
+    
+    Args:
+        instructions: Системные инструкции для AI
+        prompt: Пользовательский запрос
+        
+    Returns:
+        Список провайдеров в порядке попыток
+    """
+    tokens_est = estimate_tokens(instructions, prompt, 0)
 
-    # 2. Together AI (бесплатная альтернатива)
+    providers = []
+    use_local = settings.USE_LOCAL_LLM and tokens_est <= LOCAL_MAX_TOKENS
+    if use_local and tokens_est < LOCAL_PREFERRED_MAX_TOKENS:
+        providers.append('ollama')
     if settings.TOGETHER_API_KEY:
-        logger.info("Пробуем Together AI (бесплатный tier)")
-        result = make_request_together(instructions, prompt, temperature, max_tokens)
+        providers.append('together')
+    if use_local and tokens_est >= LOCAL_PREFERRED_MAX_TOKENS:
+        providers.append('ollama')
+    providers.append('openai')
+
+    # Стабильная сортировка сохраняет порядок внутри групп
+    providers.sort(key=lambda provider: success_rates[provider].failure_rate > MAX_FAILURE_RATE)
+    return providers
+
+
+async def _make_request_uncached(instructions: str, prompt: str, temperature: float, max_tokens: int) -> str | None:
+    """
+    Перебирает провайдеров в порядке route_providers без обращения к кэшу.
+    
+    Ollama и Together AI вызываются через requests, поэтому выполняются в потоке,
+    чтобы не блокировать event loop. Провайдеры с сработавшим предохранителем пропускаются,
+    следующий провайдер пробуется только если предыдущий не вернул ответ.
+    """
+    for provider in route_providers(instructions, prompt):
+        if not breakers[provider].allow():
+            logger.warning(f"Провайдер {provider} временно отключен предохранителем")
+            continue
+
+        logger.info(f"Запрос к провайдеру: {provider}")
+        if provider == 'ollama':
+            result = await _request_in_thread('ollama', make_request_ollama, instructions, prompt, temperature, max_tokens)
+        elif provider == 'together':
+            result = await _request_in_thread('together', make_request_together, instructions, prompt, temperature, max_tokens)
+        else:
+            result = await make_request_openai(instructions, prompt, temperature, max_tokens)
+
+        _record_result(provider, result)
         if result:
             return result
-        logger.warning("Together AI недоступен, переключаемся на OpenAI")
+        logger.warning(f"Провайдер {provider} не вернул ответ, пробуем следующий")
+
+    return None
 
-    # 3. OpenAI (основной провайдер)
+
+def make_request_sync(instructions: str, prompt: str, temperature: float = 0.7, max_tokens: int = 500) -> str | None:
+    """Синхронная обертка над make_request для Celery воркеров."""
+    return run_sync(make_request(instructions, prompt, temperature, max_tokens))
+
+
+async def make_request_many(items: list[tuple[str, str, str]], temperature: float = 0.7,
+                            max_tokens: int = 500, group_size: int = 10) -> dict[str, str]:
+    """
+    Генерирует ответы для нескольких запросов за меньшее число вызовов OpenAI.
+
+    Запросы с одинаковыми инструкциями объединяются в один chat-запрос
+    (до group_size штук), модель возвращает JSON с ответом для каждого id.
+    Инструкции должны быть рассчитаны на несколько запросов и требовать ответ
+    вида {"posts": [{"id": "<id>", "text": "<ответ>"}]}.
+    Так расходуется меньше RPM и один раз передается общий системный промпт.
+
+    Args:
+        items: Список кортежей (id, instructions, prompt); instructions - системный промпт пакетного запроса
+        temperature: Температура генерации (0.0-1.0)
+        max_tokens: Максимальное количество токенов ответа на один запрос
+        group_size: Максимальное количество запросов в одном вызове
+
+    Returns:
+        Словарь id -> сгенерированный текст; id без ответа в словарь не попадают
+    """
+    groups: dict[str, list[tuple[str, str]]] = {}
+    for item_id, instructions, prompt in items:
+        groups.setdefault(instructions, []).append((item_id, prompt))
+
+    results: dict[str, str] = {}
+    for instructions, group in groups.items():
+        for start in range(0, len(group), group_size):
+            chunk = group[start:start + group_size]
+            combined_prompt = "\n\n".join(f"### id: {item_id}\n{prompt}" for item_id, prompt in chunk)
+
+            text = await make_request_openai(
+                instructions,
+                combined_prompt,
+                temperature,
+                max_tokens * len(chunk),
+                response_format={"type": "json_object"}
+            )
+            if not text:
+                continue
+
+            try:
+                posts = json_loads(text).get("posts", [])
+            except (ValueError, AttributeError) as e:
+                logger.error(f"Не удалось разобрать пакетный ответ OpenAI: {e}")
+                continue
+
+            chunk_ids = {item_id for item_id, _ in chunk}
+            for post in posts:
+                if isinstance(post, dict) and post.get("id") in chunk_ids and post.get("text"):
+                    results[post["id"]] = post["text"]
+
+    logger.info(f"Пакетная генерация: получено {len(results)} ответов из {len(items)}")
+    return results
+
+
+async def make_batch_request(items: list[tuple[str, str, str]], temperature: float = 0.7, max_tokens: int = 500) -> str | None:
+    """
+    Отправляет набор запросов в OpenAI Batch API.
+
+    Batch API обрабатывает запросы в течение 24 часов, но стоит вдвое дешевле
+    и использует отдельный пул лимитов.
+
+    Args:
+        items: Список кортежей (custom_id, instructions, prompt); custom_id - ID новости
+        temperature: Температура генерации (0.0-1.0)
+        max_tokens: Максимальное количество токенов в ответе
+
+    Returns:
+        ID созданного батча или None в случае ошибки
+    """
     if not client:
         logger.error("OPENAI_API_KEY is not set")
         return None
 
-    if not settings.OPENAI_MODEL:
-        logger.error("OPENAI_MODEL is not set")
+    if not items:
         return None
 
+    lines = []
+    for custom_id, instructions, prompt in items:
+        lines.append(json.dumps({
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": settings.OPENAI_MODEL,
+                "messages": [
+                    {"role": "system", "content": instructions},
+                    {"role": "user", "content": prompt}
+                ],
+                "temperature": temperature,
+                "max_tokens": max_tokens
+            }
+        }, ensure_ascii=False))
+
     try:
-        # Используем актуальный Chat Completions API
-        response = client.chat.completions.create(
-            model=settings.OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": instructions},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=temperature,
-            max_tokens=max_tokens
+        batch_file = await client.files.create(
+            file=("batch.jsonl", io.BytesIO("\n".join(lines).encode("utf-8"))),
+            purpose="batch"
         )
+        batch = await client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        logger.info(f"OpenAI batch created: {batch.id}, requests: {len(items)}")
+        return batch.id
 
-        result = response.choices[0].message.content
-        logger.info(f"OpenAI response received, length: {len(result) if result else 0}")
-        return result
-
-    except RateLimitError as e:
-        logger.error(f"Rate limit error: {e}")
-        return None
     except OpenAIError as e:
-        logger.error(f"OpenAI error: {e}")
+        logger.error(f"OpenAI batch error: {e}")
         return None
     except Exception as e:
-        logger.error(f"Unexpected error: {e}")
+        logger.error(f"Unexpected batch error: {e}")
         return None
 
+
+async def get_batch_results(batch_id: str) -> tuple[str | None, dict[str, str]]:
+    """
+    Проверяет статус батча и забирает результаты, если он завершен.
+
+    Args:
+        batch_id: ID батча в OpenAI
+
+    Returns:
+        Кортеж (статус батча, словарь custom_id -> сгенерированный текст).
+        Словарь пуст, пока батч не завершен.
+    """
+    if not client:
+        logger.error("OPENAI_API_KEY is not set")
+        return None, {}
+
+    try:
+        batch = await client.batches.retrieve(batch_id)
+        if batch.status != "completed" or not batch.output_file_id:
+            return batch.status, {}
+
+        content = (await client.files.content(batch.output_file_id)).text
+    except OpenAIError as e:
+        logger.error(f"OpenAI batch retrieve error: {e}")
+        return None, {}
+
+    results = {}
+    for line in content.splitlines():
+        if not line.strip():
+            continue
+        row = json_loads(line)
+        response = row.get("response") or {}
+        if row.get("error") or response.get("status_code") != 200:
+            logger.warning(f"Batch request {row.get('custom_id')} failed: {row.get('error')}")
+            continue
+
+        choices = response.get("body", {}).get("choices") or [{}]
+        text = choices[0].get("message", {}).get("content")
+        if text:
+            results[row["custom_id"]] = text
+
+    return batch.status, results
+
+
 if __name__ == '__main__':
     *_, arg_prompt, arg_text = sys.argv
     
-    result = make_request(arg_prompt, arg_text)
+    result = make_request_sync(arg_prompt, arg_text)
     if result:
         print(result)
     else:
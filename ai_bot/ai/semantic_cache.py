@@ -0,0 +1,177 @@
+"""Семантический кэш постов: повторно использует пост для почти одинаковых новостей."""
+
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from ai_bot.config import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+    from sentence_transformers import SentenceTransformer
+    HAS_SEMANTIC_CACHE = True
+except ImportError:
+    HAS_SEMANTIC_CACHE = False
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+@contextmanager
+def _file_lock(path: str) -> Iterator[None]:
+    """Межпроцессная блокировка файла кэша (на системах без fcntl блокировки нет)."""
+    if fcntl is None:
+        yield
+        return
+    with open(f'{path}.lock', 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class SemanticCache:
+    """
+    Кэш по близости эмбеддингов запросов.
+
+    Новости, перепечатанные разными источниками, отличаются формулировками,
+    поэтому точный кэш по хэшу их не ловит. Здесь запрос кодируется небольшой
+    локальной моделью и сравнивается по косинусной близости со всеми сохраненными.
+    """
+
+    def __init__(self, model_name: str, threshold: float = 0.92, max_size: int = 10000):
+        self.model_name = model_name
+        self.threshold = threshold
+        self.max_size = max_size
+        self._model: Optional["SentenceTransformer"] = None
+        self._embeddings = np.zeros((0, 0), dtype=np.float32)
+        self._texts: list[str] = []
+        self._lock = threading.Lock()
+
+    def _encode(self, query: str) -> "np.ndarray":
+        if self._model is None:
+            logger.info(f'Загрузка модели эмбеддингов: {self.model_name}')
+            self._model = SentenceTransformer(self.model_name)
+        return self._model.encode(query, normalize_embeddings=True).astype(np.float32)
+
+    def lookup(self, query: str) -> Optional[str]:
+        """Возвращает сохраненный текст для ближайшего запроса, если близость выше порога."""
+        embedding = self._encode(query)
+        with self._lock:
+            if not self._texts:
+                return None
+            # Эмбеддинги нормализованы, поэтому скалярное произведение - это косинусная близость
+            similarities = self._embeddings @ embedding
+            best = int(similarities.argmax())
+            if similarities[best] >= self.threshold:
+                logger.info(f'Semantic cache hit, similarity: {similarities[best]:.3f}')
+                return self._texts[best]
+        return None
+
+    def add(self, query: str, text: str) -> None:
+        """Добавляет запрос и ответ в кэш, вытесняя самые старые записи."""
+        embedding = self._encode(query)
+        with self._lock:
+            if self._texts:
+                self._embeddings = np.vstack([self._embeddings, embedding])
+            else:
+                self._embeddings = embedding.reshape(1, -1)
+            self._texts.append(text)
+
+            if len(self._texts) > self.max_size:
+                self._embeddings = self._embeddings[-self.max_size:]
+                self._texts = self._texts[-self.max_size:]
+
+    def save(self, path: str) -> None:
+        """
+        Сохраняет кэш на диск.
+        
+        Файл общий для всех процессов (воркеры Celery, API): записи, сохраненные другими
+        процессами, объединяются с записями этого процесса под файловой блокировкой,
+        а сам файл заменяется атомарно.
+        """
+        with self._lock:
+            if not self._texts:
+                return
+            embeddings, texts = self._embeddings, list(self._texts)
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with _file_lock(path):
+            disk_embeddings, disk_texts = self._read(path)
+            if disk_texts and disk_embeddings.shape[1:] == embeddings.shape[1:]:
+                known = set(texts)
+                keep = [i for i, text in enumerate(disk_texts) if text not in known]
+                if keep:
+                    embeddings = np.vstack([disk_embeddings[keep], embeddings])
+                    texts = [disk_texts[i] for i in keep] + texts
+            embeddings, texts = embeddings[-self.max_size:], texts[-self.max_size:]
+
+            tmp_path = f'{path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, embeddings=embeddings, texts=np.array(json.dumps(texts, ensure_ascii=False)))
+            os.replace(tmp_path, path)
+        logger.info(f'Semantic cache saved: {len(texts)} entries')
+
+    @staticmethod
+    def _read(path: str) -> tuple["np.ndarray", list[str]]:
+        """Читает эмбеддинги и тексты из файла кэша; при отсутствии или ошибке - пустой кэш."""
+        if not os.path.exists(path):
+            return np.zeros((0, 0), dtype=np.float32), []
+        try:
+            data = np.load(path)
+            return data['embeddings'], json.loads(str(data['texts']))
+        except Exception as e:
+            logger.warning(f'Не удалось загрузить семантический кэш: {e}')
+            return np.zeros((0, 0), dtype=np.float32), []
+
+    def load(self, path: str) -> None:
+        """Загружает кэш с диска, если файл существует."""
+        embeddings, texts = self._read(path)
+        if not texts:
+            return
+        with self._lock:
+            self._embeddings = embeddings
+            self._texts = texts
+        logger.info(f'Semantic cache loaded: {len(texts)} entries')
+
+
+_semantic_cache: Optional[SemanticCache] = None
+
+
+def get_semantic_cache() -> Optional[SemanticCache]:
+    """
+    Возвращает общий семантический кэш или None, если он выключен.
+
+    Кэш работает только при SEMANTIC_CACHE_ENABLED=true и установленных
+    numpy и sentence-transformers.
+    """
+    global _semantic_cache
+    if not settings.SEMANTIC_CACHE_ENABLED:
+        return None
+
+    if not HAS_SEMANTIC_CACHE:
+        logger.warning('sentence-transformers not installed, semantic cache disabled')
+        return None
+
+    if _semantic_cache is None:
+        _semantic_cache = SemanticCache(
+            settings.SEMANTIC_CACHE_MODEL,
+            threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+            max_size=settings.SEMANTIC_CACHE_MAX_SIZE
+        )
+        _semantic_cache.load(settings.SEMANTIC_CACHE_PATH)
+    return _semantic_cache
+
+
+def save_semantic_cache() -> None:
+    """Сохраняет семантический кэш на диск (вызывается при остановке процесса)."""
+    if _semantic_cache is not None:
+        _semantic_cache.save(settings.SEMANTIC_CACHE_PATH)
@@ -1,21 +1,33 @@
 """API endpoints для управления AI News Bot."""
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from celery.result import AsyncResult
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session, selectinload
 from typing import List, Optional
 from datetime import datetime
 
-from ai_bot.db.db_manager import get_db_sync
-from ai_bot.db.models import Source, Keyword, Post, NewsItem
+from ai_bot.db.db_manager import get_db_sync, sync_session_factory
+from ai_bot.db.models import Source, Keyword, Post, NewsItem, BatchJob
 from ai_bot.api.schemas import (
     SourceCreate, SourceUpdate, SourceResponse,
     KeywordCreate, KeywordUpdate, KeywordResponse,
     PostResponse,
     GenerateRequest, GenerateResponse,
+    GenerateBatchRequest, GenerateBatchResponse, GenerateTaskStatusResponse,
     PaginatedResponse, ErrorResponse
 )
-from ai_bot.ai.generator import generate_posts
+from ai_bot.ai.generator import INSTRUCTIONS, build_prompt, generate_posts_batch, generate_posts_many
+from ai_bot.ai.cache import get_llm_cache
+from ai_bot.ai.openai_client import (
+    StreamInterruptedError, get_providers_state, iter_on_llm_loop, make_request_stream, run_on_llm_loop
+)
 from ai_bot.db.models_utils import PostStatus
+from ai_bot.celery.celery_worker import celery_app
+from ai_bot.celery.tasks import generate_post_task
+from ai_bot.utils import reserve_posts_for_batch, save_generated_posts, select_news_for_batch
 
 router = APIRouter()
 
@@ -151,37 +163,28 @@ async def get_posts(
     db: Session = Depends(get_db_sync)
 ):
     """Получить историю постов"""
-    query = db.query(Post)
+    # Связанные новости подгружаем одним дополнительным запросом
+    query = db.query(Post).options(selectinload(Post.news_item))
     if status:
         query = query.filter(Post.status == status)
 
     posts = query.offset(skip).limit(limit).all()
-
-    # Загружаем связанные новости
-    for post in posts:
-        if post.news_item is None:
-            post.news_item = db.query(NewsItem).filter(NewsItem.id == post.news_id).first()
-
     return posts
 
 @router.get("/posts/{post_id}", response_model=PostResponse, tags=["История постов"])
 async def get_post(post_id: str, db: Session = Depends(get_db_sync)):
     """Получить пост по ID"""
-    post = db.query(Post).filter(Post.id == post_id).first()
+    post = db.query(Post).options(selectinload(Post.news_item)).filter(Post.id == post_id).first()
     if not post:
         raise HTTPException(status_code=404, detail="Пост не найден")
 
-    # Загружаем связанную новость
-    if post.news_item is None:
-        post.news_item = db.query(NewsItem).filter(NewsItem.id == post.news_id).first()
-
     return post
 
 
 
 @router.post("/generate/", response_model=GenerateResponse, tags=["Генерация постов"])
-async def generate_post_manual(request: GenerateRequest, db: Session = Depends(get_db_sync)):
-    """Вручную сгенерировать пост для новости"""
+async def generate_post_manual(request: GenerateRequest, response: Response, db: Session = Depends(get_db_sync)):
+    """Вручную сгенерировать пост для новости (генерация выполняется в Celery)"""
     # Проверяем существование новости
     news_item = db.query(NewsItem).filter(NewsItem.id == request.news_id).first()
     if not news_item:
@@ -197,40 +200,142 @@ async def generate_post_manual(request: GenerateRequest, db: Session = Depends(g
             generated_text=existing_post.generated_text
         )
 
-    try:
-        # Генерируем пост
-        generated_text = generate_posts(news_item)
-
-        if not generated_text:
-            raise HTTPException(status_code=500, detail="Не удалось сгенерировать пост")
-
-        # Создаем или обновляем пост
-        if existing_post:
-            existing_post.generated_text = generated_text
-            existing_post.status = PostStatus.GENERATED
-            post = existing_post
+    # Генерация занимает секунды, поэтому не держим HTTP запрос, а ставим задачу в очередь
+    task = generate_post_task.delay(request.news_id)
+    response.status_code = 202
+
+    return GenerateResponse(
+        success=True,
+        message="Генерация поста поставлена в очередь",
+        task_id=task.id
+    )
+
+
+@router.get("/generate/{task_id}/status", response_model=GenerateTaskStatusResponse, tags=["Генерация постов"])
+async def get_generate_status(task_id: str):
+    """Получить статус задачи генерации поста"""
+    result = AsyncResult(task_id, app=celery_app)
+    task_result = result.result if result.successful() else None
+
+    return GenerateTaskStatusResponse(
+        task_id=task_id,
+        status=result.status,
+        post_id=task_result.get('post_id') if task_result else None,
+        generated_text=task_result.get('generated_text') if task_result else None,
+        error=str(result.result) if result.failed() else None
+    )
+
+
+def _sse_event(data: str, event: Optional[str] = None) -> str:
+    """Форматирует событие Server-Sent Events (многострочные данные разбиваются на строки data:)."""
+    lines = [f"event: {event}"] if event else []
+    lines += [f"data: {line}" for line in data.split("\n")]
+    return "\n".join(lines) + "\n\n"
+
+
+def _save_streamed_post(news_id: str, generated_text: Optional[str]) -> None:
+    """
+    Сохраняет результат потоковой генерации в пост новости.
+    
+    Статус меняется только у новых (NEW) и проваленных (FAILED) постов. Уже сгенерированный
+    пост получает новый текст, но сохраняет статус, а опубликованный не меняется вовсе,
+    чтобы не опубликовать его повторно и не испортить сбоем удачный результат.
+    
+    Args:
+        news_id: ID новости
+        generated_text: Полный текст поста или None, если поток не завершился штатно (пост помечается FAILED)
+    """
+    status = PostStatus.GENERATED if generated_text else PostStatus.FAILED
+    with sync_session_factory() as db:
+        post = db.query(Post).filter(Post.news_id == news_id).first()
+        if post:
+            if post.status in (PostStatus.NEW, PostStatus.FAILED):
+                post.status = status
+                if generated_text:
+                    post.generated_text = generated_text
+            elif post.status == PostStatus.GENERATED and generated_text:
+                post.generated_text = generated_text
         else:
-            post = Post(
-                news_id=request.news_id,
+            db.add(Post(
+                news_id=news_id,
                 generated_text=generated_text,
-                status=PostStatus.GENERATED,
+                status=status,
                 created_at=datetime.now()
-            )
-            db.add(post)
+            ))
+        db.commit()
+
+
+@router.post("/generate/stream/", tags=["Генерация постов"])
+async def generate_post_stream(request: GenerateRequest, db: Session = Depends(get_db_sync)):
+    """Сгенерировать пост с потоковой отдачей текста (text/event-stream)"""
+    news_item = db.query(NewsItem).filter(NewsItem.id == request.news_id).first()
+    if not news_item:
+        raise HTTPException(status_code=404, detail="Новость не найдена")
+
+    prompt = build_prompt(news_item)
+    news_id = news_item.id
 
+    async def event_stream():
+        chunks = []
+        try:
+            async for chunk in iter_on_llm_loop(make_request_stream(INSTRUCTIONS, prompt)):
+                chunks.append(chunk)
+                yield _sse_event(chunk)
+        except StreamInterruptedError as e:
+            # Обрезанный текст не сохраняем, чтобы он не ушел в публикацию
+            await run_in_threadpool(_save_streamed_post, news_id, None)
+            yield _sse_event(str(e), event="error")
+            return
+
+        # Оборванный при отключении клиента поток сюда не доходит и тоже не сохраняется
+        await run_in_threadpool(_save_streamed_post, news_id, "".join(chunks))
+        yield _sse_event("", event="done")
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+@router.post("/generate/batch/", response_model=GenerateBatchResponse, tags=["Генерация постов"])
+async def generate_posts_batch_manual(request: GenerateBatchRequest, db: Session = Depends(get_db_sync)):
+    """Сгенерировать посты для набора новостей через OpenAI Batch API или сразу (realtime)"""
+    news_items = db.query(NewsItem).filter(NewsItem.id.in_(request.news_ids)).all()
+    if not news_items:
+        raise HTTPException(status_code=404, detail="Новости не найдены")
+
+    if request.realtime:
+        results = await run_on_llm_loop(generate_posts_many(news_items))
+
+        saved = save_generated_posts(db, results)
         db.commit()
-        db.refresh(post)
 
-        return GenerateResponse(
-            success=True,
-            message="Пост успешно сгенерирован",
-            post_id=post.id,
-            generated_text=generated_text
+        return GenerateBatchResponse(
+            success=bool(results),
+            message=f"Сгенерировано постов: {len(results)} из {len(news_items)}, сохранено: {saved}",
+            news_count=len(news_items),
+            generated=saved
         )
 
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(status_code=500, detail=f"Ошибка генерации поста: {str(e)}")
+    news_items = select_news_for_batch(db, news_items)
+    if not news_items:
+        raise HTTPException(status_code=409, detail="Посты для этих новостей уже сгенерированы или ждут другого батча")
+
+    batch_id = await run_on_llm_loop(generate_posts_batch(news_items))
+    if not batch_id:
+        raise HTTPException(status_code=500, detail="Не удалось создать батч генерации")
+
+    # Посты закрепляются за батчем, чтобы обычная генерация их не трогала до прихода результатов
+    reserve_posts_for_batch(db, [item.id for item in news_items], batch_id)
+    batch_job = BatchJob(batch_id=batch_id, news_count=len(news_items), created_at=datetime.now())
+    db.add(batch_job)
+    db.commit()
+    db.refresh(batch_job)
+
+    return GenerateBatchResponse(
+        success=True,
+        message="Батч генерации отправлен",
+        batch_job_id=batch_job.id,
+        batch_id=batch_id,
+        news_count=len(news_items)
+    )
 
 
 # === HEALTH CHECK ===
@@ -238,7 +343,7 @@ async def generate_post_manual(request: GenerateRequest, db: Session = Depends(g
 @router.get("/health/", tags=["Системные"])
 async def health_check():
     """Проверка работоспособности API"""
-    return {"status": "healthy", "timestamp": datetime.now()}
+    return {"status": "healthy", "timestamp": datetime.now(), "ai_providers": get_providers_state()}
 
 
 # === STATISTICS ===
@@ -246,12 +351,18 @@ async def health_check():
 @router.get("/stats/", tags=["Статистика"])
 async def get_stats(db: Session = Depends(get_db_sync)):
     """Получить статистику системы"""
-    total_sources = db.query(Source).count()
-    active_sources = db.query(Source).filter(Source.enabled == True).count()
-    total_keywords = db.query(Keyword).count()
-    total_news = db.query(NewsItem).count()
-    total_posts = db.query(Post).count()
-    published_posts = db.query(Post).filter(Post.status == PostStatus.PUBLISHED).count()
+    # Все счетчики одним запросом через скалярные подзапросы
+    counters = db.execute(select(
+        select(func.count()).select_from(Source).scalar_subquery(),
+        select(func.count()).select_from(Source).where(Source.enabled == True).scalar_subquery(),
+        select(func.count()).select_from(Keyword).scalar_subquery(),
+        select(func.count()).select_from(NewsItem).scalar_subquery(),
+        select(func.count()).select_from(Post).scalar_subquery(),
+        select(func.count()).select_from(Post).where(Post.status == PostStatus.PUBLISHED).scalar_subquery(),
+    )).one()
+    total_sources, active_sources, total_keywords, total_news, total_posts, published_posts = counters
+    # Первое обращение к кэшу подключается к Redis, а статистика читается из Redis - не в event loop
+    llm_cache_stats = await run_in_threadpool(lambda: get_llm_cache().get_stats())
 
     return {
         "sources": {
@@ -263,5 +374,6 @@ async def get_stats(db: Session = Depends(get_db_sync)):
         "posts": {
             "total": total_posts,
             "published": published_posts
-        }
+        },
+        "llm_cache": llm_cache_stats
     }
\ No newline at end of file
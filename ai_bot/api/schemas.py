@@ -83,6 +83,27 @@ class GenerateResponse(BaseModel):
     message: str
     post_id: Optional[str] = None
     generated_text: Optional[str] = None
+    task_id: Optional[str] = None
+
+class GenerateTaskStatusResponse(BaseModel):
+    task_id: str
+    status: str
+    post_id: Optional[str] = None
+    generated_text: Optional[str] = None
+    error: Optional[str] = None
+
+
+class GenerateBatchRequest(BaseModel):
+    news_ids: List[str] = Field(..., min_length=1, description="ID новостей для пакетной генерации")
+    realtime: bool = Field(False, description="Сгенерировать сразу, объединяя новости в общие запросы, вместо Batch API")
+
+class GenerateBatchResponse(BaseModel):
+    success: bool
+    message: str
+    batch_job_id: Optional[str] = None
+    batch_id: Optional[str] = None
+    news_count: int = 0
+    generated: int = 0
 
 
 class PaginatedResponse(BaseModel):
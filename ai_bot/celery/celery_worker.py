@@ -3,6 +3,7 @@
 import platform
 from datetime import timedelta
 from celery import Celery
+from celery.signals import worker_process_init, worker_process_shutdown
 from ai_bot.config import settings
 
 celery_app = Celery(
@@ -28,10 +29,11 @@ celery_app.conf.update(
     task_time_limit=600,  # 10 минут
     task_soft_time_limit=300,  # 5 минут
     
-    worker_prefetch_multiplier=1,
+    # Задачи генерации ждут ответа LLM, поэтому воркер берет несколько задач заранее
+    worker_prefetch_multiplier=4,
     # Исправление для работы на Windows
-    worker_cool='solo' if platform.system() == 'Windows' else 'prefork',
-    worker_concurrency=1 if platform.system() == 'Windows' else None,
+    worker_pool='solo' if platform.system() == 'Windows' else 'prefork',
+    worker_concurrency=1 if platform.system() == 'Windows' else settings.CELERY_WORKER_CONCURRENCY,
     
     default_queue='default',
     default_exchange='default',
@@ -41,12 +43,45 @@ celery_app.conf.update(
     timezone='Europe/Moscow',
     enable_utc=True,
     beat_schedule={
-        'parse_news': {
-            'task': 'ai_bot.celery.tasks.parse_news',
+        'news_pipeline': {
+            'task': 'ai_bot.celery.tasks.news_pipeline',
             'schedule': timedelta(minutes=settings.PARSE_INTERVAL_MINUTES),
+        },
+        'poll_batches': {
+            'task': 'ai_bot.celery.tasks.poll_batches',
+            'schedule': timedelta(seconds=60),
         }
     }
 )
 
+
+@worker_process_init.connect
+def _init_db_engine(**kwargs):
+    """Создает пул соединений БД один раз на процесс воркера."""
+    from ai_bot.db.db_manager import init_worker_engine
+    init_worker_engine()
+
+
+@worker_process_shutdown.connect
+def _save_semantic_cache(**kwargs):
+    """Сохраняет семантический кэш при остановке процесса воркера."""
+    from ai_bot.ai.semantic_cache import save_semantic_cache
+    save_semantic_cache()
+
+
+@worker_process_shutdown.connect
+def _disconnect_telegram_clients(**kwargs):
+    """Отключает переиспользуемые Telethon клиенты при остановке процесса воркера."""
+    from ai_bot.news_parser.telegram import close_clients
+    close_clients()
+
+
+@worker_process_shutdown.connect
+def _dispose_db_engine(**kwargs):
+    """Закрывает соединения БД при остановке процесса воркера."""
+    from ai_bot.db.db_manager import dispose_worker_engine
+    dispose_worker_engine()
+
+
 if __name__ == '__main__':
     celery_app.start()
\ No newline at end of file
@@ -1,91 +1,254 @@
 import asyncio
 import logging
 from datetime import datetime
+from typing import Callable, Optional
+
+from celery import chain
+from sqlalchemy import update
 
 from ai_bot.ai.generator import generate_posts
+from ai_bot.ai.openai_client import get_batch_results, run_sync
 from ai_bot.db.models import NewsItem
 from ai_bot.db.models_utils import PostStatus
-from ai_bot.db.db_manager import get_db_sync
-from ai_bot.db.models import Source, Post
+from ai_bot.db.db_manager import session_scope
+from ai_bot.db.models import Source, Post, BatchJob
 from ai_bot.db.models_utils import SourceType
-from ai_bot.telegram.publisher import publish_post
-from ai_bot.utils import parse_site_source, parse_telegram_source, filter_news_by_keywords
+from ai_bot.news_parser.sites import parse_all
+from ai_bot.news_parser.telegram import confirm_messages_saved, parse_telegram_channels_async
+from ai_bot.telegram.publisher import PublishRateLimitedError, can_group_posts, publish_post, publish_post_batch
+from ai_bot.utils import (
+    get_site_parser, filter_valid_news, filter_news_by_keywords, load_keywords,
+    release_batch_posts, save_generated_posts, save_news_items
+)
 from ai_bot.celery.celery_worker import celery_app
 
 logger = logging.getLogger(__name__)
 
+# Статусы OpenAI Batch API, после которых батч больше не меняется
+BATCH_FINAL_STATUSES = ('completed', 'failed', 'expired', 'cancelled')
 
-@celery_app.task(name='ai_bot.celery.tasks.parse_news', bind=True, max_retries=3)
-def parse_news(self):
+# Максимум одновременных запросов к сайтам-источникам
+PARSE_MAX_CONCURRENCY = 5
+
+# Количество последних сообщений, запрашиваемых из каждого Telegram канала
+TG_PARSE_LIMIT = 10
+
+# Сколько ожидающих постов загружать из БД за один запрос
+PENDING_CHUNK_SIZE = 100
+
+# Сколько изменений постов накапливать перед одним bulk UPDATE и коммитом
+POST_UPDATE_BATCH_SIZE = 50
+
+# Сколько постов генерировать параллельно (фактическую нагрузку на провайдеров ограничивают лимитеры AI клиента)
+GENERATION_GROUP_SIZE = 8
+
+
+class _ChunkedQuery:
     """
-    Задача Celery для парсинга новостей из всех активных источников.
+    Перебирает результат запроса порциями по PENDING_CHUNK_SIZE строк (keyset-пагинация по Post.id).
     
-    Получает активные источники из БД, парсит их (сайты и Telegram-каналы)
-    и сохраняет новости. Автоматически запускает генерацию постов после успешного парсинга.
+    В отличие от yield_per не держит открытый курсор: задачи коммитят изменения
+    внутри цикла, а коммит закрыл бы серверный курсор. В памяти одновременно
+    находится только одна порция. processed - количество уже выданных строк.
+    """
+
+    def __init__(self, query):
+        self.query = query
+        self.processed = 0
+
+    def __iter__(self):
+        last_id = None
+        while True:
+            query = self.query if last_id is None else self.query.filter(Post.id > last_id)
+            rows = query.order_by(Post.id).limit(PENDING_CHUNK_SIZE).all()
+            if not rows:
+                return
+            for row in rows:
+                self.processed += 1
+                yield row
+            last = rows[-1]
+            last_id = last.id if isinstance(last, Post) else last[0].id
+
+
+def _save_parsed_news(session, source_name: str, result: list[dict] | BaseException,
+                      on_saved: Optional[Callable[[list[dict]], None]] = None) -> int:
+    """
+    Сохраняет результат парсинга одного источника.
     
+    Args:
+        session: Сессия БД
+        source_name: Имя источника (для логов)
+        result: Список новостей или исключение, с которым упал парсинг
+        on_saved: Вызывается с результатом парсинга только после успешного сохранения
+            (парсеры запоминают обработанное, не теряя новости при ошибке сохранения)
+        
     Returns:
-        Словарь с результатами: {'status': 'success', 'saved': int, 'sources_processed': int}
+        Количество сохраненных новостей
     """
-    logger.info('Начало парсинга новостей...')
+    if isinstance(result, BaseException):
+        logger.error(f"Ошибка при парсинге источника '{source_name}': {result}")
+        return 0
 
     try:
-        db_gen = get_db_sync()
-        session = next(db_gen)
+        news_items = filter_valid_news(source_name, result)
+        saved = save_news_items(session, news_items) if news_items else 0
+        if on_saved:
+            on_saved(result)
+        if news_items:
+            logger.info(f"Источник '{source_name}': сохранено {saved} новостей")
+        return saved
+    except Exception as e:
+        logger.error(f"Ошибка при обработке источника '{source_name}': {e}", exc_info=True)
+        session.rollback()
+        return 0
 
-        try:
-            sources = session.query(Source).filter(Source.enabled == True).all()
 
-            if not sources:
-                logger.warning("Не найдено активных источников для парсинга")
-                return {'status': 'success', 'saved': 0, 'sources_processed': 0}
+async def _parse_sources(site_parsers: list, tg_usernames: list[str]) -> tuple[list, list]:
+    """
+    Параллельно парсит сайты и Telegram каналы: обе группы - сетевой ввод-вывод.
+    
+    Returns:
+        Результаты сайтов и каналов в порядке аргументов; для упавших источников - исключение
+    """
+    async def parse_sites() -> list:
+        return await parse_all(site_parsers, PARSE_MAX_CONCURRENCY) if site_parsers else []
 
-            logger.info(f"Найдено активных источников: {len(sources)}")
+    async def parse_channels() -> list:
+        return await parse_telegram_channels_async(tg_usernames, limit=TG_PARSE_LIMIT) if tg_usernames else []
 
-            total_saved = 0
-            for source in sources:
-                # Сохраняем имя источника до обработки, чтобы избежать проблем с rollback
-                source_name = source.name
-                try:
-                    source_type = source.type
+    site_results, tg_results = await asyncio.gather(parse_sites(), parse_channels(), return_exceptions=True)
+    # Если группа упала целиком, ошибка относится к каждому ее источнику
+    if isinstance(site_results, BaseException):
+        site_results = [site_results] * len(site_parsers)
+    if isinstance(tg_results, BaseException):
+        tg_results = [tg_results] * len(tg_usernames)
+    return site_results, tg_results
 
-                    if source_type == SourceType.SITE:
-                        saved = parse_site_source(session, source)
-                    elif source_type == SourceType.TG:
-                        saved = parse_telegram_source(session, source)
-                    else:
-                        logger.warning(f"Неизвестный тип источника: {source_type} для '{source_name}'")
-                        saved = 0
 
-                    total_saved += saved
+async def _generate_many(news_items: list[NewsItem]) -> list:
+    """Генерирует посты для новостей одновременно; исключения возвращаются вместо результатов."""
+    return await asyncio.gather(*(generate_posts(news_item) for news_item in news_items), return_exceptions=True)
 
-                except Exception as e:
-                    logger.error(f"Ошибка при обработке источника '{source_name}': {e}", exc_info=True)
-                    session.rollback()
-                    continue
 
-            logger.info(f'Парсинг завершен. Всего сохранено новостей: {total_saved}')
+def _generate_group(group: list[tuple[Post, NewsItem]], updates: list[dict]) -> int:
+    """
+    Генерирует посты для группы новостей параллельно и добавляет их новые статусы в updates.
+    
+    Returns:
+        Количество сгенерированных постов
+    """
+    if not group:
+        return 0
+
+    generated_count = 0
+    results = run_sync(_generate_many([news_item for _, news_item in group]))
+    for (post, news_item), post_text in zip(group, results):
+        update_row = {'id': post.id, 'news_id': post.news_id, 'status': PostStatus.FAILED}
+        if isinstance(post_text, BaseException):
+            logger.error(f'Ошибка при генерации поста для новости {post.news_id}: {post_text}', exc_info=post_text)
+        elif not post_text:
+            logger.warning(f'Не удалось сгенерировать пост для новости {news_item.id}')
+        else:
+            update_row.update(generated_text=post_text, status=PostStatus.GENERATED)
+            generated_count += 1
+            logger.info(f'Сгенерирован пост для новости {news_item.id}')
+        updates.append(update_row)
+
+    group.clear()
+    return generated_count
+
+
+def _flush_post_updates(session, updates: list[dict]) -> None:
+    """Записывает накопленные изменения постов одним bulk UPDATE по первичному ключу и коммитит."""
+    if updates:
+        session.execute(update(Post), updates)
+        session.commit()
+        updates.clear()
+
+
+@celery_app.task(name='ai_bot.celery.tasks.news_pipeline')
+def news_pipeline():
+    """
+    Запускает конвейер парсинг -> генерация -> публикация одной цепочкой Celery.
+    
+    Каждая задача получает результат предыдущей и пропускает работу, если новых данных нет.
+    
+    Returns:
+        ID запущенной цепочки
+    """
+    workflow = chain(parse_news.s(), generate_posts_task.s(), publish_posts_task.s())
+    return workflow.apply_async().id
 
-            result = {
-                'status': 'success',
-                'saved': total_saved,
-                'sources_processed': len(sources)
-            }
 
-            # Автоматически запускаем генерацию постов после успешного парсинга
-            if total_saved > 0:
-                logger.info(f'Запускаем генерацию постов для {total_saved} новых новостей')
-                generate_posts_task.delay()
+@celery_app.task(name='ai_bot.celery.tasks.parse_news', bind=True, max_retries=3)
+def parse_news(self):
+    """
+    Задача Celery для парсинга новостей из всех активных источников.
+    
+    Получает активные источники из БД, парсит их (сайты и Telegram-каналы)
+    и сохраняет новости. Генерацию и публикацию запускает цепочка news_pipeline.
+    
+    Returns:
+        Словарь с результатами: {'status': 'success', 'saved': int, 'sources_processed': int}
+    """
+    logger.info('Начало парсинга новостей...')
 
-            return result
-        except Exception as e:
-            logger.error(f'Ошибка при парсинге новостей: {e}', exc_info=True)
-            session.rollback()
-            raise
-        finally:
+    try:
+        with session_scope() as session:
             try:
-                next(db_gen)
-            except StopIteration:
-                pass
+                sources = session.query(Source).filter(Source.enabled == True).all()
+
+                if not sources:
+                    logger.warning("Не найдено активных источников для парсинга")
+                    return {'status': 'success', 'saved': 0, 'sources_processed': 0}
+
+                logger.info(f"Найдено активных источников: {len(sources)}")
+
+                total_saved = 0
+
+                # Сайты (asyncio + httpx) и Telegram каналы (один подключенный клиент) загружаем
+                # параллельно; сохранение в БД - последовательно в этом потоке
+                site_parsers = [
+                    (source.name, parser)
+                    for source in sources if source.type == SourceType.SITE
+                    if (parser := get_site_parser(source.name, source.url))
+                ]
+
+                tg_sources = []
+                for source in sources:
+                    if source.type == SourceType.SITE:
+                        continue
+                    if source.type != SourceType.TG:
+                        logger.warning(f"Неизвестный тип источника: {source.type} для '{source.name}'")
+                    elif not source.url:
+                        logger.warning(f"Не указан username канала для источника: {source.name}")
+                    else:
+                        # URL для TG источников - это username канала
+                        tg_sources.append((source.name, source.url))
+
+                site_results, tg_results = run_sync(_parse_sources(
+                    [parser for _, parser in site_parsers],
+                    [url for _, url in tg_sources]
+                ))
+                for (source_name, parser), result in zip(site_parsers, site_results):
+                    total_saved += _save_parsed_news(session, source_name, result, on_saved=parser.remember_urls)
+                for (source_name, username), result in zip(tg_sources, tg_results):
+                    total_saved += _save_parsed_news(session, source_name, result,
+                                                     on_saved=lambda _, username=username: confirm_messages_saved(username))
+
+                logger.info(f'Парсинг завершен. Всего сохранено новостей: {total_saved}')
+
+                result = {
+                    'status': 'success',
+                    'saved': total_saved,
+                    'sources_processed': len(sources)
+                }
+
+                return result
+            except Exception as e:
+                logger.error(f'Ошибка при парсинге новостей: {e}', exc_info=True)
+                session.rollback()
+                raise
 
     except Exception as e:
         logger.error(f'Критическая ошибка при парсинге новостей: {e}', exc_info=True)
@@ -93,149 +256,279 @@ def parse_news(self):
 
 
 @celery_app.task(name='ai_bot.celery.tasks.generate_posts', bind=True, max_retries=3)
-def generate_posts_task(self):
+def generate_posts_task(self, parse_result: dict | None = None):
     """
     Задача Celery для генерации постов из новостей.
     
     Обрабатывает посты со статусом NEW: фильтрует по ключевым словам,
     генерирует текст через AI и обновляет статус на GENERATED.
-    Автоматически запускает публикацию после успешной генерации.
+    
+    Args:
+        parse_result: Результат parse_news при запуске в цепочке news_pipeline
     
     Returns:
         Словарь с результатами: {'status': 'success', 'generated': int}
     """
+    if parse_result is not None and not parse_result.get('saved'):
+        logger.info('Новых новостей нет, генерация пропущена')
+        return {'status': 'skipped', 'generated': 0}
+
     logger.info('Выполняем задачу генерации постов по новости')
     try:
-        db_gen = get_db_sync()
-        session = next(db_gen)
-
-        try:
-            # Находим посты со статусом NEW и получаем связанные новости
-            posts = session.query(Post).filter(Post.status == PostStatus.NEW).all()
-            if not posts:
-                logger.info('Нет новых постов для генерации')
-                return {'status': 'success', 'generated': 0}
-
-            generated_count = 0
-            for post in posts:
-                try:
-                    news_item = session.query(NewsItem).filter(NewsItem.id == post.news_id).first()
-                    if not news_item:
-                        logger.warning(f'Новость с id {post.news_id} не найдена')
-                        continue
-
-                    # Фильтруем новость по ключевым словам
-                    if not filter_news_by_keywords(session, news_item):
-                        logger.info(f'Новость {news_item.id} не прошла фильтрацию по ключевым словам, пропускаем генерацию')
-                        post.status = PostStatus.FAILED
-                        continue
-
-                    post_text = generate_posts(news_item)
-                    if not post_text:
-                        post.status = PostStatus.FAILED
-                        logger.warning(f'Не удалось сгенерировать пост для новости {news_item.id}')
-                        continue
+        with session_scope() as session:
+            try:
+                # Посты со статусом NEW вместе с новостями (JOIN), порциями по PENDING_CHUNK_SIZE.
+                # Посты, ожидающие результата Batch API, пропускаются: иначе они были бы сгенерированы дважды
+                posts = _ChunkedQuery(
+                    session.query(Post, NewsItem)
+                    .join(Post.news_item)
+                    .filter(Post.status == PostStatus.NEW, Post.batch_id.is_(None))
+                )
+
+                # Ключевые слова загружаем один раз на запуск задачи, а не для каждой новости
+                keywords = load_keywords(session)
+
+                generated_count = 0
+                updates = []
+                # Новости, прошедшие фильтрацию, генерируются группами параллельно
+                group = []
+                for post, news_item in posts:
+                    try:
+                        # Фильтруем новость по ключевым словам
+                        if filter_news_by_keywords(session, news_item, keywords):
+                            group.append((post, news_item))
+                        else:
+                            logger.info(f'Новость {news_item.id} не прошла фильтрацию по ключевым словам, пропускаем генерацию')
+                            updates.append({'id': post.id, 'news_id': post.news_id, 'status': PostStatus.FAILED})
+                    except Exception as e:
+                        logger.error(f'Ошибка при фильтрации новости {post.news_id}: {e}', exc_info=True)
+                        updates.append({'id': post.id, 'news_id': post.news_id, 'status': PostStatus.FAILED})
+
+                    if len(group) >= GENERATION_GROUP_SIZE:
+                        generated_count += _generate_group(group, updates)
+                    if len(updates) >= POST_UPDATE_BATCH_SIZE:
+                        _flush_post_updates(session, updates)
+
+                generated_count += _generate_group(group, updates)
+                _flush_post_updates(session, updates)
+                if not posts.processed:
+                    logger.info('Нет новых постов для генерации')
+                    return {'status': 'success', 'generated': 0}
+                logger.info(f'Генерация завершена. Сгенерировано постов: {generated_count}')
+
+                return {'status': 'success', 'generated': generated_count}
+
+            except Exception as e:
+                logger.error(f'Ошибка при генерации постов: {e}', exc_info=True)
+                session.rollback()
+                raise
 
-                    # Обновляем существующий пост
-                    post.generated_text = post_text
-                    post.status = PostStatus.GENERATED
-                    generated_count += 1
-                    logger.info(f'Сгенерирован пост для новости {news_item.id}')
+    except Exception as e:
+        logger.error(f'Критическая ошибка при генерации постов: {e}', exc_info=True)
+        raise self.retry(exc=e, countdown=60)
 
-                    # Коммитим каждую успешную генерацию
-                    session.commit()
 
-                except Exception as e:
-                    logger.error(f'Ошибка при генерации поста для новости {post.news_id}: {e}', exc_info=True)
-                    post.status = PostStatus.FAILED
-                    # Коммитим даже при ошибке, чтобы статус FAILED сохранился
-                    session.commit()
-                    continue
+@celery_app.task(name='ai_bot.celery.tasks.generate_post', bind=True, max_retries=3)
+def generate_post_task(self, news_id: str):
+    """
+    Задача Celery для генерации поста по одной новости (ручной запуск через API).
+    
+    Генерирует текст через AI и создает или обновляет пост со статусом GENERATED.
+    
+    Args:
+        news_id: ID новости
+        
+    Returns:
+        Словарь с результатами: {'status': 'success', 'post_id': str, 'generated_text': str}
+    """
+    logger.info(f'Генерация поста по запросу API для новости {news_id}')
+    with session_scope() as session:
+        try:
+            news_item = session.query(NewsItem).filter(NewsItem.id == news_id).first()
+            if not news_item:
+                raise ValueError(f'Новость с id {news_id} не найдена')
+
+            generated_text = run_sync(generate_posts(news_item))
+            if not generated_text:
+                raise RuntimeError(f'Не удалось сгенерировать пост для новости {news_id}')
+
+            post = session.query(Post).filter(Post.news_id == news_id).first()
+            if post:
+                post.generated_text = generated_text
+                post.status = PostStatus.GENERATED
+            else:
+                post = Post(
+                    news_id=news_id,
+                    generated_text=generated_text,
+                    status=PostStatus.GENERATED,
+                    created_at=datetime.now()
+                )
+                session.add(post)
 
-            # Финальный коммит для remaining постов
             session.commit()
-            logger.info(f'Генерация завершена. Сгенерировано постов: {generated_count}')
-
-            if generated_count > 0:
-                logger.info(f'Запускаем публикацию постов для {generated_count} новых новостей')
-                publish_posts_task.delay()
-
-            return {'status': 'success', 'generated': generated_count}
+            return {'status': 'success', 'post_id': post.id, 'generated_text': generated_text}
 
         except Exception as e:
-            logger.error(f'Ошибка при генерации постов: {e}', exc_info=True)
+            logger.error(f'Ошибка при генерации поста для новости {news_id}: {e}', exc_info=True)
             session.rollback()
             raise
-        finally:
-            try:
-                next(db_gen)
-            except StopIteration:
-                pass
 
+
+def _publish_group(session, group: list[Post], updates: list[dict]) -> bool:
+    """
+    Публикует группу постов (один пост - обычным сообщением) и добавляет их новые статусы в updates.
+    
+    Returns:
+        True если публикация успешна
+        
+    Raises:
+        PublishRateLimitedError: Telegram ограничил отправку, статусы группы не меняются
+    """
+    texts = [post.generated_text for post in group]
+    try:
+        success = publish_post(texts[0]) if len(texts) == 1 else publish_post_batch(texts)
+    except PublishRateLimitedError:
+        raise
     except Exception as e:
-        logger.error(f'Критическая ошибка при генерации постов: {e}', exc_info=True)
-        raise self.retry(exc=e, countdown=60)
+        logger.error(f'Ошибка при публикации постов {[post.id for post in group]}: {e}', exc_info=True)
+        success = False
+
+    published_at = datetime.now()
+    for post in group:
+        if success:
+            updates.append({'id': post.id, 'news_id': post.news_id,
+                            'status': PostStatus.PUBLISHED, 'published_at': published_at})
+            logger.info(f'Опубликован пост {post.id}')
+        else:
+            updates.append({'id': post.id, 'news_id': post.news_id, 'status': PostStatus.FAILED})
+            logger.warning(f'Не удалось опубликовать пост {post.id}')
+
+    if len(updates) >= POST_UPDATE_BATCH_SIZE:
+        _flush_post_updates(session, updates)
+    return success
 
 
 @celery_app.task(name='ai_bot.celery.tasks.publish_posts', bind=True, max_retries=3)
-def publish_posts_task(self):
+def publish_posts_task(self, generate_result: dict | None = None):
     """
     Задача Celery для публикации постов в Telegram канал.
     
     Обрабатывает посты со статусом GENERATED: публикует их в Telegram
     через Bot API или Telethon и обновляет статус на PUBLISHED или FAILED.
     
+    Args:
+        generate_result: Результат generate_posts_task при запуске в цепочке news_pipeline
+    
     Returns:
-        Словарь с результатами: {'status': 'success', 'published': int, 'failed': int}
+        Словарь с результатами: {'status': 'success' | 'rate_limited', 'published': int, 'failed': int}
     """
+    if generate_result is not None and not generate_result.get('generated'):
+        logger.info('Новых постов нет, публикация пропущена')
+        return {'status': 'skipped', 'published': 0, 'failed': 0}
+
     logger.info('Начинаем публикацию постов')
     try:
-        db_gen = get_db_sync()
-        session = next(db_gen)
-        try:
-            posts = session.query(Post).filter(Post.status == PostStatus.GENERATED).all()
-            if not posts:
-                logger.info('Нет новых постов для публикации')
-                return {'status': 'success', 'published': 0, 'failed': 0}
-
-            published = failed = 0
-            for post in posts:
-                if not post.generated_text:
-                    logger.warning(f'Пост {post.id} не имеет сгенерированного текста')
-                    continue
-                
+        with session_scope() as session:
+            try:
+                posts = _ChunkedQuery(session.query(Post).filter(Post.status == PostStatus.GENERATED))
+
+                published = failed = 0
+                updates = []
+                # При TELEGRAM_PUBLISH_GROUP_SIZE > 1 подряд идущие посты публикуются одним сообщением
+                group = []
                 try:
-                    success = publish_post(post.generated_text)
+                    for post in posts:
+                        if not post.generated_text:
+                            logger.warning(f'Пост {post.id} не имеет сгенерированного текста')
+                            continue
+
+                        if group and not can_group_posts([p.generated_text for p in group], post.generated_text):
+                            if _publish_group(session, group, updates):
+                                published += len(group)
+                            else:
+                                failed += len(group)
+                            group = []
+                        group.append(post)
+
+                    if group:
+                        if _publish_group(session, group, updates):
+                            published += len(group)
+                        else:
+                            failed += len(group)
+                except PublishRateLimitedError as e:
+                    # Не ждем в задаче: оставшиеся посты остаются GENERATED и публикуются отложенным запуском
+                    _flush_post_updates(session, updates)
+                    logger.warning(f'Публикация остановлена лимитом Telegram ({e.retry_after} с). '
+                                   f'Опубликовано постов: {published}, остальные будут опубликованы позже')
+                    publish_posts_task.apply_async(countdown=e.retry_after)
+                    return {'status': 'rate_limited', 'published': published, 'failed': failed}
+
+                _flush_post_updates(session, updates)
+                if not posts.processed:
+                    logger.info('Нет новых постов для публикации')
+                    return {'status': 'success', 'published': 0, 'failed': 0}
+                logger.info(f'Публикация завершена. Опубликовано постов: {published}. Провалено постов: {failed}')
+                return {'status': 'success', 'published': published, 'failed': failed}
+            except Exception as e:
+                logger.error(f'Ошибка при публикации постов: {e}', exc_info=True)
+                session.rollback()
+                raise
 
-                    if success:
-                        post.status = PostStatus.PUBLISHED
-                        post.published_at = datetime.now()
-                        logger.info(f'Опубликован пост {post.id}')
-                        published += 1
-                    else:
-                        post.status = PostStatus.FAILED
-                        logger.warning(f'Не удалось опубликовать пост {post.id}')
-                        failed += 1
+    except Exception as e:
+        logger.error(f'Критическая ошибка при публикации постов: {e}', exc_info=True)
+        raise self.retry(exc=e, countdown=60)
 
-                except Exception as e:
-                    logger.error(f'Ошибка при публикации поста {post.id}: {e}', exc_info=True)
-                    post.status = PostStatus.FAILED
-                    failed += 1
-                    continue
 
-            session.commit()
-            logger.info(f'Публикация завершена. Опубликовано постов: {published}. Провалено постов: {failed}')
-            return {'status': 'success', 'published': published, 'failed': failed}
-        except Exception as e:
-            logger.error(f'Ошибка при публикации постов: {e}', exc_info=True)
-            session.rollback()
-            raise
-        finally:
+@celery_app.task(name='ai_bot.celery.tasks.poll_batches', bind=True, max_retries=3)
+def poll_batches(self):
+    """
+    Задача Celery для проверки батчей OpenAI Batch API.
+    
+    Для каждого незавершенного батча запрашивает статус; у завершенных
+    забирает результаты и записывает тексты в посты по ID новости (custom_id).
+    
+    Returns:
+        Словарь с результатами: {'status': 'success', 'completed': int, 'generated': int}
+    """
+    try:
+        with session_scope() as session:
             try:
-                next(db_gen)
-            except StopIteration:
-                pass
+                jobs = session.query(BatchJob).filter(BatchJob.status.notin_(BATCH_FINAL_STATUSES)).all()
+                if not jobs:
+                    return {'status': 'success', 'completed': 0, 'generated': 0}
+
+                completed = generated = 0
+                for job in jobs:
+                    status, results = run_sync(get_batch_results(job.batch_id))
+                    if not status:
+                        continue
+
+                    job.status = status
+                    if status not in BATCH_FINAL_STATUSES:
+                        continue
+
+                    job.completed_at = datetime.now()
+                    completed += 1
+                    logger.info(f'Батч {job.batch_id} завершен со статусом {status}, результатов: {len(results)}')
+
+                    # Результаты применяются только к постам, которые все еще ждут этот батч
+                    generated += save_generated_posts(session, results, batch_id=job.batch_id)
+                    released = release_batch_posts(session, job.batch_id)
+                    if released:
+                        logger.info(f'Посты без результата батча {job.batch_id} возвращены в обычную генерацию: {released}')
+
+                session.commit()
+
+                if generated > 0:
+                    logger.info(f'Запускаем публикацию постов для {generated} постов из батчей')
+                    publish_posts_task.delay()
+
+                return {'status': 'success', 'completed': completed, 'generated': generated}
+            except Exception as e:
+                logger.error(f'Ошибка при проверке батчей: {e}', exc_info=True)
+                session.rollback()
+                raise
 
     except Exception as e:
-        logger.error(f'Критическая ошибка при публикации постов: {e}', exc_info=True)
-        raise self.retry(exc=e, countdown=60)
\ No newline at end of file
+        logger.error(f'Критическая ошибка при проверке батчей: {e}', exc_info=True)
+        raise self.retry(exc=e, countdown=60)
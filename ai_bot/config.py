@@ -1,5 +1,7 @@
 """Настройки приложения."""
 
+from functools import lru_cache
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from typing import Optional
 
@@ -13,6 +15,11 @@ class Settings(BaseSettings):
     """
     DATABASE_URL: str = 'sqlite:///db/aibot.db'
     REDIS_URL: str = 'redis://localhost:6379/0'
+
+    # Пул соединений синхронного движка БД (для SQLite не применяется)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_RECYCLE: int = 1800  # Пересоздавать соединения старше 30 минут
     
     # Telegram Application API (для Telethon) - получить на https://my.telegram.org/
     TELEGRAM_API_ID: Optional[int] = None
@@ -30,6 +37,20 @@ class Settings(BaseSettings):
     # Список админов (ID пользователей Telegram, разделенные запятой)
     TELEGRAM_ADMIN_USER_IDS: Optional[str] = None
 
+    # Режим получения обновлений админ ботом: 'polling' или 'webhook'
+    TELEGRAM_ADMIN_MODE: str = 'polling'
+    TELEGRAM_ADMIN_WEBHOOK_URL: Optional[str] = None  # Публичный https адрес, например https://bot.example.com
+    TELEGRAM_ADMIN_WEBHOOK_PATH: str = '/admin-bot/webhook'
+    TELEGRAM_ADMIN_WEBHOOK_SECRET: Optional[str] = None  # Проверяется в заголовке X-Telegram-Bot-Api-Secret-Token
+    TELEGRAM_ADMIN_WEBHOOK_HOST: str = '0.0.0.0'
+    TELEGRAM_ADMIN_WEBHOOK_PORT: int = 8081
+
+    # Лимиты отправки сообщений Telegram (на процесс воркера)
+    TELEGRAM_GLOBAL_MESSAGES_PER_SECOND: int = 30
+    TELEGRAM_CHANNEL_MESSAGES_PER_MINUTE: int = 20
+    TELEGRAM_PUBLISH_GROUP_SIZE: int = 1  # >1 - объединять до N постов в одно сообщение
+    TELEGRAM_LINK_PREVIEW: bool = True  # Превью ссылок в постах; false - отправка быстрее (Telegram не загружает страницу)
+
     # Обратная совместимость (устаревшие названия)
     @property
     def TELEGRAM_BOT_TOKEN(self) -> Optional[str]:
@@ -38,6 +59,7 @@ class Settings(BaseSettings):
 
     OPENAI_API_KEY: Optional[str]
     OPENAI_MODEL: str = 'gpt-4o-mini'
+    OPENAI_RAW_HTTP: bool = False  # Вызывать /v1/chat/completions напрямую через httpx, SDK остается fallback
 
     # Альтернативные AI провайдеры
     OLLAMA_BASE_URL: str = 'http://localhost:11434'  # Для локальной Ollama
@@ -48,14 +70,38 @@ class Settings(BaseSettings):
     HUGGINGFACE_API_KEY: Optional[str] = None  # Для Hugging Face Inference API
     TOGETHER_API_KEY: Optional[str] = None  # Для Together AI (есть free tier)
 
+    # Кэш ответов LLM
+    LLM_CACHE_TTL: int = 86400  # Время жизни записи в секундах (сутки)
+    LLM_CACHE_MAX_TEMPERATURE: float = 0.2  # Кэшируем только почти детерминированные запросы (генерация постов идет с 0.7 и не кэшируется)
+
+    # Семантический кэш постов (нужны numpy и sentence-transformers)
+    SEMANTIC_CACHE_ENABLED: bool = False
+    SEMANTIC_CACHE_MODEL: str = 'sentence-transformers/all-MiniLM-L6-v2'
+    SEMANTIC_CACHE_THRESHOLD: float = 0.92  # Минимальная косинусная близость для попадания
+    SEMANTIC_CACHE_MAX_SIZE: int = 10000
+    SEMANTIC_CACHE_PATH: str = 'db/semantic_cache.npz'
+
+    # Адаптивное ограничение параллельных запросов к AI провайдерам
+    LLM_MAX_CONCURRENCY: int = 32
+    LLM_LATENCY_TARGET_MS: int = 10000  # Генерация поста занимает несколько секунд
+
+    # Локальные лимиты запросов/токенов в минуту по провайдерам
+    OPENAI_RPM: int = 500
+    OPENAI_TPM: int = 200000
+    TOGETHER_RPM: int = 60
+    OLLAMA_RPM: int = 60
+
     PROXY_URL: str
     
     CELERY_BROKER_URL: str = 'redis://localhost:6379/0'
     CELERY_RESULT_BACKEND: str = 'redis://localhost:6379/0'
+    CELERY_WORKER_CONCURRENCY: int = 4  # Задачи генерации в основном ждут ответа LLM
     
     PARSE_INTERVAL_MINUTES: int = 30  # Парсим каждые 30 минут, чтобы не забанили
+    SELECTOLAX_PARSER: bool = True  # Разбирать HTML сайтов через selectolax, если он установлен (иначе BeautifulSoup)
     
-    DEBUG: bool = True
+    DEBUG: bool = False  # Запрещает ленивую загрузку Post.news_item (lazy='raise'), чтобы ловить N+1 запросы
+    SQL_ECHO: bool = False  # Логировать каждый SQL запрос (только для отладки)
     
     model_config = SettingsConfigDict(
         env_file = '.env',
@@ -63,5 +109,12 @@ class Settings(BaseSettings):
         case_sensitive = True,
         extra = 'ignore'
     )
-    
-settings = Settings()
\ No newline at end of file
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Возвращает единственный экземпляр настроек (.env читается один раз на процесс)."""
+    return Settings()
+
+
+settings = get_settings()
@@ -1,13 +1,18 @@
+import logging
+from contextlib import contextmanager
 from collections.abc import AsyncGenerator, Generator
 from typing import Any
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect, Engine
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.schema import CreateIndex, CreateColumn
 
 from ai_bot.config import settings
 from ai_bot.db.models import Base
 
+logger = logging.getLogger(__name__)
+
 sync_url = settings.DATABASE_URL
 
 
@@ -27,11 +32,76 @@ def get_async_url() -> str:
     return async_url
 
 
-async_engine = create_async_engine(get_async_url(), echo=settings.DEBUG)
-sync_engine = create_engine(sync_url, echo=settings.DEBUG)
+# Настройки SQLite для частых коммитов: WAL не блокирует читателей писателем,
+# synchronous=NORMAL делает fsync только при checkpoint, а не на каждый коммит
+SQLITE_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA mmap_size=268435456',
+    'PRAGMA cache_size=-64000',
+)
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """Применяет SQLITE_PRAGMAS к каждому новому соединению."""
+    cursor = dbapi_connection.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
+
+
+def _get_pool_options() -> dict[str, Any]:
+    """Параметры пула соединений из настроек (для SQLite не применяются)."""
+    if sync_url.startswith('sqlite'):
+        return {}
+    return {
+        'pool_size': settings.DB_POOL_SIZE,
+        'max_overflow': settings.DB_MAX_OVERFLOW,
+        'pool_recycle': settings.DB_POOL_RECYCLE,
+    }
+
+
+def _create_sync_engine() -> Engine:
+    """
+    Создает синхронный движок БД с пулом соединений.
+    
+    Returns:
+        Движок SQLAlchemy
+    """
+    engine = create_engine(sync_url, echo=settings.SQL_ECHO, pool_pre_ping=True, **_get_pool_options())
+    if sync_url.startswith('sqlite'):
+        event.listen(engine, 'connect', _set_sqlite_pragmas)
+    return engine
+
+
+async_engine = create_async_engine(get_async_url(), echo=settings.SQL_ECHO, pool_pre_ping=True, **_get_pool_options())
+if sync_url.startswith('sqlite'):
+    event.listen(async_engine.sync_engine, 'connect', _set_sqlite_pragmas)
+sync_engine = _create_sync_engine()
 
 async_session_factory = sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
-sync_session_factory = sessionmaker(sync_engine)
+# Объекты не сбрасываются после commit, иначе каждое обращение к атрибуту после коммита в цикле задачи - отдельный SELECT
+sync_session_factory = sessionmaker(sync_engine, expire_on_commit=False)
+
+
+def init_worker_engine() -> None:
+    """
+    Создает собственный движок БД для процесса воркера Celery.
+    
+    Движок, созданный в родительском процессе до fork, нельзя использовать в дочерних:
+    они разделили бы одни и те же соединения. Пул родителя отбрасывается без закрытия
+    соединений, фабрика сессий перепривязывается к новому движку.
+    """
+    global sync_engine
+    sync_engine.dispose(close=False)
+    sync_engine = _create_sync_engine()
+    sync_session_factory.configure(bind=sync_engine)
+
+
+def dispose_worker_engine() -> None:
+    """Закрывает соединения пула при остановке процесса воркера."""
+    sync_engine.dispose()
 
 
 async def get_async_session() -> AsyncGenerator[AsyncSession]:
@@ -50,7 +120,7 @@ async def get_async_session() -> AsyncGenerator[AsyncSession]:
 
 def get_db_sync() -> Generator[Session]:
     """
-    Генератор синхронной сессии БД для Celery.
+    Генератор синхронной сессии БД (зависимость FastAPI).
     
     Yields:
         Синхронная сессия SQLAlchemy
@@ -62,7 +132,64 @@ def get_db_sync() -> Generator[Session]:
         session.close()
 
 
+# Та же сессия в виде контекстного менеджера для Celery задач: with session_scope() as session
+session_scope = contextmanager(get_db_sync)
+
+
+def _add_missing_columns(conn) -> None:
+    """
+    Добавляет в существующие таблицы колонки, появившиеся в моделях позже.
+    
+    create_all не меняет существующие таблицы. Добавляются только nullable колонки
+    без значения по умолчанию на стороне БД - для остальных нужна ручная миграция.
+    """
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            if not column.nullable or column.server_default is not None:
+                logger.warning(f"Колонку {table.name}.{column.name} нужно добавить вручную")
+                continue
+            table_name = conn.dialect.identifier_preparer.format_table(table)
+            column_ddl = CreateColumn(column).compile(dialect=conn.dialect)
+            conn.exec_driver_sql(f"ALTER TABLE {table_name} ADD COLUMN {column_ddl}")
+            logger.info(f"Добавлена колонка {table.name}.{column.name}")
+
+
+def _create_missing_indexes(conn) -> None:
+    """
+    Создает индексы, добавленные в модели после создания таблиц.
+    
+    create_all не трогает существующие таблицы, поэтому индексы создаются отдельно.
+    Используется CREATE INDEX IF NOT EXISTS: checkfirst опирается на рефлексию, а SQLite
+    не отражает индексы по выражениям (lower(...)) и пытался бы создать их заново при каждом запуске.
+    
+    Raises:
+        RuntimeError: Если не удалось создать уникальный индекс (например, в данных уже есть дубли).
+            На уникальных индексах держится дедупликация INSERT ... ON CONFLICT DO NOTHING,
+            поэтому без них запускаться нельзя
+    """
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                with conn.begin_nested():
+                    conn.execute(CreateIndex(index, if_not_exists=True))
+            except Exception as e:
+                if index.unique:
+                    raise RuntimeError(
+                        f"Не удалось создать уникальный индекс {index.name}: {e}. "
+                        f"Удалите дубликаты в таблице {table.name} и перезапустите приложение"
+                    ) from e
+                logger.warning(f"Не удалось создать индекс {index.name}: {e}")
+
+
 async def init_db():
-    """Инициализирует схему базы данных (создает таблицы)."""
+    """Инициализирует схему базы данных (создает таблицы, недостающие колонки и индексы)."""
     async with async_engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
\ No newline at end of file
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_add_missing_columns)
+        await conn.run_sync(_create_missing_indexes)
\ No newline at end of file
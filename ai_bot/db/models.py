@@ -1,9 +1,10 @@
 from typing import Annotated, Optional
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
-from sqlalchemy import String, Integer, Text, Boolean, DateTime, ForeignKey
+from sqlalchemy import String, Integer, Text, Boolean, DateTime, ForeignKey, Index, func
 from datetime import datetime
 from uuid import uuid4
 from enum import StrEnum, Enum
+from ai_bot.config import settings
 from ai_bot.db.models_utils import ID, URL, TextContent, TimeStamp, OptionalURL, OptionalText, PostStatus, SourceType
 
 class Base(DeclarativeBase):
@@ -34,8 +35,12 @@ class Post(Base):
     published_at: Mapped[TimeStamp]
     status: Mapped[PostStatus] = mapped_column(default=PostStatus.NEW)
     created_at: Mapped[TimeStamp]
+    # ID батча OpenAI Batch API, в котором генерируется пост (такие посты пропускает обычная генерация)
+    batch_id: Mapped[Optional[str]] = mapped_column(String, nullable=True)
     
-    news_item: Mapped["NewsItem"] = relationship('NewsItem', back_populates='posts')
+    # В режиме отладки ленивая загрузка запрещена, чтобы сразу ловить N+1 запросы
+    news_item: Mapped["NewsItem"] = relationship('NewsItem', back_populates='posts',
+                                                 lazy='raise' if settings.DEBUG else 'select')
 
 class Source(Base):
     __tablename__ = 'sources'
@@ -54,5 +59,30 @@ class Keyword(Base):
     word: Mapped[str] = mapped_column(String, nullable=False)
     created_at: Mapped[TimeStamp]
 
+class BatchJob(Base):
+    __tablename__ = 'batch_jobs'
+
+    id: Mapped[ID]
+    batch_id: Mapped[str] = mapped_column(String, nullable=False, index=True)
+    status: Mapped[str] = mapped_column(String, nullable=False, default='validating')
+    news_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    created_at: Mapped[TimeStamp]
+    completed_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
 
 
+# Индексы для частых фильтров в API и задачах
+Index('ix_posts_news_id', Post.news_id)
+Index('ix_posts_status', Post.status)
+Index('ix_posts_status_created_at', Post.status, Post.created_at.desc())
+Index('ix_posts_batch_id', Post.batch_id)
+Index('ix_sources_enabled', Source.enabled)
+Index('ix_sources_name', Source.name, unique=True)
+Index('ix_keywords_word', Keyword.word, unique=True)
+# Регистронезависимая уникальность: админ бот вставляет через INSERT ... ON CONFLICT DO NOTHING
+Index('ix_sources_name_lower', func.lower(Source.name), unique=True)
+Index('ix_sources_url_lower', func.lower(Source.url), unique=True)
+Index('ix_keywords_word_lower', func.lower(Keyword.word), unique=True)
+# Отдельное имя, чтобы индекс создался и в существующих БД, где уже есть неуникальный ix_news_items_url
+Index('uq_news_items_url', NewsItem.url, unique=True)
+# Проверка дубликатов по заголовку в save_news_items (title IN (...))
+Index('ix_news_items_title', NewsItem.title)
@@ -5,10 +5,11 @@ from datetime import datetime
 from uuid import uuid4
 from enum import StrEnum
 
+# Строка, а не объект UUID: SQLite не умеет сохранять uuid.UUID в колонку String
 ID = Annotated[str, mapped_column(String, 
                                     primary_key=True,
                                     index=True,
-                                    default=uuid4)]
+                                    default=lambda: str(uuid4()))]
 URL = Annotated[str, mapped_column(String, 
                                     nullable=False,  
                                     index=True)]
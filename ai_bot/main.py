@@ -7,6 +7,7 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from ai_bot.db.db_manager import init_db, async_engine
 from ai_bot.api.endpoints import router
+from ai_bot.ai.semantic_cache import save_semantic_cache
 
 
 @asynccontextmanager
@@ -14,6 +15,7 @@ async def lifespan(app: FastAPI):
     """Управление жизненным циклом приложения."""
     await init_db()
     yield
+    save_semantic_cache()
     await async_engine.dispose()
 
 
@@ -3,10 +3,58 @@
 import re
 import logging
 from abc import ABC, abstractmethod
+from collections import Counter
+from functools import lru_cache
 from typing import Dict, Any, Optional, List
 
 logger = logging.getLogger(__name__)
 
+try:
+    import ahocorasick
+    HAS_AHOCORASICK = True
+except ImportError:
+    HAS_AHOCORASICK = False
+
+
+def _build_ad_automaton(keywords: List[str]) -> Optional["ahocorasick.Automaton"]:
+    """
+    Строит автомат Ахо-Корасик по ключевым словам (рекламы или фильтра новостей).
+    
+    Автомат находит любое из слов за один линейный проход по тексту,
+    независимо от их количества.
+    
+    Args:
+        keywords: Ключевые слова (в нижнем регистре)
+        
+    Returns:
+        Автомат или None, если pyahocorasick не установлен
+    """
+    if not HAS_AHOCORASICK:
+        return None
+
+    automaton = ahocorasick.Automaton()
+    for keyword in keywords:
+        automaton.add_word(keyword, keyword)
+    automaton.make_automaton()
+    return automaton
+
+
+@lru_cache(maxsize=16)
+def _compile_keywords(keywords: tuple[str, ...]) -> re.Pattern:
+    """
+    Компилирует ключевые слова в одно регулярное выражение-альтернативу.
+    
+    Кэшируется по набору слов: пока ключевые слова не меняются,
+    все новости проверяются одним и тем же выражением за один проход по тексту.
+    """
+    return re.compile('|'.join(map(re.escape, keywords)))
+
+
+@lru_cache(maxsize=16)
+def _keywords_automaton(keywords: tuple[str, ...]) -> Optional["ahocorasick.Automaton"]:
+    """Автомат Ахо-Корасик по ключевым словам фильтра, кэшируется по набору слов так же, как _compile_keywords."""
+    return _build_ad_automaton(list(keywords))
+
 
 class BaseParser(ABC):
     """Базовый класс для всех парсеров новостей с общей логикой фильтрации."""
@@ -31,12 +79,21 @@ class BaseParser(ABC):
     CONTACT_PATTERNS = [
         r'@\w+',  # Telegram username
         r'\+?\d{10,}',  # Телефон
-        r'\b\w+@\w+\.\w+\b',  # Email
+        r'\b[\w.+-]+@[\w-]+\.[\w.-]+\b',  # Email
     ]
     
-    # Паттерн эмодзи
+    # Паттерн эмодзи; все его диапазоны начинаются не раньше EMOJI_MIN_CODEPOINT
+    EMOJI_MIN_CODEPOINT = 0x1F1E0
     EMOJI_PATTERN = r'^[\U0001F600-\U0001F64F\U0001F300-\U0001F5FF\U0001F680-\U0001F6FF\U0001F1E0-\U0001F1FF]{3,}'
     
+    # Скомпилированные один раз при загрузке класса: все ключевые слова проверяются одним проходом по тексту
+    _AD_RE = re.compile('|'.join(map(re.escape, AD_KEYWORDS)))
+    # Если установлен pyahocorasick, ключевые слова ищет автомат (масштабируется на тысячи слов)
+    _AD_AUTOMATON = _build_ad_automaton(AD_KEYWORDS)
+    _CONTACT_RE = re.compile('|'.join(CONTACT_PATTERNS))
+    _EMOJI_RE = re.compile(EMOJI_PATTERN)
+    _URL_RE = re.compile(r'https?://|t\.me/')
+    
     @abstractmethod
     def parse(self, limit: int = 50) -> List[Dict[str, Any]]:
         """
@@ -66,67 +123,74 @@ class BaseParser(ABC):
         title = (title or '').lower()
         summary = (summary or '').lower()
         author = (author or '').lower()
-        full_text = f"{title} {summary}"
+        # \x00 между частями: ключевое слово не может совпасть на стыке заголовка и описания
+        full_text = f"{title}\x00{summary}"
         
         # Проверка по ключевым словам
-        for keyword in self.AD_KEYWORDS:
-            if keyword in full_text:
-                logger.debug(f"Реклама обнаружена по ключевому слову '{keyword}': {title[:50]}")
-                return True
+        keyword = self._find_ad_keyword(full_text)
+        if keyword:
+            logger.debug("Реклама обнаружена по ключевому слову '%s': %.50s", keyword, title)
+            return True
         
         # Проверка структурных паттернов
         
-        # 1. Слишком много эмодзи в начале заголовка
-        if title and re.match(self.EMOJI_PATTERN, title):
-            logger.debug(f"Реклама обнаружена по паттерну эмодзи: {title[:50]}")
+        # 1. Слишком много эмодзи в начале заголовка (регулярное выражение запускаем,
+        # только если первый символ вообще может быть эмодзи)
+        if title and ord(title[0]) >= self.EMOJI_MIN_CODEPOINT and self._EMOJI_RE.match(title):
+            logger.debug("Реклама обнаружена по паттерну эмодзи: %.50s", title)
             return True
         
         # 2. Слишком короткий заголовок
         if len(title) < 10:
-            logger.debug(f"Реклама обнаружена по короткому заголовку: {title}")
+            logger.debug("Реклама обнаружена по короткому заголовку: %s", title)
             return True
         
         # 3. Заголовок в верхнем регистре (проверяем оригинальный title, а не преобразованный)
         if title and title.isupper() and len(title) > 5:
-            logger.debug(f"Реклама обнаружена по CAPS заголовку: {title[:50]}")
+            logger.debug("Реклама обнаружена по CAPS заголовку: %.50s", title)
             return True
         
         # 4. Слишком много восклицательных знаков
         if title.count('!') > 3:
-            logger.debug(f"Реклама обнаружена по восклицаниям: {title[:50]}")
+            logger.debug("Реклама обнаружена по восклицаниям: %.50s", title)
             return True
         
         # 5. Проверка на бота в имени автора
         if author and ('bot' in author or author.endswith('_bot')):
-            logger.debug(f"Реклама от бота: {author}")
+            logger.debug("Реклама от бота: %s", author)
             return True
         
         # 6. Множественные ссылки в тексте
-        url_count = summary.count('http://') + summary.count('https://') + summary.count('t.me/')
+        url_count = len(self._URL_RE.findall(summary))
         if url_count > 2:
-            logger.debug(f"Реклама обнаружена по множественным ссылкам ({url_count}): {title[:50]}")
+            logger.debug("Реклама обнаружена по множественным ссылкам (%s): %.50s", url_count, title)
             return True
         
         # 7. Контактная информация
-        for pattern in self.CONTACT_PATTERNS:
-            if re.search(pattern, full_text):
-                logger.debug(f"Реклама обнаружена по контактной информации: {title[:50]}")
-                return True
+        if self._CONTACT_RE.search(full_text):
+            logger.debug("Реклама обнаружена по контактной информации: %.50s", title)
+            return True
         
         # 8. Повторяющиеся слова (спам-паттерн)
+        # Правило имеет смысл только для коротких текстов: длинные не считаем вовсе
         words = summary.split()
-        if len(words) > 10:
-            word_counts = {}
-            for word in words:
-                if len(word) > 3:
-                    word_counts[word] = word_counts.get(word, 0) + 1
-            max_repeats = max(word_counts.values()) if word_counts else 0
-            if max_repeats > 3 and len(words) < 50:
-                logger.debug(f"Реклама обнаружена по повторяющимся словам: {title[:50]}")
+        if 10 < len(words) < 50:
+            top = Counter(word for word in words if len(word) > 3).most_common(1)
+            if top and top[0][1] > 3:
+                logger.debug("Реклама обнаружена по повторяющимся словам: %.50s", title)
                 return True
         
         return False
     
+    def _find_ad_keyword(self, text: str) -> Optional[str]:
+        """Возвращает первое найденное в тексте ключевое слово рекламы или None."""
+        if self._AD_AUTOMATON is not None:
+            found = next(self._AD_AUTOMATON.iter(text), None)
+            return found[1] if found else None
+
+        match = self._AD_RE.search(text)
+        return match.group(0) if match else None
+    
     def should_skip_item(self, title: Optional[str] = None,
                         summary: Optional[str] = None,
                         author: Optional[str] = None,
@@ -168,7 +232,7 @@ class BaseParser(ABC):
         
         Args:
             news_item: Словарь с данными новости
-            keywords: Список ключевых слов для фильтрации
+            keywords: Список ключевых слов для фильтрации (в нижнем регистре, см. load_keywords)
             
         Returns:
             True если новость прошла фильтрацию, False иначе
@@ -177,16 +241,23 @@ class BaseParser(ABC):
             # Если нет ключевых слов, пропускаем все
             return True
         
-        # Собираем текст для поиска
-        title = (news_item.get('title') or '').lower()
-        summary = (news_item.get('summary') or '').lower()
-        search_text = f"{title} {summary}"
+        # Собираем текст для поиска и приводим к нижнему регистру одним вызовом
+        title = news_item.get('title') or ''
+        search_text = f"{title} {news_item.get('summary') or ''}".lower()
         
-        # Проверяем наличие хотя бы одного ключевого слова
-        for keyword in keywords:
-            if keyword.lower() in search_text:
-                logger.debug(f"Новость прошла фильтрацию по ключевому слову '{keyword}': {title[:50]}")
-                return True
+        # Проверяем наличие хотя бы одного ключевого слова одним проходом по тексту
+        keywords = tuple(keywords)
+        automaton = _keywords_automaton(keywords)
+        if automaton is not None:
+            found = next(automaton.iter(search_text), None)
+            matched = found[1] if found else None
+        else:
+            match = _compile_keywords(keywords).search(search_text)
+            matched = match.group(0) if match else None
+        
+        if matched:
+            logger.debug("Новость прошла фильтрацию по ключевому слову '%s': %.50s", matched, title)
+            return True
         
-        logger.debug(f"Новость не прошла фильтрацию по ключевым словам: {title[:50]}")
+        logger.debug("Новость не прошла фильтрацию по ключевым словам: %.50s", title)
         return False
@@ -1,14 +1,102 @@
 """Парсеры для веб-сайтов."""
 
+import asyncio
+import logging
+import math
+import re
+
+import httpx
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from datetime import datetime
+from functools import lru_cache
+from typing import Optional
 
+from ai_bot.config import settings
 from ai_bot.news_parser.base import BaseParser
 
+try:
+    import lxml  # noqa: F401
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+try:
+    import ciso8601
+    HAS_CISO8601 = True
+except ImportError:
+    HAS_CISO8601 = False
+
+try:
+    # Движок Lexbor: модуль selectolax.parser (Modest) удален в selectolax 1.0
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
+    HAS_SELECTOLAX = True
+except ImportError:
+    HAS_SELECTOLAX = False
+
+# lxml (C-расширение) разбирает HTML в разы быстрее встроенного html.parser
+HTML_PARSER = 'lxml' if HAS_LXML else 'html.parser'
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/142.0.0.0 Safari/537.36'
+
+
+@lru_cache(maxsize=1024)
+def parse_iso_datetime(value: Optional[str]) -> Optional[datetime]:
+    """
+    Разбирает дату в формате ISO 8601 (например, "2026-01-26T20:06:25+03:00" или с суффиксом Z).
+    
+    Использует ciso8601 (C), если он установлен. Результат кэшируется: в одной
+    выдаче часто повторяются одинаковые метки времени.
+    
+    Args:
+        value: Строка с датой
+    
+    Returns:
+        datetime или None, если строка пустая или некорректная
+    """
+    if not value:
+        return None
+    try:
+        if HAS_CISO8601:
+            return ciso8601.parse_datetime(value)
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=4096)
+def _make_url(prefix: str, article_id: str) -> str:
+    """Склеивает URL статьи; одинаковые ID (например, на соседних страницах) берутся из кэша."""
+    return prefix + article_id
+
+
+def _create_session() -> requests.Session:
+    """Создает HTTP сессию с keep-alive, пулом соединений и повтором при сетевых ошибках."""
+    session = requests.Session()
+    session.headers['User-Agent'] = USER_AGENT
+    retry = Retry(total=3, backoff_factor=0.3, status_forcelist=(429, 500, 502, 503, 504), allowed_methods={'GET'})
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=20, max_retries=retry)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
 
 class SiteParser(BaseParser):
     """Абстрактный базовый класс для парсеров сайтов."""
+
+    # Общая сессия для всех парсеров: TCP/TLS соединения переиспользуются между запусками
+    _session = _create_session()
+
+    # Результаты последнего разбора по URL: (ETag, Last-Modified, статьи) для условных GET запросов
+    _response_cache: dict[str, tuple[str, str, list[dict]]] = {}
+
+    # URL статей, уже сохраненных в прошлых запусках (см. remember_urls): их карточки не разбираются повторно
+    KNOWN_URLS_MAX_SIZE = 10000
+    _known_urls: set[str] = set()
     
     def __init__(self, url: str, articles_path: str = ''):
         """
@@ -20,34 +108,241 @@ class SiteParser(BaseParser):
         """
         self.base_url = url
         self.articles_url = articles_path
+        # URL раздела статей считается один раз, а не для каждой статьи
+        self._articles_prefix = url + articles_path
+
+    def parse(self, limit: int = 50) -> list[dict]:
+        """
+        Загружает страницу со статьями и разбирает ее.
+        
+        Args:
+            limit: Максимальное количество статей
+        
+        Returns:
+            Список словарей с данными статей (source, title, summary, url, img, author, published_at)
+        """
+        url = self._normalize_url()
+        response = self._session.get(url, timeout=10, headers=self._conditional_headers(url))
+        if response.status_code == 304:
+            logger.debug(f'{url} не изменился (304), используем предыдущий результат')
+            return self._response_cache[url][2]
+
+        articles_data = self._parse_html(response.content, limit)
+        self._store_response(url, response.headers, articles_data)
+        return articles_data
+
+    async def parse_async(self, client: httpx.AsyncClient, limit: int = 50) -> list[dict]:
+        """
+        Асинхронная версия parse: загрузка через общий httpx клиент, разбор HTML в отдельном потоке.
+        
+        Args:
+            client: Общий асинхронный HTTP клиент
+            limit: Максимальное количество статей
+        
+        Returns:
+            Список словарей с данными статей
+        """
+        return await self._fetch_page_async(client, self._normalize_url(), limit)
+
+    async def _fetch_page_async(self, client: httpx.AsyncClient, url: str, limit: int = 50) -> list[dict]:
+        """
+        Загружает одну страницу (условным GET) и разбирает ее в отдельном потоке.
+        
+        Args:
+            client: Общий асинхронный HTTP клиент
+            url: URL страницы со статьями
+            limit: Максимальное количество статей
+        
+        Returns:
+            Список словарей с данными статей
+        """
+        response = await client.get(url, headers=self._conditional_headers(url))
+        if response.status_code == 304:
+            logger.debug(f'{url} не изменился (304), используем предыдущий результат')
+            return self._response_cache[url][2]
+
+        articles_data = await asyncio.to_thread(self._parse_html, response.content, limit)
+        self._store_response(url, response.headers, articles_data)
+        return articles_data
+
+    def _is_known_url(self, url: Optional[str]) -> bool:
+        """
+        Проверяет, была ли статья сохранена в прошлых запусках.
+        
+        Args:
+            url: URL статьи (статьи без URL не дедуплицируются)
+        
+        Returns:
+            True если статья уже сохранена и ее можно пропустить
+        """
+        return bool(url) and url in self._known_urls
+
+    @classmethod
+    def remember_urls(cls, news_items: list[dict]) -> None:
+        """
+        Запоминает URL статей после успешного сохранения в БД.
+        
+        Вызывается только после коммита: если сохранение упало, статьи
+        разбираются заново при следующем запуске.
+        
+        Args:
+            news_items: Статьи, которые были переданы на сохранение
+        """
+        urls = {item['url'] for item in news_items if item.get('url')}
+        if len(cls._known_urls) + len(urls) > cls.KNOWN_URLS_MAX_SIZE:
+            cls._known_urls.clear()
+        cls._known_urls.update(urls)
+
+    def _conditional_headers(self, url: str) -> dict[str, str]:
+        """Заголовки If-None-Match / If-Modified-Since по сохраненному ответу для url."""
+        cached = self._response_cache.get(url)
+        if not cached:
+            return {}
+
+        etag, last_modified, _ = cached
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        return headers
+
+    def _store_response(self, url: str, headers, articles_data: list[dict]) -> None:
+        """Запоминает валидаторы ответа и разобранные статьи, если сервер их прислал."""
+        etag = headers.get('ETag', '')
+        last_modified = headers.get('Last-Modified', '')
+        if etag or last_modified:
+            self._response_cache[url] = (etag, last_modified, articles_data)
+        else:
+            self._response_cache.pop(url, None)
+
+    def _parse_html(self, html: bytes, limit: int = 50) -> list[dict]:
+        """
+        Разбирает HTML страницы со статьями (байты: кодировку определяет парсер).
+        
+        Использует selectolax, если он установлен и включен SELECTOLAX_PARSER, иначе BeautifulSoup.
+        """
+        if HAS_SELECTOLAX and settings.SELECTOLAX_PARSER:
+            return self._parse_html_selectolax(html, limit)
+        return self._parse_html_bs4(html, limit)
+
+    def _parse_html_bs4(self, html: bytes, limit: int = 50) -> list[dict]:
+        """Разбирает HTML через BeautifulSoup. Реализуется в подклассах."""
+        raise NotImplementedError
+
+    def _parse_html_selectolax(self, html: bytes, limit: int = 50) -> list[dict]:
+        """Разбирает HTML через selectolax (CSS-селекторы на C). Реализуется в подклассах."""
+        raise NotImplementedError
+
+    def _normalize_url(self) -> str:
+        """Возвращает базовый URL для парсинга."""
+        return self._articles_prefix
+
+    def _normalize_url_with_id(self, article_id: str) -> str:
+        """Формирует полный URL статьи по её ID."""
+        return _make_url(self._articles_prefix, article_id)
+
+
+async def parse_all(parsers: list[SiteParser], max_concurrency: int = 5) -> list[list[dict] | BaseException]:
+    """
+    Параллельно парсит несколько сайтов через один HTTP клиент.
+    
+    Пока ждем ответа одного сайта, загружаются остальные: общее время
+    примерно равно времени самого медленного сайта, а не сумме.
     
+    Args:
+        parsers: Парсеры сайтов
+        max_concurrency: Максимум одновременных запросов
+        
+    Returns:
+        Результаты в порядке parsers; для упавших парсеров - исключение
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    # Транспорт повторяет запрос при ошибках соединения
+    transport = httpx.AsyncHTTPTransport(retries=2)
+    async with httpx.AsyncClient(timeout=10, headers={'User-Agent': USER_AGENT}, follow_redirects=True,
+                                 transport=transport) as client:
+        async def parse_one(parser: SiteParser) -> list[dict]:
+            async with semaphore:
+                return await parser.parse_async(client)
+
+        return await asyncio.gather(*(parse_one(parser) for parser in parsers), return_exceptions=True)
+
+
 class HabrParser(SiteParser):
     """Парсер для сайта Habr.com."""
 
+    # Атрибуты ссылки на автора: создаются один раз, а не для каждой статьи
+    _USER_INFO_ATTRS = {'data-test-id': 'user-info-username'}
+
+    # Теги, среди которых за один обход карточки ищутся нужные элементы
+    _CARD_TAGS = ['h2', 'div', 'a', 'time']
+
+    # Строим дерево только для списка статей, без меню, сайдбаров и скриптов
+    _ARTICLES_STRAINER = SoupStrainer('div', class_='tm-articles-list')
+
+    # Количество статей на одной странице списка
+    PAGE_SIZE = 20
+
     def __init__(self):
         """Инициализация парсера Habr.com."""
         super().__init__('https://habr.com', '/ru/articles/')
         self.source = 'habr'
+
+    async def parse_async(self, client: httpx.AsyncClient, limit: int = 50) -> list[dict]:
+        """
+        Загружает столько страниц списка, сколько нужно для limit статей, параллельно.
         
-    def parse(self, limit: int = 50) -> list[dict]:
+        Args:
+            client: Общий асинхронный HTTP клиент
+            limit: Максимальное количество статей
+        
+        Returns:
+            Список словарей с данными статей (без дубликатов по URL)
+        """
+        first_page = self._normalize_url()
+        pages = max(1, math.ceil(limit / self.PAGE_SIZE))
+        urls = [first_page] + [f'{first_page}page{i}/' for i in range(2, pages + 1)]
+
+        results = await asyncio.gather(*(self._fetch_page_async(client, url, limit) for url in urls))
+
+        articles_data = []
+        seen_urls = set()
+        for page_articles in results:
+            for article in page_articles:
+                # Между загрузкой страниц лента могла сдвинуться: одна статья может попасть на две страницы
+                if article['url'] and article['url'] in seen_urls:
+                    continue
+                seen_urls.add(article['url'])
+                articles_data.append(article)
+        return articles_data[:limit]
+        
+    def _parse_html_bs4(self, html: bytes, limit: int = 50) -> list[dict]:
         """
         Парсит последние статьи с Habr.com.
         
         Args:
+            html: HTML страницы со статьями
             limit: Максимальное количество статей (не используется, парсятся все доступные)
         
         Returns:
             Список словарей с данными статей (source, title, summary, url, img, author, published_at)
         """
-        response = requests.get(self._normalize_url(), timeout=10, headers={
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/142.0.0.0 Safari/537.36'
-        })
-        soup = BeautifulSoup(response.text, 'html.parser')
+        soup = BeautifulSoup(html, HTML_PARSER, parse_only=self._ARTICLES_STRAINER)
         articles_data = []
         for article in soup.find('div', class_='tm-articles-list').find_all('article'):
-            # Извлекаем данные статьи
-            title = article.find('h2').a.span.text if article.find('h2') else None
-            summary = article.find('div', class_='article-formatted-body').text if article.find('div', class_='article-formatted-body') else None
+            article_id = article.get('id')
+            url = self._normalize_url_with_id(article_id) if article_id else None
+            if self._is_known_url(url):
+                continue
+
+            # Извлекаем данные статьи за один обход поддерева карточки
+            h2, body, author_link, lead, time_elem = self._find_card_elements(article)
+            lead_img = lead.find('img') if lead else None
+
+            title = h2.a.span.text if h2 else None
+            summary = body.text if body else None
 
             # Если summary пустой, используем альтернативный текст или первые слова заголовка
             if not summary:
@@ -58,7 +353,7 @@ class HabrParser(SiteParser):
                 else:
                     # Используем первые слова заголовка как fallback
                     summary = title[:200] + "..." if title else "Без описания"
-            author = article.find('a', attrs={'data-test-id': 'user-info-username'}).get_text(strip=True) if article.find('a', attrs={'data-test-id': 'user-info-username'}) else None
+            author = author_link.get_text(strip=True) if author_link else None
 
             # Используем базовую фильтрацию из BaseParser
             if self.should_skip_item(title=title, summary=summary, author=author, min_title_length=10):
@@ -68,44 +363,123 @@ class HabrParser(SiteParser):
                 'source': self.source,
                 'title': title,
                 'summary': summary,
-                'url': self._normalize_url_with_id(article.get('id')) if article.get('id') else None,
-                'img': article.find('div', class_='lead').find('img').get('src') if article.find('div', class_='lead') and article.find('div', class_='lead').find('img') else None,
+                'url': url,
+                'img': lead_img.get('src') if lead_img else None,
                 'author': author,
-                'published_at': datetime.fromisoformat(article.find('time').get('datetime')) if article.find('time').get('datetime') else None
+                'published_at': parse_iso_datetime(time_elem.get('datetime')) if time_elem else None
             })
 
         return articles_data
-            
-    def _normalize_url_with_id(self, article_id: str) -> str:
-        """Формирует полный URL статьи по её ID."""
-        return self.base_url + self.articles_url + article_id
-    
-    def _normalize_url(self) -> str:
-        """Возвращает базовый URL для парсинга."""
-        return self.base_url + self.articles_url
+
+    def _find_card_elements(self, article) -> tuple:
+        """
+        Находит элементы карточки статьи за один обход ее поддерева.
+        
+        Вместо отдельного find() на каждое поле (каждый - полный обход карточки)
+        перебирает нужные теги один раз и запоминает первое совпадение каждого вида.
+        
+        Args:
+            article: Тег article карточки
+        
+        Returns:
+            Кортеж (h2, body, author_link, lead, time_elem); ненайденные элементы - None
+        """
+        h2 = body = author_link = lead = time_elem = None
+        for tag in article.find_all(self._CARD_TAGS):
+            if tag.name == 'h2':
+                h2 = h2 or tag
+            elif tag.name == 'time':
+                time_elem = time_elem or tag
+            elif tag.name == 'a':
+                if author_link is None and tag.get('data-test-id') == self._USER_INFO_ATTRS['data-test-id']:
+                    author_link = tag
+            else:
+                classes = tag.get('class') or ()
+                if body is None and 'article-formatted-body' in classes:
+                    body = tag
+                elif lead is None and 'lead' in classes:
+                    lead = tag
+        return h2, body, author_link, lead, time_elem
+
+    def _parse_html_selectolax(self, html: bytes, limit: int = 50) -> list[dict]:
+        """
+        Парсит последние статьи с Habr.com через selectolax.
+        
+        Args:
+            html: HTML страницы со статьями
+            limit: Максимальное количество статей (не используется, парсятся все доступные)
+        
+        Returns:
+            Список словарей с данными статей (source, title, summary, url, img, author, published_at)
+        """
+        tree = HTMLParser(html)
+        articles_data = []
+        for article in tree.css('div.tm-articles-list article'):
+            article_id = article.attributes.get('id')
+            url = self._normalize_url_with_id(article_id) if article_id else None
+            if self._is_known_url(url):
+                continue
+
+            title_node = article.css_first('h2 a span')
+            body = article.css_first('div.article-formatted-body')
+            author_link = article.css_first('a[data-test-id="user-info-username"]')
+            lead_img = article.css_first('div.lead img')
+            time_elem = article.css_first('time')
+
+            title = title_node.text() if title_node else None
+            summary = body.text() if body else None
+            if not summary:
+                summary = title[:200] + "..." if title else "Без описания"
+            author = author_link.text(strip=True) if author_link else None
+
+            if self.should_skip_item(title=title, summary=summary, author=author, min_title_length=10):
+                continue
+
+            datetime_attr = time_elem.attributes.get('datetime') if time_elem else None
+            articles_data.append({
+                'source': self.source,
+                'title': title,
+                'summary': summary,
+                'url': url,
+                'img': lead_img.attributes.get('src') if lead_img else None,
+                'author': author,
+                'published_at': parse_iso_datetime(datetime_attr)
+            })
+
+        return articles_data
+
 
 class TProgerParser(SiteParser):
     """Парсер для сайта TProger.ru."""
 
+    # Регулярки для class_: BeautifulSoup применяет их к каждому классу элемента без вызова Python-лямбд
+    _FEED_RE = re.compile(r'feed|post', re.I)
+    _POST_CARD_RE = re.compile(r'tp-new-design-post-card')
+    _SUMMARY_DIV_RE = re.compile(r'summary|excerpt|description', re.I)
+    _SUMMARY_P_RE = re.compile(r'summary|excerpt', re.I)
+
+    # Строим дерево только для сетки статей; если ее нет, разбираем страницу целиком
+    _GRID_STRAINER = SoupStrainer('div', class_='tp-grid')
+
     def __init__(self):
         """Инициализация парсера TProger.ru."""
         super().__init__('https://tproger.ru', '/news')
         self.source = 'tproger'
         
-    def parse(self, limit: int = 50) -> list[dict]:
+    def _parse_html_bs4(self, html: bytes, limit: int = 50) -> list[dict]:
         """
         Парсит последние статьи с TProger.ru.
         
         Args:
+            html: HTML страницы со статьями
             limit: Максимальное количество статей для парсинга
         
         Returns:
             Список словарей с данными статей (source, title, summary, url, img, author, published_at)
         """
-        response = requests.get(self._normalize_url(), timeout=10, headers={
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/142.0.0.0 Safari/537.36'
-        })
-        soup = BeautifulSoup(response.text, 'html.parser')
+        soup = BeautifulSoup(html, HTML_PARSER, parse_only=self._GRID_STRAINER)
+        if not soup.find('div', class_='tp-grid'):
+            soup = BeautifulSoup(html, HTML_PARSER)
         articles_data = []
         
         # Ищем контейнер со статьями
@@ -119,20 +493,14 @@ class TProgerParser(SiteParser):
             return articles_data
         
         # Ищем div с классом содержащим 'feed-posts' или 'post'
-        feed_container = articles_container.find('div', class_=lambda x: x and ('feed' in str(x).lower() or 'post' in str(x).lower()))
+        feed_container = articles_container.find('div', class_=self._FEED_RE)
         
         if not feed_container:
             # Если не нашли feed_container, ищем карточки напрямую в tp-grid
-            articles = articles_container.find_all('div', class_=lambda x: x and 'tp-new-design-post-card' in str(x), limit=limit)
+            articles = articles_container.find_all('div', class_=self._POST_CARD_RE, limit=limit)
         else:
             # Ищем все карточки статей по классу tp-new-design-post-card
-            articles = feed_container.find_all('div', class_=lambda x: x and 'tp-new-design-post-card' in str(x), limit=limit)
-        
-        if not articles:
-            return articles_data
-        
-        # Используем set для отслеживания уже обработанных URL (дедупликация)
-        seen_urls = set()
+            articles = feed_container.find_all('div', class_=self._POST_CARD_RE, limit=limit)
         
         for article in articles:
             try:
@@ -141,83 +509,138 @@ class TProgerParser(SiteParser):
                 if not title_link:
                     continue
                 
-                # Извлекаем заголовок
-                title = title_link.get_text(strip=True)
-                if not title or len(title) < 5:
-                    continue
-                
-                # Извлекаем URL
-                url = title_link.get('href')
-                if url and not url.startswith('http'):
-                    url = self.base_url + url if url.startswith('/') else self.base_url + '/' + url
-                
-                # Пропускаем дубликаты по URL
-                if url in seen_urls:
+                # Пропускаем уже разобранные статьи (в том числе дубликаты на странице)
+                url = self._resolve_url(title_link.get('href'))
+                if self._is_known_url(url):
                     continue
-                seen_urls.add(url)
                 
                 # Ищем описание (может быть в разных местах)
                 summary_elem = (
-                    article.find('div', class_=lambda x: x and ('summary' in str(x).lower() or 'excerpt' in str(x).lower() or 'description' in str(x).lower())) or
-                    article.find('p', class_=lambda x: x and ('summary' in str(x).lower() or 'excerpt' in str(x).lower()))
+                    article.find('div', class_=self._SUMMARY_DIV_RE) or
+                    article.find('p', class_=self._SUMMARY_P_RE)
                 )
-                summary = summary_elem.get_text(strip=True) if summary_elem else None
-                if not summary or len(summary) < 20:
-                    # Используем заголовок как fallback для summary
-                    summary = title[:200] + "..." if title else "Без описания"
                 
                 # Ищем изображение в обёртке tp-new-design-post-card__image-wrapper
                 img_wrapper = article.find('div', class_='tp-new-design-post-card__image-wrapper')
-                img = None
-                if img_wrapper:
-                    img_elem = img_wrapper.find('img', class_='tp-ui-image__image')
-                    if img_elem:
-                        img = img_elem.get('src')
-                        # Берем первый URL из srcset если есть
-                        if not img or img.startswith('data:'):
-                            srcset = img_elem.get('srcset')
-                            if srcset:
-                                # Берем первый URL из srcset
-                                first_url = srcset.split()[0] if srcset else None
-                                if first_url and first_url.startswith('http'):
-                                    img = first_url
+                img_elem = img_wrapper.find('img', class_='tp-ui-image__image') if img_wrapper else None
                 
                 # Ищем дату в time с атрибутом datetime
                 time_elem = article.find('time')
-                published_at = None
-                if time_elem:
-                    datetime_attr = time_elem.get('datetime')
-                    if datetime_attr:
-                        try:
-                            # Обрабатываем формат "2026-01-26T20:06:25+03:00"
-                            published_at = datetime.fromisoformat(datetime_attr.replace('Z', '+00:00'))
-                        except (ValueError, AttributeError):
-                            pass
-                
-                # Используем базовую фильтрацию из BaseParser
-                if self.should_skip_item(title=title, summary=summary, min_title_length=10):
-                    continue
                 
-                articles_data.append({
-                    'source': self.source,
-                    'title': title,
-                    'summary': summary,
-                    'url': url,
-                    'img': img,
-                    'author': 'TProger',  # TProger обычно не показывает автора в списке, используем название сайта
-                    'published_at': published_at
-                })
+                item = self._build_article(
+                    title=title_link.get_text(strip=True),
+                    url=url,
+                    summary=summary_elem.get_text(strip=True) if summary_elem else None,
+                    img_src=img_elem.get('src') if img_elem else None,
+                    img_srcset=img_elem.get('srcset') if img_elem else None,
+                    datetime_attr=time_elem.get('datetime') if time_elem else None
+                )
+                if item:
+                    articles_data.append(item)
                 
-            except Exception as e:
-                # Пропускаем статьи с ошибками парсинга
+            except (AttributeError, KeyError, ValueError) as e:
+                # Пропускаем статьи с неожиданной разметкой
+                logger.debug(f'Ошибка разбора карточки TProger: {e}')
                 continue
         
         return articles_data
-            
-    def _normalize_url_with_id(self, article_id: str) -> str:
-        """Формирует полный URL статьи по её ID."""
-        return self.base_url + self.articles_url + article_id
-    
-    def _normalize_url(self) -> str:
-        """Возвращает базовый URL для парсинга."""
-        return self.base_url + self.articles_url
+
+    def _parse_html_selectolax(self, html: bytes, limit: int = 50) -> list[dict]:
+        """
+        Парсит последние статьи с TProger.ru через selectolax.
+        
+        Args:
+            html: HTML страницы со статьями
+            limit: Максимальное количество статей для парсинга
+        
+        Returns:
+            Список словарей с данными статей (source, title, summary, url, img, author, published_at)
+        """
+        tree = HTMLParser(html)
+        articles_container = tree.css_first('div.tp-grid') or tree.css_first('main') or tree.root
+        if articles_container is None:
+            return []
+
+        feed_container = articles_container.css_first('div[class*="feed"], div[class*="post"]') or articles_container
+        articles = feed_container.css('div[class*="tp-new-design-post-card"]')[:limit]
+
+        articles_data = []
+        for article in articles:
+            title_link = article.css_first('a.tp-new-design-post-card__title')
+            if not title_link:
+                continue
+
+            url = self._resolve_url(title_link.attributes.get('href'))
+            if self._is_known_url(url):
+                continue
+
+            summary_elem = (
+                article.css_first('div[class*="summary"], div[class*="excerpt"], div[class*="description"]') or
+                article.css_first('p[class*="summary"], p[class*="excerpt"]')
+            )
+            img_elem = article.css_first('div.tp-new-design-post-card__image-wrapper img.tp-ui-image__image')
+            time_elem = article.css_first('time')
+
+            item = self._build_article(
+                title=title_link.text(strip=True),
+                url=url,
+                summary=summary_elem.text(strip=True) if summary_elem else None,
+                img_src=img_elem.attributes.get('src') if img_elem else None,
+                img_srcset=img_elem.attributes.get('srcset') if img_elem else None,
+                datetime_attr=time_elem.attributes.get('datetime') if time_elem else None
+            )
+            if item:
+                articles_data.append(item)
+
+        return articles_data
+
+    def _resolve_url(self, href: Optional[str]) -> Optional[str]:
+        """Превращает относительную ссылку карточки в абсолютный URL."""
+        if href and not href.startswith('http'):
+            return self.base_url + href if href.startswith('/') else self.base_url + '/' + href
+        return href
+
+    def _build_article(self, title: str, url: Optional[str], summary: Optional[str],
+                       img_src: Optional[str], img_srcset: Optional[str],
+                       datetime_attr: Optional[str]) -> Optional[dict]:
+        """
+        Собирает словарь статьи из извлеченных полей карточки (общий код для обоих бэкендов).
+        
+        Args:
+            title: Текст ссылки-заголовка
+            url: Абсолютный URL статьи
+            summary: Текст описания
+            img_src: Атрибут src изображения
+            img_srcset: Атрибут srcset изображения
+            datetime_attr: Атрибут datetime элемента time
+        
+        Returns:
+            Словарь статьи или None, если карточку нужно пропустить
+        """
+        if not title or len(title) < 5:
+            return None
+        
+        if not summary or len(summary) < 20:
+            # Используем заголовок как fallback для summary
+            summary = title[:200] + "..."
+        
+        # Берем первый URL из srcset, если src пустой или это data: заглушка
+        img = img_src
+        if (not img or img.startswith('data:')) and img_srcset:
+            first_url = img_srcset.split()[0]
+            if first_url.startswith('http'):
+                img = first_url
+        
+        # Используем базовую фильтрацию из BaseParser
+        if self.should_skip_item(title=title, summary=summary, min_title_length=10):
+            return None
+        
+        return {
+            'source': self.source,
+            'title': title,
+            'summary': summary,
+            'url': url,
+            'img': img,
+            'author': 'TProger',  # TProger обычно не показывает автора в списке, используем название сайта
+            'published_at': parse_iso_datetime(datetime_attr)
+        }
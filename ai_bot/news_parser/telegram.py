@@ -2,9 +2,12 @@
 
 import logging
 import asyncio
+import random
 from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional
 
+from ai_bot.ai.backpressure import backoff_delay
+from ai_bot.ai.openai_client import run_sync
 from ai_bot.config import settings
 from ai_bot.news_parser.base import BaseParser
 
@@ -13,12 +16,125 @@ logger = logging.getLogger(__name__)
 try:
     from telethon import TelegramClient
     from telethon.tl.functions.channels import JoinChannelRequest
-    from telethon.errors import ChannelPrivateError, UsernameNotOccupiedError, FloodWaitError
+    from telethon.errors import ChannelPrivateError, UsernameNotOccupiedError, FloodWaitError, RPCError
     HAS_TELETHON = True
 except ImportError:
     HAS_TELETHON = False
     logger.error("Telethon не установлен. Установите: poetry add telethon")
 
+# Повторы запроса сообщений при FloodWait и временных ошибках Telegram
+GET_MESSAGES_MAX_ATTEMPTS = 4
+GET_MESSAGES_MAX_ELAPSED = 90  # Суммарное ожидание повторов, секунды
+FLOOD_WAIT_MAX_SLEEP = 60  # Дольше FloodWait не ждем: канал будет обработан в следующий запуск
+
+# Длина заголовка и описания, собираемых из текста сообщения
+TITLE_MAX_LENGTH = 100
+SUMMARY_MAX_LENGTH = 500
+# Сообщения старше этого возраста пропускаются (чтобы не дублировать старые новости)
+MESSAGE_MAX_AGE = timedelta(days=1)
+# Более короткие сообщения отбрасываются до остальной фильтрации (как min_title_length в should_skip_item)
+MIN_MESSAGE_LENGTH = 20
+
+# Максимальный ID сохраненного сообщения по каналам: следующий опрос запрашивает только более новые.
+# Полученный ID сначала попадает в _pending_message_ids и переносится сюда только после
+# сохранения (confirm_messages_saved), чтобы при ошибке сохранения сообщения запросились снова
+_last_message_ids: Dict[str, int] = {}
+_pending_message_ids: Dict[str, int] = {}
+
+# Разрешенные сущности каналов по username: повторные опросы не делают запрос ResolveUsername
+_entities: Dict[str, Any] = {}
+
+# Подключенные клиенты по имени сессии: соединение и авторизация переиспользуются между вызовами.
+# Клиент привязан к event loop, в котором подключен, поэтому все синхронные вызовы
+# выполняются в общем фоновом loop (run_sync)
+_clients: Dict[str, "TelegramClient"] = {}
+_clients_lock: Optional[asyncio.Lock] = None
+
+
+def _create_client() -> Optional["TelegramClient"]:
+    """
+    Создает Telethon клиент.
+    
+    Returns:
+        TelegramClient или None если настройки не сконфигурированы
+    """
+    if not HAS_TELETHON:
+        logger.error('Telethon не установлен')
+        return None
+
+    if not settings.TELEGRAM_API_ID or not settings.TELEGRAM_API_HASH:
+        logger.error('TELEGRAM_API_ID и TELEGRAM_API_HASH не настроены')
+        return None
+
+    # Используем путь к сессии внутри контейнера
+    session_path = f'/ai_bot/telegram/telegram_sessions/{settings.TELEGRAM_SESSION_NAME}'
+    
+    return TelegramClient(
+        session_path,
+        settings.TELEGRAM_API_ID,
+        settings.TELEGRAM_API_HASH
+    )
+
+
+async def get_connected_client() -> Optional["TelegramClient"]:
+    """
+    Возвращает подключенный и авторизованный клиент, подключая его при первом обращении.
+    
+    Returns:
+        TelegramClient или None если клиент не настроен, не подключился или не авторизован
+    """
+    global _clients_lock
+    if _clients_lock is None:
+        _clients_lock = asyncio.Lock()
+
+    async with _clients_lock:
+        session_name = settings.TELEGRAM_SESSION_NAME
+        client = _clients.get(session_name)
+        if client is not None and client.is_connected():
+            return client
+
+        client = _create_client()
+        if not client:
+            return None
+
+        await client.connect()
+        if not client.is_connected():
+            logger.error('Не удалось подключиться к Telegram')
+            return None
+
+        if not await client.is_user_authorized():
+            logger.error('Telethon клиент не авторизован. Создайте сессию через create_session_docker.py')
+            await client.disconnect()
+            return None
+
+        _clients[session_name] = client
+        return client
+
+
+async def drop_client(client: "TelegramClient") -> None:
+    """Убирает клиент из реестра и отключает его (например, после обрыва соединения)."""
+    for session_name, cached in list(_clients.items()):
+        if cached is client:
+            del _clients[session_name]
+    if not client.is_connected():
+        return
+    try:
+        await client.disconnect()
+    except Exception:
+        pass
+
+
+async def disconnect_clients() -> None:
+    """Отключает все сохраненные клиенты."""
+    for client in list(_clients.values()):
+        await drop_client(client)
+
+
+def close_clients() -> None:
+    """Синхронно отключает сохраненные клиенты (вызывается при остановке процесса)."""
+    if _clients:
+        run_sync(disconnect_clients())
+
 
 class TelegramParser(BaseParser):
     """Парсер для извлечения сообщений из Telegram-каналов через Telethon."""
@@ -32,77 +148,75 @@ class TelegramParser(BaseParser):
         """
         super().__init__()
         self.channel_username = channel_username.lstrip('@')
+        # Сущность канала (после _resolve_channel); используется вместо username в запросах
+        self._entity = None
 
-    def _get_client(self) -> Optional[TelegramClient]:
+    async def _get_entity(self, client: "TelegramClient") -> Any:
         """
-        Создает и возвращает Telethon клиент.
+        Возвращает сущность канала, разрешая username только при первом обращении в процессе.
         
+        Args:
+            client: Telethon клиент
+            
         Returns:
-            TelegramClient или None если настройки не сконфигурированы
+            Сущность канала Telethon
         """
-        if not HAS_TELETHON:
-            logger.error('Telethon не установлен')
-            return None
-
-        if not settings.TELEGRAM_API_ID or not settings.TELEGRAM_API_HASH:
-            logger.error('TELEGRAM_API_ID и TELEGRAM_API_HASH не настроены')
-            return None
-
-        # Используем путь к сессии внутри контейнера
-        session_path = f'/ai_bot/telegram/telegram_sessions/{settings.TELEGRAM_SESSION_NAME}'
-        
-        client = TelegramClient(
-            session_path,
-            settings.TELEGRAM_API_ID,
-            settings.TELEGRAM_API_HASH
-        )
-        return client
+        key = self.channel_username.lower()
+        entity = _entities.get(key)
+        if entity is None:
+            entity = await client.get_entity(self.channel_username)
+            _entities[key] = entity
+        self._entity = entity
+        return entity
 
-    async def _ensure_subscribed(self, client: TelegramClient) -> bool:
+    async def _resolve_channel(self, client: "TelegramClient") -> bool:
         """
-        Убеждается, что клиент подписан на канал.
+        Разрешает канал по username.
         
-        Пытается получить сообщения, если не получается - пытается подписаться.
+        Доступ к сообщениям отдельно не проверяется: если канал закрыт,
+        ошибку вернет сам запрос сообщений, и тогда выполняется подписка.
         
         Args:
             client: Telethon клиент
             
         Returns:
-            True если доступ к каналу есть, False иначе
+            True если канал существует (или его не удалось проверить), False если канала нет
         """
         try:
-            # Пытаемся получить информацию о канале
-            entity = await client.get_entity(self.channel_username)
-            
-            # Пробуем получить сообщения - если не подписан, будет ошибка
-            try:
-                # Пробуем получить одно сообщение для проверки доступа
-                await client.get_messages(entity, limit=1)
-                return True
-            except (ChannelPrivateError, ValueError, Exception) as e:
-                # Если не подписан или нет доступа, пытаемся подписаться
-                logger.info(f'Попытка подписаться на канал @{self.channel_username}')
-                try:
-                    await client(JoinChannelRequest(entity))
-                    logger.info(f'Успешно подписались на канал @{self.channel_username}')
-                    return True
-                except Exception as join_error:
-                    logger.warning(f'Не удалось подписаться на канал @{self.channel_username}: {join_error}')
-                    # Продолжаем попытку парсинга - возможно, канал публичный и доступен без подписки
-                    return True
+            await self._get_entity(client)
+            return True
         except UsernameNotOccupiedError:
             logger.error(f'Канал @{self.channel_username} не найден')
             return False
         except Exception as e:
-            logger.warning(f'Ошибка при проверке подписки на @{self.channel_username}: {e}, продолжаем...')
-            # Продолжаем попытку парсинга
+            logger.warning(f'Ошибка при получении канала @{self.channel_username}: {e}, продолжаем...')
+            # Продолжаем попытку парсинга по username
             return True
 
+    async def _join_channel(self, client: "TelegramClient") -> bool:
+        """
+        Подписывается на канал (если сообщения недоступны без подписки).
+        
+        Args:
+            client: Telethon клиент
+            
+        Returns:
+            True если подписка удалась
+        """
+        logger.info(f'Попытка подписаться на канал @{self.channel_username}')
+        try:
+            await client(JoinChannelRequest(self._entity or self.channel_username))
+            logger.info(f'Успешно подписались на канал @{self.channel_username}')
+            return True
+        except Exception as join_error:
+            logger.warning(f'Не удалось подписаться на канал @{self.channel_username}: {join_error}')
+            return False
+
     def parse(self, limit: int = 50) -> List[Dict[str, Any]]:
         """
         Синхронный метод для парсинга Telegram-канала.
         
-        Обертка над parse_async для совместимости с BaseParser.
+        Обертка над parse_async для совместимости с BaseParser; выполняется в общем фоновом loop.
         
         Args:
             limit: Максимальное количество сообщений для парсинга
@@ -110,7 +224,7 @@ class TelegramParser(BaseParser):
         Returns:
             Список словарей с данными новостей
         """
-        return asyncio.run(self.parse_async(limit=limit))
+        return run_sync(self.parse_async(limit=limit))
 
     async def parse_async(self, limit: int = 50) -> List[Dict[str, Any]]:
         """
@@ -126,42 +240,40 @@ class TelegramParser(BaseParser):
             logger.error('Telethon не установлен для парсинга Telegram')
             return []
 
-        client = self._get_client()
-        if not client:
-            return []
-
         try:
-            # Используем start() вместо connect() для автоматической загрузки сессии
-            await client.start()
-            
-            if not client.is_connected():
-                logger.error('Не удалось подключиться к Telegram')
-                return []
-
-            if not await client.is_user_authorized():
-                logger.error('Telethon клиент не авторизован. Создайте сессию через create_session_docker.py')
+            # Клиент подключается один раз на процесс и переиспользуется для всех каналов
+            client = await get_connected_client()
+            if not client:
                 return []
 
-            # Убеждаемся, что подписаны на канал
-            if not await self._ensure_subscribed(client):
+            # Разрешаем канал (подписка - только если сообщения окажутся недоступны)
+            if not await self._resolve_channel(client):
                 return []
 
             # Получаем сообщения из канала
             logger.info(f'Запрашиваем сообщения из канала @{self.channel_username}')
             
+            # Граница свежести считается один раз на весь опрос, а не для каждого сообщения
+            cutoff = datetime.now() - MESSAGE_MAX_AGE
+            min_id = _last_message_ids.get(self.channel_username, 0)
             try:
-                messages = await client.get_messages(self.channel_username, limit=min(limit, 100))
-            except FloodWaitError as e:
-                logger.warning(f'FloodWait: нужно подождать {e.seconds} секунд')
-                return []
+                messages = await self._get_messages_with_retry(client, limit, min_id, cutoff)
             except Exception as e:
                 logger.error(f'Ошибка при получении сообщений: {e}')
                 return []
 
+            if messages:
+                _pending_message_ids[self.channel_username] = max(min_id, max(message.id for message in messages))
+
             logger.info(f'Получено {len(messages)} сообщений из канала @{self.channel_username}')
 
             news_items = []
+            # Сообщения уже не старше cutoff (чтение остановилось на первом старом),
+            # поэтому здесь остаются только дешевые проверки и фильтрация
             for message in messages:
+                if len((message.message or '').strip()) < MIN_MESSAGE_LENGTH:
+                    continue
+
                 news_item = self._message_to_news_item(message)
                 if news_item:
                     news_items.append(news_item)
@@ -172,17 +284,90 @@ class TelegramParser(BaseParser):
         except Exception as e:
             logger.error(f'Ошибка при парсинге Telegram-канала @{self.channel_username}: {e}', exc_info=True)
             return []
-        finally:
+
+    async def _iter_fresh_messages(self, client: "TelegramClient", limit: int, min_id: int, cutoff: datetime) -> list:
+        """
+        Читает сообщения канала потоком (от новых к старым) и останавливается на первом старом.
+        
+        Args:
+            client: Подключенный Telethon клиент
+            limit: количество сообщений для получения
+            min_id: вернуть только сообщения с ID больше этого (фильтрует сервер)
+            cutoff: сообщения старше этой даты не нужны
+            
+        Returns:
+            Список сообщений не старше cutoff
+        """
+        messages = []
+        async for message in client.iter_messages(self._entity or self.channel_username, limit=min(limit, 100), min_id=min_id):
+            if message.date.replace(tzinfo=None) < cutoff:
+                break
+            messages.append(message)
+        return messages
+
+    async def _get_messages_with_retry(self, client: "TelegramClient", limit: int, min_id: int = 0,
+                                       cutoff: Optional[datetime] = None) -> list:
+        """
+        Запрашивает сообщения канала с повторами при временных ошибках.
+        
+        При FloodWait ждет столько, сколько просит Telegram (не больше FLOOD_WAIT_MAX_SLEEP),
+        при других RPC ошибках - экспоненциальная задержка с jitter, при обрыве соединения -
+        переподключение, при закрытом канале - одна попытка подписаться.
+        Общее ожидание ограничено GET_MESSAGES_MAX_ELAPSED.
+        
+        Args:
+            client: Подключенный Telethon клиент
+            limit: количество сообщений для получения
+            min_id: вернуть только сообщения с ID больше этого (фильтрует сервер)
+            cutoff: сообщения старше этой даты не запрашиваются
+            
+        Returns:
+            Список сообщений или пустой список, если попытки исчерпаны
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + GET_MESSAGES_MAX_ELAPSED
+        join_attempted = False
+
+        for attempt in range(GET_MESSAGES_MAX_ATTEMPTS):
             try:
-                await client.disconnect()
-            except Exception:
-                pass
+                return await self._iter_fresh_messages(client, limit, min_id, cutoff or datetime.min)
+            except ChannelPrivateError:
+                # Нет доступа без подписки: подписываемся один раз и повторяем сразу
+                if join_attempted or not await self._join_channel(client):
+                    logger.warning(f'@{self.channel_username}: канал недоступен')
+                    return []
+                join_attempted = True
+                continue
+            except FloodWaitError as e:
+                delay = min(e.seconds, FLOOD_WAIT_MAX_SLEEP) + random.uniform(0, 2)
+                reason = f'FloodWait {e.seconds} с'
+            except ConnectionError as e:
+                # Соединение могло оборваться между вызовами: переподключаемся
+                await drop_client(client)
+                client = await get_connected_client()
+                if not client:
+                    return []
+                delay = backoff_delay(attempt, min_wait=0.5, max_wait=10)
+                reason = f'обрыв соединения ({e})'
+            except RPCError as e:
+                delay = backoff_delay(attempt, min_wait=0.5, max_wait=10)
+                reason = f'ошибка Telegram ({e})'
+
+            if attempt == GET_MESSAGES_MAX_ATTEMPTS - 1 or loop.time() + delay > deadline:
+                logger.warning(f'@{self.channel_username}: {reason}, попытки исчерпаны')
+                return []
+
+            logger.warning(f'@{self.channel_username}: {reason}, повтор через {delay:.1f} с')
+            await asyncio.sleep(delay)
+
+        return []
 
     def _message_to_news_item(self, message) -> Optional[Dict[str, Any]]:
         """
         Преобразует Telethon сообщение в формат новости.
         
-        Фильтрует старые сообщения, forwarded, сообщения от ботов и рекламу.
+        Фильтрует forwarded, сообщения от ботов и рекламу. Старые сообщения
+        отсекаются раньше, при чтении канала (_iter_fresh_messages).
         
         Args:
             message: Объект сообщения Telethon
@@ -197,41 +382,33 @@ class TelegramParser(BaseParser):
 
             message_text = message.message.strip()
 
-            # Пропускаем сообщения старше 24 часов (чтобы не дублировать старые новости)
             message_date = message.date
             if message_date.tzinfo:
                 message_date = message_date.replace(tzinfo=None)
-            
-            if (datetime.now() - message_date) > timedelta(days=1):
-                logger.debug(f"Пропускаем старое сообщение: {message_text[:50]}...")
-                return None
 
             # Пропускаем forwarded сообщения (часто реклама или репосты)
             if message.forward:
-                logger.debug(f"Пропускаем forwarded сообщение: {message_text[:50]}...")
+                logger.debug("Пропускаем forwarded сообщение: %.50s...", message_text)
                 return None
 
+            # Поля отправителя читаем один раз
+            sender = message.sender
+            is_bot = bool(getattr(sender, 'bot', False))
+            author = (getattr(sender, 'username', None) or getattr(sender, 'first_name', None)) if sender else None
+
             # Пропускаем сообщения от ботов (часто рекламные)
-            if message.sender and hasattr(message.sender, 'bot') and message.sender.bot:
-                logger.debug(f"Пропускаем сообщение от бота: {message_text[:50]}...")
+            if is_bot:
+                logger.debug("Пропускаем сообщение от бота: %.50s...", message_text)
                 return None
 
-            # Получаем автора для фильтрации
-            author = None
-            if message.sender:
-                if hasattr(message.sender, 'username') and message.sender.username:
-                    author = message.sender.username
-                elif hasattr(message.sender, 'first_name'):
-                    author = message.sender.first_name
-
             # Используем базовую фильтрацию из BaseParser
             # Для Telegram используем message_text как title и summary
             if self.should_skip_item(title=message_text, summary=message_text, author=author, min_title_length=20):
                 return None
 
-            # Создаем title из первых слов сообщения (до 100 символов)
-            title = message_text[:100]
-            if len(message_text) > 100:
+            # Создаем title из первых слов сообщения (до TITLE_MAX_LENGTH символов)
+            title = message_text[:TITLE_MAX_LENGTH]
+            if len(message_text) > TITLE_MAX_LENGTH:
                 # Обрезаем по последнему пробелу
                 last_space = title.rfind(' ')
                 if last_space > 50:
@@ -239,19 +416,11 @@ class TelegramParser(BaseParser):
                 else:
                     title = title + '...'
 
-            # Создаем summary из первых 500 символов
-            summary = message_text[:500]
-            if len(message_text) > 500:
+            # Создаем summary из первых SUMMARY_MAX_LENGTH символов
+            summary = message_text[:SUMMARY_MAX_LENGTH]
+            if len(message_text) > SUMMARY_MAX_LENGTH:
                 summary += "..."
 
-            # Получаем автора
-            author = 'Unknown'
-            if message.sender:
-                if hasattr(message.sender, 'username') and message.sender.username:
-                    author = message.sender.username
-                elif hasattr(message.sender, 'first_name'):
-                    author = message.sender.first_name or 'Unknown'
-
             # Получаем ID сообщения для URL
             message_id = message.id if hasattr(message, 'id') else None
             url = f'https://t.me/{self.channel_username}/{message_id}' if message_id else None
@@ -261,7 +430,7 @@ class TelegramParser(BaseParser):
                 'title': title,
                 'summary': summary,
                 'url': url,
-                'author': author,
+                'author': author or 'Unknown',
                 'published_at': message_date,
                 'raw_text': message_text,  # Полный текст сообщения
                 'img': None  # Изображения пока не парсятся
@@ -272,9 +441,61 @@ class TelegramParser(BaseParser):
             return None
 
 
-def parse_telegram_channel_sync(channel_username: str, limit: int = 50) -> List[Dict[str, Any]]:
+def confirm_messages_saved(channel_username: str) -> None:
+    """
+    Сдвигает курсор min_id канала после успешного сохранения полученных сообщений.
+    
+    Args:
+        channel_username: Username канала (с @ или без)
+    """
+    channel_username = channel_username.lstrip('@')
+    pending = _pending_message_ids.pop(channel_username, None)
+    if pending is not None:
+        _last_message_ids[channel_username] = max(_last_message_ids.get(channel_username, 0), pending)
+
+
+async def parse_telegram_channels_async(channel_usernames: List[str], limit: int = 50,
+                                        max_concurrency: int = 8) -> List[List[Dict[str, Any]] | BaseException]:
+    """
+    Параллельно парсит несколько Telegram каналов через один подключенный клиент.
+    
+    Запросы к каналам перекрываются по времени, поэтому общее время близко
+    ко времени самого медленного канала, а не к сумме.
+    
+    Args:
+        channel_usernames: username каналов (с @ или без)
+        limit: количество сообщений для получения из каждого канала
+        max_concurrency: максимум одновременных запросов (чтобы не получить FloodWait)
+        
+    Returns:
+        Результаты в порядке channel_usernames; для упавших каналов - исключение
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def parse_one(channel_username: str) -> List[Dict[str, Any]]:
+        async with semaphore:
+            return await TelegramParser(channel_username).parse_async(limit)
+
+    return await asyncio.gather(*(parse_one(username) for username in channel_usernames), return_exceptions=True)
+
+
+def parse_telegram_channels_sync(channel_usernames: List[str], limit: int = 50) -> List[List[Dict[str, Any]] | BaseException]:
     """
-    Синхронная функция для парсинга Telegram канала (для использования в Celery)
+    Синхронная обертка над parse_telegram_channels_async (для использования в Celery).
+    
+    Args:
+        channel_usernames: username каналов
+        limit: количество сообщений для получения из каждого канала
+        
+    Returns:
+        Результаты в порядке channel_usernames; для упавших каналов - исключение
+    """
+    return run_sync(parse_telegram_channels_async(channel_usernames, limit))
+
+
+async def parse_telegram_channel_async(channel_username: str, limit: int = 50) -> List[Dict[str, Any]]:
+    """
+    Парсит Telegram канал. Основной вариант для асинхронного кода: вызывается через await.
     
     Args:
         channel_username: username канала (без @)
@@ -283,38 +504,24 @@ def parse_telegram_channel_sync(channel_username: str, limit: int = 50) -> List[
     Returns:
         Список словарей с данными новостей
     """
-    parser = TelegramParser(channel_username)
-    
-    # Проверяем, есть ли уже запущенный event loop
-    try:
-        loop = asyncio.get_event_loop()
-        if loop.is_running():
-            # Если loop уже запущен, создаем новый в отдельном потоке
-            import concurrent.futures
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                future = executor.submit(_run_in_new_loop, parser, limit)
-                return future.result()
-        else:
-            # Loop существует, но не запущен - используем его
-            return loop.run_until_complete(parser.parse_async(limit))
-    except RuntimeError:
-        # Нет event loop - создаем новый
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            return loop.run_until_complete(parser.parse_async(limit))
-        finally:
-            loop.close()
+    return await TelegramParser(channel_username).parse_async(limit)
 
 
-def _run_in_new_loop(parser: TelegramParser, limit: int) -> List[Dict[str, Any]]:
-    """Запускает парсинг в новом event loop в отдельном потоке."""
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    try:
-        return loop.run_until_complete(parser.parse_async(limit))
-    finally:
-        loop.close()
+def parse_telegram_channel_sync(channel_username: str, limit: int = 50) -> List[Dict[str, Any]]:
+    """
+    Синхронная обертка над parse_telegram_channel_async (для использования в Celery)
+    
+    Парсинг выполняется в общем фоновом event loop, где живет подключенный клиент.
+    Из асинхронного кода вызывайте parse_telegram_channel_async напрямую.
+    
+    Args:
+        channel_username: username канала (без @)
+        limit: количество сообщений для получения
+        
+    Returns:
+        Список словарей с данными новостей
+    """
+    return run_sync(parse_telegram_channel_async(channel_username, limit))
 
 
 if __name__ == '__main__':
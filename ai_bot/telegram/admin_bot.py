@@ -3,15 +3,22 @@
 Позволяет просматривать и изменять источники и ключевые слова.
 """
 
+import asyncio
+import functools
 import logging
-from typing import List
+import time
+from typing import Optional
 
-from aiogram import Bot, Dispatcher, Router, F
+from aiogram import Bot, Dispatcher, Router
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
 from aiogram.filters import Command, CommandStart
+from aiogram.filters.callback_data import CallbackData
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
+from sqlalchemy import func, or_, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
 from aiogram.types import (
     Message,
     CallbackQuery,
@@ -20,12 +27,68 @@ from aiogram.types import (
 )
 
 from ai_bot.config import settings
-from ai_bot.db.db_manager import get_db_sync
-from ai_bot.db.models import Source, Keyword
-from ai_bot.db.models_utils import SourceType
+from ai_bot.db.db_manager import async_session_factory
+from ai_bot.db.models import NewsItem, Post, Source, Keyword
+from ai_bot.db.models_utils import PostStatus, SourceType
 
 logger = logging.getLogger(__name__)
 
+# Сколько секунд показывать закэшированную статистику без повторных COUNT запросов
+STATS_CACHE_TTL = 30
+# Сколько секунд Telegram кэширует отказ в доступе на нажатие кнопки
+ACCESS_DENIED_CACHE_TIME = 60
+
+
+async def _insert_or_ignore(session: AsyncSession, model, **values) -> Optional[str]:
+    """
+    Вставляет строку одним запросом INSERT ... ON CONFLICT DO NOTHING.
+    
+    В отличие от проверки SELECT + INSERT, два админа не могут одновременно
+    добавить дубликат: уникальность проверяет сама БД.
+    
+    Args:
+        session: Асинхронная сессия БД
+        model: Модель, в таблицу которой вставляется строка
+        **values: Значения колонок
+        
+    Returns:
+        ID вставленной строки или None, если такая строка уже существует
+    """
+    insert = postgresql.insert if session.bind.dialect.name == 'postgresql' else sqlite.insert
+    stmt = insert(model).values(**values).on_conflict_do_nothing().returning(model.id)
+    return (await session.execute(stmt)).scalar_one_or_none()
+
+
+def admin_only(handler):
+    """
+    Пропускает в обработчик только админов.
+    
+    Остальным на callback запрос отвечает alert с cache_time: Telegram кэширует
+    ответ и не присылает повторные нажатия той же кнопки, на сообщение - отказом.
+    """
+    @functools.wraps(handler)
+    async def wrapper(self, event, *args, **kwargs):
+        if event.from_user.id not in self.allowed_user_ids:
+            if isinstance(event, CallbackQuery):
+                await event.answer("❌ Доступ запрещен", show_alert=True, cache_time=ACCESS_DENIED_CACHE_TIME)
+            else:
+                await event.reply("❌ У вас нет доступа к админ панели.")
+            return
+        return await handler(self, event, *args, **kwargs)
+    return wrapper
+
+
+# Данные кнопок управления: aiogram упаковывает их в callback_data и разбирает в типизированную модель
+class SourceAction(CallbackData, prefix="src"):
+    action: str  # enable, disable, delete или info
+    id: str
+
+
+class KeywordAction(CallbackData, prefix="kw"):
+    action: str  # delete
+    id: str
+
+
 # Определяем состояния для FSM
 class AddSourceStates(StatesGroup):
     waiting_for_name = State()
@@ -42,23 +105,63 @@ class AdminBot:
         self.bot: Bot = None
         self.dp: Dispatcher = None
         self.router: Router = Router()
-        self.allowed_user_ids = self._parse_admin_user_ids()
-
-    def _parse_admin_user_ids(self) -> List[int]:
-        """Парсит список ID админов из настроек."""
+        self.allowed_user_ids: frozenset[int] = self._parse_admin_user_ids()
+        self._stats_cache: Optional[tuple[float, str]] = None
+
+        # Клавиатуры не меняются, поэтому создаются один раз, а не на каждое нажатие
+        self._main_keyboard = self._create_main_keyboard()
+        self._back_keyboards = {
+            target: self._create_back_keyboard(target)
+            for target in ("back_to_main", "sources_list", "keywords_list")
+        }
+
+    def _parse_admin_user_ids(self) -> frozenset[int]:
+        """Парсит список ID админов из настроек (frozenset: проверка доступа за O(1))."""
         if not settings.TELEGRAM_ADMIN_USER_IDS:
             logger.warning("TELEGRAM_ADMIN_USER_IDS not set. Admin bot will not work.")
-            return []
+            return frozenset()
 
         try:
-            return [int(uid.strip()) for uid in settings.TELEGRAM_ADMIN_USER_IDS.split(',')]
+            return frozenset(int(uid) for uid in settings.TELEGRAM_ADMIN_USER_IDS.split(',') if uid.strip())
         except ValueError as e:
             logger.error(f"Invalid TELEGRAM_ADMIN_USER_IDS format: {e}")
-            return []
+            return frozenset()
+
+    def _invalidate_stats(self):
+        """Сбрасывает кэш статистики после изменения источников или ключевых слов."""
+        self._stats_cache = None
 
-    def _is_admin(self, user_id: int) -> bool:
-        """Проверяет, является ли пользователь админом."""
-        return user_id in self.allowed_user_ids
+    async def _get_stats_text(self) -> str:
+        """
+        Собирает текст статистики одним запросом к БД.
+
+        Returns:
+            Текст статистики в Markdown
+        """
+        def count(model, *criteria):
+            return select(func.count()).select_from(model).where(*criteria).scalar_subquery()
+
+        session = async_session_factory()
+        try:
+            (total_sources, active_sources, total_keywords,
+             news_count, posts_total, posts_published) = (await session.execute(select(
+                count(Source),
+                count(Source, Source.enabled.is_(True)),
+                count(Keyword),
+                count(NewsItem),
+                count(Post),
+                count(Post, Post.status == PostStatus.PUBLISHED),
+            ))).one()
+        finally:
+            await session.close()
+
+        return (
+            "📊 *Статистика системы*\n\n"
+            f"📋 Источники: {total_sources} (активных: {active_sources})\n"
+            f"🔑 Ключевые слова: {total_keywords}\n"
+            f"📰 Новости: {news_count}\n"
+            f"📝 Посты: {posts_total} (опубликовано: {posts_published})"
+        )
 
     def _create_main_keyboard(self) -> InlineKeyboardMarkup:
         """Создает главную клавиатуру."""
@@ -76,69 +179,39 @@ class AdminBot:
         keyboard = [[InlineKeyboardButton(text="⬅️ Назад", callback_data=callback_data)]]
         return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
+    @admin_only
     async def start_command(self, message: Message):
         """Обработчик команды /start."""
-        if not self._is_admin(message.from_user.id):
-            await message.reply("❌ У вас нет доступа к админ панели.")
-            return
-
         await message.reply(
             "🤖 *Админ панель AI бота*\n\n"
             "Выберите действие:",
-            reply_markup=self._create_main_keyboard(),
+            reply_markup=self._main_keyboard,
             parse_mode=ParseMode.MARKDOWN
         )
 
+    @admin_only
     async def stats_callback(self, callback: CallbackQuery):
         """Показывает статистику системы."""
-        if not self._is_admin(callback.from_user.id):
-            await callback.answer("❌ Доступ запрещен")
-            return
-
         await callback.answer()
 
-        # Получаем статистику из базы данных
-        session = get_db_sync()
-        try:
-            total_sources = session.query(Source).count()
-            active_sources = session.query(Source).filter(Source.enabled == True).count()
-            total_keywords = session.query(Keyword).count()
-
-            # Получаем количество новостей и постов через прямой запрос
-            from sqlalchemy import text
-            news_count = session.execute(text("SELECT COUNT(*) FROM news_items")).scalar()
-            posts_total = session.execute(text("SELECT COUNT(*) FROM posts")).scalar()
-            posts_published = session.execute(text("SELECT COUNT(*) FROM posts WHERE status = 'PUBLISHED'")).scalar()
-
-            stats_text = (
-                "📊 *Статистика системы*\n\n"
-                f"📋 Источники: {total_sources} (активных: {active_sources})\n"
-                f"🔑 Ключевые слова: {total_keywords}\n"
-                f"📰 Новости: {news_count}\n"
-                f"📝 Посты: {posts_total} (опубликовано: {posts_published})"
-            )
-
-        except Exception as e:
-            logger.error(f"Error getting stats: {e}")
-            stats_text = "❌ Ошибка при получении статистики"
-        finally:
-            session.close()
+        # Статистику кэшируем: полные COUNT по posts/news_items дорогие, а кнопку нажимают часто
+        now = time.monotonic()
+        if self._stats_cache is not None and now - self._stats_cache[0] < STATS_CACHE_TTL:
+            stats_text = self._stats_cache[1]
+        else:
+            try:
+                stats_text = await self._get_stats_text()
+                self._stats_cache = (now, stats_text)
+            except Exception as e:
+                logger.error(f"Error getting stats: {e}")
+                stats_text = "❌ Ошибка при получении статистики"
 
         await callback.message.edit_text(
             stats_text,
-            reply_markup=self._create_back_keyboard(),
+            reply_markup=self._back_keyboards["back_to_main"],
             parse_mode=ParseMode.MARKDOWN
         )
 
-    def setup_handlers(self):
-        """Настраивает все обработчики."""
-        # Команды
-        self.router.message.register(self.start_command, CommandStart())
-
-        # Callback запросы
-        self.router.callback_query.register(self.stats_callback, F.data == "stats")
-        # Другие обработчики будут добавлены позже
-
     async def run(self):
         """Запускает бота."""
         if not settings.TELEGRAM_ADMIN_BOT_TOKEN:
@@ -156,35 +229,68 @@ class AdminBot:
         # Настраиваем обработчики
         self.setup_handlers()
 
-        logger.info("Admin bot started")
         try:
-            await self.dp.start_polling(self.bot)
+            if settings.TELEGRAM_ADMIN_MODE == 'webhook':
+                await self._run_webhook()
+            else:
+                # Снимаем webhook, если бот раньше работал в режиме webhook
+                await self.bot.delete_webhook()
+                logger.info("Admin bot started (polling)")
+                await self.dp.start_polling(self.bot)
         finally:
             await self.bot.session.close()
 
+    async def _run_webhook(self):
+        """
+        Принимает обновления через webhook вместо long polling.
 
-def run_admin_bot():
-    """Функция для запуска админ бота."""
-    import asyncio
+        Telegram сам присылает обновления на TELEGRAM_ADMIN_WEBHOOK_URL, поэтому
+        бот не держит постоянный запрос getUpdates и отвечает без задержки опроса.
+        """
+        from aiohttp import web
+        from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
 
-    bot = AdminBot()
-    asyncio.run(bot.run())
+        if not settings.TELEGRAM_ADMIN_WEBHOOK_URL:
+            logger.error("TELEGRAM_ADMIN_WEBHOOK_URL not set. Admin bot will not start in webhook mode.")
+            return
 
+        path = settings.TELEGRAM_ADMIN_WEBHOOK_PATH
+        app = web.Application()
+        SimpleRequestHandler(
+            dispatcher=self.dp,
+            bot=self.bot,
+            secret_token=settings.TELEGRAM_ADMIN_WEBHOOK_SECRET
+        ).register(app, path=path)
+        setup_application(app, self.dp, bot=self.bot)
+
+        await self.bot.set_webhook(
+            url=settings.TELEGRAM_ADMIN_WEBHOOK_URL.rstrip('/') + path,
+            secret_token=settings.TELEGRAM_ADMIN_WEBHOOK_SECRET,
+            allowed_updates=self.dp.resolve_used_update_types()
+        )
 
-if __name__ == "__main__":
-    run_admin_bot()
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, settings.TELEGRAM_ADMIN_WEBHOOK_HOST, settings.TELEGRAM_ADMIN_WEBHOOK_PORT)
+        await site.start()
+        logger.info(f"Admin bot started (webhook on port {settings.TELEGRAM_ADMIN_WEBHOOK_PORT})")
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await runner.cleanup()
 
+
+    @admin_only
     async def sources_list_callback(self, callback: CallbackQuery):
         """Показывает список источников."""
-        if not self._is_admin(callback.from_user.id):
-            await callback.answer("❌ Доступ запрещен")
-            return
-
         await callback.answer()
 
-        session = get_db_sync()
+        session = async_session_factory()
         try:
-            sources = session.query(Source).order_by(Source.name).all()
+            # Только отображаемые колонки: без создания ORM объектов для каждой строки
+            sources = (await session.execute(
+                select(Source.id, Source.name, Source.enabled, Source.type).order_by(Source.name)
+            )).all()
 
             if not sources:
                 text = "📋 *Источники*\n\nИсточников нет."
@@ -195,25 +301,24 @@ if __name__ == "__main__":
             else:
                 text = "📋 *Источники*\n\n"
                 keyboard = []
-                for source in sources:
-                    status = "✅" if source.enabled else "❌"
-                    source_type = "🌐 Сайт" if source.type == SourceType.SITE else "📱 Telegram"
+                for source_id, name, enabled, type_ in sources:
+                    status = "✅" if enabled else "❌"
+                    source_type = "🌐 Сайт" if type_ == SourceType.SITE else "📱 Telegram"
 
                     # Создаем кнопки для управления каждым источником
-                    action = "source_disable" if source.enabled else "source_enable"
-                    action_text = "🚫" if source.enabled else "✅"
+                    action = "disable" if enabled else "enable"
+                    action_text = "🚫" if enabled else "✅"
 
                     keyboard.append([
                         InlineKeyboardButton(
-                            text=f"{status} {source_type} {source.name}",
-                            callback_data=f"source_info_{source.id}"
+                            text=f"{status} {source_type} {name}",
+                            callback_data=SourceAction(action="info", id=source_id).pack()
                         )
                     ])
                     keyboard.append([
-                        InlineKeyboardButton(text=f"{action_text} Вкл/Выкл", callback_data=f"{action}_{source.id}"),
-                        InlineKeyboardButton(text="🗑️ Удалить", callback_data=f"source_delete_{source.id}")
+                        InlineKeyboardButton(text=f"{action_text} Вкл/Выкл", callback_data=SourceAction(action=action, id=source_id).pack()),
+                        InlineKeyboardButton(text="🗑️ Удалить", callback_data=SourceAction(action="delete", id=source_id).pack())
                     ])
-                    text += "\n"
 
                 # Добавляем кнопки управления
                 keyboard.append([InlineKeyboardButton(text="➕ Добавить", callback_data="source_add")])
@@ -224,9 +329,9 @@ if __name__ == "__main__":
         except Exception as e:
             logger.error(f"Error getting sources: {e}")
             text = "❌ Ошибка при получении источников"
-            reply_markup = self._create_back_keyboard("back_to_main")
+            reply_markup = self._back_keyboards["back_to_main"]
         finally:
-            session.close()
+            await session.close()
 
         await callback.message.edit_text(
             text,
@@ -234,17 +339,14 @@ if __name__ == "__main__":
             parse_mode=ParseMode.MARKDOWN
         )
 
+    @admin_only
     async def keywords_list_callback(self, callback: CallbackQuery):
         """Показывает список ключевых слов."""
-        if not self._is_admin(callback.from_user.id):
-            await callback.answer("❌ Доступ запрещен")
-            return
-
         await callback.answer()
 
-        session = get_db_sync()
+        session = async_session_factory()
         try:
-            keywords = session.query(Keyword).order_by(Keyword.word).all()
+            keywords = (await session.execute(select(Keyword).order_by(Keyword.word))).scalars().all()
 
             if not keywords:
                 text = "🔑 *Ключевые слова*\n\nКлючевых слов нет."
@@ -260,7 +362,7 @@ if __name__ == "__main__":
                     if i % 5 == 0:
                         keyboard.append([])
                     keyboard[-1].append(
-                        InlineKeyboardButton(text=f"❌ {keyword.word}", callback_data=f"keyword_delete_{keyword.id}")
+                        InlineKeyboardButton(text=f"❌ {keyword.word}", callback_data=KeywordAction(action="delete", id=keyword.id).pack())
                     )
 
                 # Добавляем кнопки управления
@@ -274,9 +376,9 @@ if __name__ == "__main__":
         except Exception as e:
             logger.error(f"Error getting keywords: {e}")
             text = "❌ Ошибка при получении ключевых слов"
-            reply_markup = self._create_back_keyboard("back_to_main")
+            reply_markup = self._back_keyboards["back_to_main"]
         finally:
-            session.close()
+            await session.close()
 
         await callback.message.edit_text(
             text,
@@ -284,27 +386,21 @@ if __name__ == "__main__":
             parse_mode=ParseMode.MARKDOWN
         )
 
+    @admin_only
     async def back_to_main_callback(self, callback: CallbackQuery):
         """Возвращает в главное меню."""
-        if not self._is_admin(callback.from_user.id):
-            await callback.answer("❌ Доступ запрещен")
-            return
-
         await callback.answer()
 
         await callback.message.edit_text(
             "🤖 *Админ панель AI бота*\n\n"
             "Выберите действие:",
-            reply_markup=self._create_main_keyboard(),
+            reply_markup=self._main_keyboard,
             parse_mode=ParseMode.MARKDOWN
         )
 
+    @admin_only
     async def source_add_callback(self, callback: CallbackQuery, state: FSMContext):
         """Начинает процесс добавления источника."""
-        if not self._is_admin(callback.from_user.id):
-            await callback.answer("❌ Доступ запрещен")
-            return
-
         await callback.answer()
 
         keyboard = [
@@ -321,12 +417,9 @@ if __name__ == "__main__":
             parse_mode=ParseMode.MARKDOWN
         )
 
+    @admin_only
     async def source_add_type_callback(self, callback: CallbackQuery, state: FSMContext):
         """Обработка выбора типа источника."""
-        if not self._is_admin(callback.from_user.id):
-            await callback.answer("❌ Доступ запрещен")
-            return
-
         await callback.answer()
 
         callback_data = callback.data
@@ -350,11 +443,9 @@ if __name__ == "__main__":
             parse_mode=ParseMode.MARKDOWN
         )
 
+    @admin_only
     async def source_name_message(self, message: Message, state: FSMContext):
         """Обработка ввода названия источника."""
-        if not self._is_admin(message.from_user.id):
-            return
-
         source_name = message.text
         data = await state.get_data()
         source_type = data.get('source_type')
@@ -372,66 +463,62 @@ if __name__ == "__main__":
             parse_mode=ParseMode.MARKDOWN
         )
 
+    @admin_only
     async def source_url_message(self, message: Message, state: FSMContext):
         """Обработка ввода URL источника."""
-        if not self._is_admin(message.from_user.id):
-            return
-
         source_url = message.text
         data = await state.get_data()
         source_name = data.get('source_name')
         source_type = data.get('source_type')
 
         # Сохраняем в базу данных
-        session = get_db_sync()
+        session = async_session_factory()
         try:
-            # Проверяем, существует ли уже источник
-            existing = session.query(Source).filter(
-                Source.name.ilike(source_name) | Source.url.ilike(source_url)
-            ).first()
-
-            if existing:
+            # Создаем новый источник; дубликат по названию или URL отсекает уникальный индекс
+            source_id = await _insert_or_ignore(
+                session,
+                Source,
+                name=source_name,
+                url=source_url,
+                type=SourceType.SITE if source_type == "site" else SourceType.TG,
+                enabled=True
+            )
+            await session.commit()
+
+            if source_id is None:
+                # Сравнение через lower() использует индексы ix_sources_*_lower, в отличие от ILIKE
+                existing = (await session.execute(select(Source).where(or_(
+                    func.lower(Source.name) == source_name.lower(),
+                    func.lower(Source.url) == source_url.lower()
+                )))).scalars().first()
                 await message.reply(
                     f"❌ Источник уже существует:\n"
-                    f"Название: {existing.name}\n"
-                    f"URL: {existing.url}"
+                    f"Название: {existing.name if existing else source_name}\n"
+                    f"URL: {existing.url if existing else source_url}"
                 )
             else:
-                # Создаем новый источник
-                from datetime import datetime
-                new_source = Source(
-                    name=source_name,
-                    url=source_url,
-                    type=SourceType.SITE if source_type == "site" else SourceType.TG,
-                    enabled=True,
-                    created_at=datetime.now()
-                )
-                session.add(new_source)
-                session.commit()
+                self._invalidate_stats()
 
                 await message.reply(
                     f"✅ Источник успешно добавлен!\n\n"
                     f"Название: {source_name}\n"
                     f"URL: {source_url}\n"
                     f"Тип: {'🌐 Сайт' if source_type == 'site' else '📱 Telegram канал'}",
-                    reply_markup=self._create_main_keyboard()
+                    reply_markup=self._main_keyboard
                 )
 
         except Exception as e:
             logger.error(f"Error adding source: {e}")
             await message.reply("❌ Ошибка при добавлении источника")
         finally:
-            session.close()
+            await session.close()
 
         # Очищаем состояние
         await state.clear()
 
+    @admin_only
     async def keyword_add_callback(self, callback: CallbackQuery, state: FSMContext):
         """Начинает процесс добавления ключевого слова."""
-        if not self._is_admin(callback.from_user.id):
-            await callback.answer("❌ Доступ запрещен")
-            return
-
         await callback.answer()
 
         # Устанавливаем состояние
@@ -443,209 +530,224 @@ if __name__ == "__main__":
             parse_mode=ParseMode.MARKDOWN
         )
 
+    @admin_only
     async def keyword_word_message(self, message: Message, state: FSMContext):
         """Обработка ввода ключевого слова."""
-        if not self._is_admin(message.from_user.id):
-            return
-
         word = message.text
 
         # Сохраняем в базу данных
-        session = get_db_sync()
+        session = async_session_factory()
         try:
-            # Проверяем, существует ли уже ключевое слово
-            existing = session.query(Keyword).filter(Keyword.word.ilike(word)).first()
+            # Создаем новое ключевое слово; существующее отсекает уникальный индекс
+            keyword_id = await _insert_or_ignore(
+                session,
+                Keyword,
+                word=word.lower()
+            )
+            await session.commit()
 
-            if existing:
+            if keyword_id is None:
                 await message.reply(
                     f"❌ Ключевое слово `{word}` уже существует",
-                    reply_markup=self._create_main_keyboard()
+                    reply_markup=self._main_keyboard
                 )
             else:
-                # Создаем новое ключевое слово
-                from datetime import datetime
-                new_keyword = Keyword(
-                    word=word.lower(),
-                    created_at=datetime.now()
-                )
-                session.add(new_keyword)
-                session.commit()
+                self._invalidate_stats()
 
                 await message.reply(
                     f"✅ Ключевое слово `{word}` успешно добавлено!",
-                    reply_markup=self._create_main_keyboard()
+                    reply_markup=self._main_keyboard
                 )
 
         except Exception as e:
             logger.error(f"Error adding keyword: {e}")
             await message.reply("❌ Ошибка при добавлении ключевого слова")
         finally:
-            session.close()
+            await session.close()
 
         # Очищаем состояние
         await state.clear()
 
-    async def source_toggle_callback(self, callback: CallbackQuery):
+    @admin_only
+    async def source_toggle_callback(self, callback: CallbackQuery, callback_data: SourceAction):
         """Включает/выключает источник."""
-        if not self._is_admin(callback.from_user.id):
-            await callback.answer("❌ Доступ запрещен")
-            return
-
         await callback.answer()
 
-        callback_data = callback.data
-        parts = callback_data.split('_', 2)
-        if len(parts) < 3:
-            return
-
-        action = parts[1]  # enable или disable
-        source_id = parts[2]
-        enable = action == "enable"
+        source_id = callback_data.id
+        enable = callback_data.action == "enable"
 
-        session = get_db_sync()
+        session = async_session_factory()
         try:
-            source = session.query(Source).filter(Source.id == source_id).first()
+            source = await session.get(Source, source_id)
 
             if not source:
                 await callback.message.edit_text(
                     "❌ Источник не найден",
-                    reply_markup=self._create_back_keyboard("sources_list")
+                    reply_markup=self._back_keyboards["sources_list"]
                 )
                 return
 
             # Меняем статус
             source.enabled = enable
-            session.commit()
+            await session.commit()
+            self._invalidate_stats()
 
             action_text = "включен" if enable else "выключен"
             await callback.message.edit_text(
                 f"✅ Источник `{source.name}` {action_text}!",
-                reply_markup=self._create_back_keyboard("sources_list")
+                reply_markup=self._back_keyboards["sources_list"]
             )
 
         except Exception as e:
             logger.error(f"Error toggling source: {e}")
             await callback.message.edit_text(
                 "❌ Ошибка при изменении статуса источника",
-                reply_markup=self._create_back_keyboard("sources_list")
+                reply_markup=self._back_keyboards["sources_list"]
             )
         finally:
-            session.close()
+            await session.close()
 
-    async def source_delete_callback(self, callback: CallbackQuery):
+    @admin_only
+    async def source_delete_callback(self, callback: CallbackQuery, callback_data: SourceAction):
         """Удаляет источник."""
-        if not self._is_admin(callback.from_user.id):
-            await callback.answer("❌ Доступ запрещен")
-            return
-
         await callback.answer()
 
-        callback_data = callback.data
-        parts = callback_data.split('_', 2)
-        if len(parts) < 3:
-            return
-
-        source_id = parts[2]
+        source_id = callback_data.id
 
-        session = get_db_sync()
+        session = async_session_factory()
         try:
-            source = session.query(Source).filter(Source.id == source_id).first()
+            source = await session.get(Source, source_id)
 
             if not source:
                 await callback.message.edit_text(
                     "❌ Источник не найден",
-                    reply_markup=self._create_back_keyboard("sources_list")
+                    reply_markup=self._back_keyboards["sources_list"]
                 )
                 return
 
             # Удаляем источник
             name = source.name
-            session.delete(source)
-            session.commit()
+            await session.delete(source)
+            await session.commit()
+            self._invalidate_stats()
 
             await callback.message.edit_text(
                 f"✅ Источник `{name}` удален!",
-                reply_markup=self._create_back_keyboard("sources_list")
+                reply_markup=self._back_keyboards["sources_list"]
             )
 
         except Exception as e:
             logger.error(f"Error deleting source: {e}")
             await callback.message.edit_text(
                 "❌ Ошибка при удалении источника",
-                reply_markup=self._create_back_keyboard("sources_list")
+                reply_markup=self._back_keyboards["sources_list"]
             )
         finally:
-            session.close()
+            await session.close()
 
-    async def keyword_delete_callback(self, callback: CallbackQuery):
+    @admin_only
+    async def keyword_delete_callback(self, callback: CallbackQuery, callback_data: KeywordAction):
         """Удаляет ключевое слово."""
-        if not self._is_admin(callback.from_user.id):
-            await callback.answer("❌ Доступ запрещен")
-            return
-
         await callback.answer()
 
-        callback_data = callback.data
-        parts = callback_data.split('_', 2)
-        if len(parts) < 3:
-            return
+        keyword_id = callback_data.id
 
-        keyword_id = parts[2]
-
-        session = get_db_sync()
+        session = async_session_factory()
         try:
-            keyword = session.query(Keyword).filter(Keyword.id == keyword_id).first()
+            keyword = await session.get(Keyword, keyword_id)
 
             if not keyword:
                 await callback.message.edit_text(
                     "❌ Ключевое слово не найдено",
-                    reply_markup=self._create_back_keyboard("keywords_list")
+                    reply_markup=self._back_keyboards["keywords_list"]
                 )
                 return
 
             # Удаляем ключевое слово
             word = keyword.word
-            session.delete(keyword)
-            session.commit()
+            await session.delete(keyword)
+            await session.commit()
+            self._invalidate_stats()
 
             await callback.message.edit_text(
                 f"✅ Ключевое слово `{word}` удалено!",
-                reply_markup=self._create_back_keyboard("keywords_list")
+                reply_markup=self._back_keyboards["keywords_list"]
             )
 
         except Exception as e:
             logger.error(f"Error deleting keyword: {e}")
             await callback.message.edit_text(
                 "❌ Ошибка при удалении ключевого слова",
-                reply_markup=self._create_back_keyboard("keywords_list")
+                reply_markup=self._back_keyboards["keywords_list"]
             )
         finally:
-            session.close()
+            await session.close()
 
     def setup_handlers(self):
         """Настраивает все обработчики."""
         # Команды
         self.router.message.register(self.start_command, CommandStart())
 
-        # Callback запросы
-        self.router.callback_query.register(self.stats_callback, F.data == "stats")
-        self.router.callback_query.register(self.sources_list_callback, F.data == "sources_list")
-        self.router.callback_query.register(self.keywords_list_callback, F.data == "keywords_list")
-        self.router.callback_query.register(self.source_add_callback, F.data == "source_add")
-        self.router.callback_query.register(self.keyword_add_callback, F.data == "keyword_add")
-        self.router.callback_query.register(self.back_to_main_callback, F.data == "back_to_main")
-
-        # Типы источников
-        self.router.callback_query.register(self.source_add_type_callback, F.data.startswith("source_add_type_"))
-
-        # Управление источниками
-        self.router.callback_query.register(self.source_toggle_callback, F.data.startswith(("source_enable_", "source_disable_")))
-        self.router.callback_query.register(self.source_delete_callback, F.data.startswith("source_delete_"))
-
-        # Управление ключевыми словами
-        self.router.callback_query.register(self.keyword_delete_callback, F.data.startswith("keyword_delete_"))
+        # Callback запросы разбираются одним обработчиком по таблицам точных значений
+        # и CallbackData префиксов, вместо проверки десятка фильтров по очереди на каждое нажатие.
+        # Значение: (обработчик, нужен ли ему FSMContext)
+        self._exact_callbacks = {
+            "stats": (self.stats_callback, False),
+            "sources_list": (self.sources_list_callback, False),
+            "keywords_list": (self.keywords_list_callback, False),
+            "source_add": (self.source_add_callback, True),
+            "keyword_add": (self.keyword_add_callback, True),
+            "back_to_main": (self.back_to_main_callback, False),
+            "source_add_type_site": (self.source_add_type_callback, True),
+            "source_add_type_tg": (self.source_add_type_callback, True),
+        }
+        # Префикс CallbackData -> (класс данных, обработчики по action)
+        self._action_callbacks = {
+            SourceAction.__prefix__: (SourceAction, {
+                "enable": self.source_toggle_callback,
+                "disable": self.source_toggle_callback,
+                "delete": self.source_delete_callback,
+            }),
+            KeywordAction.__prefix__: (KeywordAction, {
+                "delete": self.keyword_delete_callback,
+            }),
+        }
+        self.router.callback_query.register(self.dispatch_callback)
 
         # FSM состояния
         self.router.message.register(self.source_name_message, AddSourceStates.waiting_for_name)
         self.router.message.register(self.source_url_message, AddSourceStates.waiting_for_url)
         self.router.message.register(self.keyword_word_message, AddKeywordStates.waiting_for_word)
+
+    async def dispatch_callback(self, callback: CallbackQuery, state: FSMContext):
+        """Вызывает обработчик callback запроса по значению или префиксу callback_data."""
+        data = callback.data or ""
+        entry = self._exact_callbacks.get(data)
+        if entry is not None:
+            handler, needs_state = entry
+            if needs_state:
+                await handler(callback, state)
+            else:
+                await handler(callback)
+            return
+
+        action_entry = self._action_callbacks.get(data.partition(":")[0])
+        if action_entry is not None:
+            factory, handlers = action_entry
+            callback_data = factory.unpack(data)
+            handler = handlers.get(callback_data.action)
+            if handler is not None:
+                await handler(callback, callback_data)
+                return
+
+        await callback.answer()
+
+
+def run_admin_bot():
+    """Функция для запуска админ бота."""
+    bot = AdminBot()
+    asyncio.run(bot.run())
+
+
+if __name__ == "__main__":
+    run_admin_bot()
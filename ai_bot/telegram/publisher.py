@@ -1,13 +1,21 @@
 """Модуль для публикации постов в Telegram."""
 
+import asyncio
 import logging
-from typing import Optional
+import threading
+import time
+from collections import defaultdict, deque
+from functools import lru_cache
+from typing import List, Optional
 
+from ai_bot.ai.backpressure import backoff_delay
+from ai_bot.ai.openai_client import run_sync
 from ai_bot.config import settings
+from ai_bot.news_parser.telegram import drop_client, get_connected_client
 
 logger = logging.getLogger(__name__)
 try:
-    from telethon import TelegramClient
+    from telethon.errors import FloodWaitError
     HAS_TELETHON = True
 except ImportError:
     HAS_TELETHON = False
@@ -15,131 +23,227 @@ except ImportError:
 
 try:
     import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
     HAS_REQUESTS = True
 except ImportError:
     HAS_REQUESTS = False
 
 
-def _create_telegram_client():
-    """Создает клиент для работы с Telegram"""
+def _create_bot_api_session() -> "requests.Session":
+    """
+    Создает сессию Bot API с небольшим пулом keep-alive соединений.
+
+    Повторяются только ошибки установки соединения: повтор POST после
+    ответа сервера мог бы опубликовать пост дважды, а 429 обрабатывается отдельно.
+    """
+    session = requests.Session()
+    retry = Retry(total=3, connect=3, read=0, status=0, backoff_factor=0.3)
+    session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=retry))
+    return session
+
+
+# Общая сессия для Bot API: соединение с api.telegram.org переиспользуется между постами
+bot_api_session = _create_bot_api_session() if HAS_REQUESTS else None
+
+# Сколько раз повторять отправку после ответа 429 / FloodWait
+PUBLISH_MAX_ATTEMPTS = 3
+# Дольше 429 / FloodWait не ждем: задача не должна упираться в time limit и занимать общий loop,
+# посты остаются GENERATED и публикуются в следующий запуск
+PUBLISH_MAX_WAIT = 30
+# Таймауты запроса к Bot API (connect, read): недоступный хост отсекается за секунды
+BOT_API_TIMEOUT = (3.05, 15)
+
+# Ограничение Telegram на длину текста сообщения и разделитель постов в сгруппированном сообщении
+TELEGRAM_MESSAGE_MAX_LENGTH = 4096
+POST_GROUP_SEPARATOR = '\n\n———\n\n'
+
+# Канал по умолчанию без '@': нормализуется один раз при импорте, а не для каждого поста
+DEFAULT_CHANNEL = (settings.TELEGRAM_CHANNEL_USERNAME or '').lstrip('@')
+
+
+class SendRateLimiter:
+    """
+    Ограничитель частоты отправки сообщений по скользящему окну.
+    
+    acquire() блокирует поток, пока в окне period секунд не освободится место
+    для еще одного сообщения.
+    """
+
+    def __init__(self, limit: int, period: float):
+        self.limit = limit
+        self.period = period
+        self._sent: deque[float] = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._sent and self._sent[0] <= now - self.period:
+                    self._sent.popleft()
+                if len(self._sent) < self.limit:
+                    self._sent.append(now)
+                    return
+                delay = self._sent[0] + self.period - now
+            logger.info(f'Telegram rate limit, waiting {delay:.1f}s')
+            time.sleep(delay)
+
+
+# Лимиты Bot API: ~30 сообщений в секунду всего и ~20 в минуту в один канал
+global_send_limiter = SendRateLimiter(settings.TELEGRAM_GLOBAL_MESSAGES_PER_SECOND, 1.0)
+channel_send_limiters: defaultdict[str, SendRateLimiter] = defaultdict(
+    lambda: SendRateLimiter(settings.TELEGRAM_CHANNEL_MESSAGES_PER_MINUTE, 60.0)
+)
+
+
+def _wait_send_slot(channel: str) -> None:
+    """Ждет, пока отправка в канал (username без '@') укладывается в глобальный и поканальный лимиты."""
+    channel_send_limiters[channel.lower()].acquire()
+    global_send_limiter.acquire()
+
+
+class PublishRateLimitedError(Exception):
+    """Telegram просит подождать с отправкой дольше PUBLISH_MAX_WAIT или повторы исчерпаны."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f'Telegram rate limit: retry after {retry_after}s')
+        self.retry_after = retry_after
+
+
+@lru_cache(maxsize=1)
+def _get_client_type() -> Optional[str]:
+    """
+    Выбирает способ публикации: "bot_api", "telethon" или None, если ничего не настроено.
+    
+    Настройки не меняются во время работы процесса, поэтому выбор делается один раз.
+    """
     # Приоритет: сначала пробуем Bot API (для автоматической публикации)
     if settings.TELEGRAM_BOT_TOKEN:
         logger.info("Using Bot API client")
-        return settings.TELEGRAM_BOT_TOKEN, "bot_api"
+        return "bot_api"
 
     # Если нет Bot API токена, пробуем Telethon (для парсинга каналов)
     elif (HAS_TELETHON and
             settings.TELEGRAM_API_ID and
             settings.TELEGRAM_API_HASH):
-
-        api_id = settings.TELEGRAM_API_ID
-        api_hash = settings.TELEGRAM_API_HASH
-        session_name = settings.TELEGRAM_SESSION_NAME or 'ai_bot_session'
-        
-        # Используем полный путь к сессии внутри контейнера
-        session_path = f'/ai_bot/telegram/telegram_sessions/{session_name}'
-
         logger.info("Using Telethon client")
-        return TelegramClient(session_path, api_id, api_hash), "telethon"
+        return "telethon"
 
     else:
         logger.error('Neither Bot API token nor Telethon credentials are configured')
-        return None, None
-
-
-def _publish_via_telethon(client: TelegramClient, text: str, channel_name: str) -> bool:
-    """Публикация через Telethon"""
-    target_channel = channel_name or settings.TELEGRAM_CHANNEL_USERNAME
-    if not target_channel:
-        logger.error('Telegram channel not configured')
-        return False
+        return None
 
-    if target_channel.startswith('@'):
-        target_channel = target_channel[1:]
 
+def _publish_via_telethon(text: str, target_channel: str, silent: bool = False) -> bool:
+    """Публикация через Telethon (target_channel - username без '@')"""
     try:
-        import asyncio
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            result = loop.run_until_complete(_publish_telethon_async(client, text, target_channel))
-            # Правильно закрываем клиент перед закрытием loop
-            try:
-                if client.is_connected():
-                    loop.run_until_complete(client.disconnect())
-            except Exception:
-                pass
-            return result
-        finally:
-            # Закрываем все pending tasks
-            pending = asyncio.all_tasks(loop)
-            for task in pending:
-                task.cancel()
-            if pending:
-                loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
-            loop.close()
+        # Клиент общий с парсером каналов и живет в фоновом loop: MTProto соединение
+        # и авторизация не устанавливаются заново для каждого поста
+        return run_sync(_publish_telethon_async(text, target_channel, silent))
+    except PublishRateLimitedError:
+        raise
     except Exception as e:
         logger.error(f'Telethon publishing failed: {e}', exc_info=True)
         return False
 
 
-async def _publish_telethon_async(client: TelegramClient, text: str, target_channel: str) -> bool:
+async def _publish_telethon_async(text: str, target_channel: str, silent: bool = False) -> bool:
     """Асинхронная публикация через Telethon"""
-    try:
-        # Используем start() для автоматической загрузки сессии
-        await client.start()
-
-        if not await client.is_user_authorized():
-            logger.error('Telegram client not authorized. Use create_session_docker.py to authorize')
-            return False
+    client = await get_connected_client()
+    if not client:
+        return False
 
-        await client.send_message(target_channel, text)
-        logger.info(f'Post published via Telethon to: {target_channel}')
-        return True
+    try:
+        for attempt in range(PUBLISH_MAX_ATTEMPTS):
+            try:
+                await client.send_message(
+                    target_channel,
+                    text,
+                    link_preview=settings.TELEGRAM_LINK_PREVIEW,
+                    silent=silent
+                )
+                logger.info(f'Post published via Telethon to: {target_channel}')
+                return True
+            except FloodWaitError as e:
+                if e.seconds > PUBLISH_MAX_WAIT or attempt == PUBLISH_MAX_ATTEMPTS - 1:
+                    raise PublishRateLimitedError(e.seconds) from e
+                logger.warning(f'FloodWait from Telegram, retrying in {e.seconds}s')
+                await asyncio.sleep(e.seconds)
+        return False
+    except PublishRateLimitedError:
+        raise
+    except ConnectionError as e:
+        # Соединение оборвалось: следующий пост подключит клиент заново
+        logger.error(f'Error publishing via Telethon: {e}')
+        await drop_client(client)
+        return False
     except Exception as e:
         logger.error(f'Error publishing via Telethon: {e}', exc_info=True)
         return False
 
 
-def _publish_via_bot_api(bot_token: str, text: str, channel_name: str) -> bool:
-    """Публикация через Bot API"""
+def _publish_via_bot_api(bot_token: str, text: str, channel: str, silent: bool = False) -> bool:
+    """Публикация через Bot API (channel - username без '@')"""
     if not HAS_REQUESTS:
         logger.error("requests library not available for Bot API")
         return False
 
-    target_channel = channel_name or settings.TELEGRAM_CHANNEL_USERNAME
-    if not target_channel:
-        logger.error('Telegram channel not configured')
-        return False
-
     # Bot API требует @ в начале для username каналов
-    if not target_channel.startswith('@'):
-        target_channel = f'@{target_channel}'
+    target_channel = f'@{channel}'
 
     try:
         url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
         data = {
             'chat_id': target_channel,
             'text': text,
-            'parse_mode': 'HTML'
+            'parse_mode': 'HTML',
+            'disable_notification': silent,
+            # С выключенным превью (TELEGRAM_LINK_PREVIEW=false) Telegram не загружает страницу по ссылке перед ответом
+            'link_preview_options': {'is_disabled': not settings.TELEGRAM_LINK_PREVIEW}
         }
 
-        response = requests.post(url, data=data, timeout=10)
-        result = response.json()
+        for attempt in range(PUBLISH_MAX_ATTEMPTS):
+            # JSON тело вместо form-urlencoded: длинный HTML текст не кодируется в %XX
+            response = bot_api_session.post(url, json=data, timeout=BOT_API_TIMEOUT)
+
+            # 5xx: временная ошибка на стороне Telegram (тело может быть не JSON), повторяем с backoff
+            if response.status_code >= 500:
+                if attempt == PUBLISH_MAX_ATTEMPTS - 1:
+                    logger.error(f'Bot API server error {response.status_code} after {attempt + 1} attempts')
+                    return False
+                delay = backoff_delay(attempt, 0.3, 5)
+                logger.warning(f'Bot API server error {response.status_code}, retrying in {delay:.1f}s')
+                time.sleep(delay)
+                continue
 
-        if result.get('ok'):
-            logger.info(f'Post published via Bot API to: {target_channel}')
-            return True
-        else:
-            logger.error(f'Bot API error: {result.get("description")}')
+            result = response.json()
+
+            if result.get('ok'):
+                logger.info(f'Post published via Bot API to: {target_channel}')
+                return True
+
+            # 429: Telegram сообщает, через сколько секунд можно повторить
+            retry_after = (result.get('parameters') or {}).get('retry_after')
+            if result.get('error_code') == 429 and retry_after:
+                if retry_after > PUBLISH_MAX_WAIT or attempt == PUBLISH_MAX_ATTEMPTS - 1:
+                    raise PublishRateLimitedError(retry_after)
+                logger.warning(f'Bot API rate limit, retrying in {retry_after}s')
+                time.sleep(retry_after)
+                continue
+
+            logger.error(f'Bot API error after {attempt + 1} attempts: {result.get("description")}')
             return False
+        return False
 
+    except PublishRateLimitedError:
+        raise
     except Exception as e:
         logger.error(f'Bot API publishing failed: {e}', exc_info=True)
         return False
 
 
-def publish_post(text: str, channel_name: Optional[str] = None) -> bool:
+def publish_post(text: str, channel_name: Optional[str] = None, silent: bool = False) -> bool:
     """
     Публикует пост в Telegram канал.
     
@@ -149,21 +253,63 @@ def publish_post(text: str, channel_name: Optional[str] = None) -> bool:
     Args:
         text: Текст поста для публикации
         channel_name: Username канала (опционально, если не указан - используется из настроек)
+        silent: Отправить без звукового уведомления подписчикам
         
     Returns:
         True если публикация успешна, False иначе
+        
+    Raises:
+        PublishRateLimitedError: Telegram просит подождать дольше PUBLISH_MAX_WAIT
     """
-    client, client_type = _create_telegram_client()
+    client_type = _get_client_type()
 
-    if not client:
+    if not client_type:
         logger.error('Telegram client not configured. Set either TELEGRAM_API_ID/TELEGRAM_API_HASH or TELEGRAM_BOT_TOKEN')
         return False
 
+    channel = channel_name.lstrip('@') if channel_name else DEFAULT_CHANNEL
+    if not channel:
+        logger.error('Telegram channel not configured')
+        return False
+
+    _wait_send_slot(channel)
+
     if client_type == "telethon":
-        return _publish_via_telethon(client, text, channel_name)
+        return _publish_via_telethon(text, channel, silent)
     elif client_type == "bot_api":
-        return _publish_via_bot_api(client, text, channel_name)
+        return _publish_via_bot_api(settings.TELEGRAM_BOT_TOKEN, text, channel, silent)
     else:
         logger.error(f'Unknown client type: {client_type}')
         return False
 
+
+def can_group_posts(texts: List[str], text: str) -> bool:
+    """
+    Проверяет, можно ли добавить пост к группе для публикации одним сообщением.
+    
+    Args:
+        texts: Тексты постов, уже собранных в группу
+        text: Текст очередного поста
+        
+    Returns:
+        True если группа не превысит TELEGRAM_PUBLISH_GROUP_SIZE и лимит длины сообщения
+    """
+    if len(texts) >= settings.TELEGRAM_PUBLISH_GROUP_SIZE:
+        return False
+    length = sum(len(t) for t in texts) + len(text) + len(POST_GROUP_SEPARATOR) * len(texts)
+    return length <= TELEGRAM_MESSAGE_MAX_LENGTH
+
+
+def publish_post_batch(texts: List[str], channel_name: Optional[str] = None, silent: bool = False) -> bool:
+    """
+    Публикует несколько постов одним сообщением (N постов - один запрос к API).
+    
+    Args:
+        texts: Тексты постов (суммарно не длиннее лимита сообщения, см. can_group_posts)
+        channel_name: Username канала (опционально, если не указан - используется из настроек)
+        silent: Отправить без звукового уведомления подписчикам
+        
+    Returns:
+        True если публикация успешна, False иначе
+    """
+    return publish_post(POST_GROUP_SEPARATOR.join(texts), channel_name, silent)
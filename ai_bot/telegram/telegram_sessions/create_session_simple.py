@@ -1,18 +1,20 @@
 import asyncio
 import os
+import re
 from telethon import TelegramClient
 
+# Строка KEY=value; комментарии и пустые строки под шаблон не подходят
+ENV_LINE_RE = re.compile(r'^\s*([A-Za-z_][A-Za-z0-9_]*)\s*=\s*(.*?)\s*$', re.M)
+
 # Читаем из переменных окружения или .env файла
 def load_env():
-    """Загружаем переменные из .env файла"""
+    """Загружаем переменные из .env файла (уже заданные в окружении не перезаписываются)"""
     env_file = '.env'
     if os.path.exists(env_file):
-        with open(env_file, 'r') as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith('#') and '=' in line:
-                    key, value = line.split('=', 1)
-                    os.environ[key.strip()] = value.strip()
+        with open(env_file, 'r', encoding='utf-8') as f:
+            data = f.read()
+        for key, value in ENV_LINE_RE.findall(data):
+            os.environ.setdefault(key, value)
 
 load_env()
 
@@ -1,41 +1,65 @@
 """Утилиты для работы с новостями и парсерами."""
 
 import logging
+import time
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+from uuid import uuid4
 
+from sqlalchemy import select, insert, update
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
 
-from ai_bot.db.models import Source, NewsItem, Post
-from ai_bot.db.models_utils import SourceType
+from ai_bot.db.models import NewsItem, Post
+from ai_bot.db.models_utils import PostStatus
+from ai_bot.news_parser.base import BaseParser
 from ai_bot.news_parser.sites import HabrParser, SiteParser
 
 logger = logging.getLogger(__name__)
 
+# Максимум значений в одном IN (...) при проверке дубликатов
+IN_CHUNK_SIZE = 500
 
-def check_duplicate(session: Session, url: str = None, title: str = None) -> bool:
+# Сколько секунд переиспользовать загруженные ключевые слова между запусками задач
+KEYWORDS_CACHE_TTL = 60
+_keywords_cache: Optional[tuple[float, List[str]]] = None
+
+
+class _NewsFilter(BaseParser):
+    """Фильтры BaseParser для новостей из БД (сам ничего не парсит)."""
+
+    def parse(self, limit: int = 50) -> List[Dict[str, Any]]:
+        return []
+
+
+# Экземпляр фильтра создается один раз, а не на каждую новость
+_news_filter = _NewsFilter()
+
+
+def load_existing_keys(session: Session, news_items: List[Dict[str, Any]]) -> tuple[set, set]:
     """
-    Проверяет наличие дубликатов новостей по URL или заголовку.
+    Находит среди новостей уже сохраненные в БД URL и заголовки.
     
     Args:
         session: Сессия базы данных
-        url: URL новости для проверки
-        title: Заголовок новости для проверки
+        news_items: Список словарей с данными новостей
         
     Returns:
-        True если дубликат найден, False иначе
+        Кортеж (множество существующих URL, множество существующих заголовков)
     """
-    if url:
-        existing = session.query(NewsItem).filter(NewsItem.url == url).first()
-        if existing:
-            return True
-    
-    if title:
-        existing = session.query(NewsItem).filter(NewsItem.title == title).first()
-        if existing:
-            return True
-    
-    return False
+    urls = list({item['url'] for item in news_items if item.get('url')})
+    titles = list({item['title'] for item in news_items if item.get('title')})
+
+    # IN запрашивается частями, чтобы большая пачка не упиралась в лимит параметров запроса (SQLite)
+    seen_urls, seen_titles = set(), set()
+    # Результат читается порциями (yield_per), множества растут постепенно
+    for i in range(0, len(urls), IN_CHUNK_SIZE):
+        stmt = select(NewsItem.url).where(NewsItem.url.in_(urls[i:i + IN_CHUNK_SIZE]))
+        seen_urls.update(session.scalars(stmt.execution_options(yield_per=IN_CHUNK_SIZE)))
+    for i in range(0, len(titles), IN_CHUNK_SIZE):
+        stmt = select(NewsItem.title).where(NewsItem.title.in_(titles[i:i + IN_CHUNK_SIZE]))
+        seen_titles.update(session.scalars(stmt.execution_options(yield_per=IN_CHUNK_SIZE)))
+    return seen_urls, seen_titles
 
 
 def save_news_items(session: Session, news_items: List[Dict[str, Any]]) -> int:
@@ -49,38 +73,52 @@ def save_news_items(session: Session, news_items: List[Dict[str, Any]]) -> int:
     Returns:
         Количество успешно сохраненных новостей
     """
-    saved_count = 0
-    
+    # Уже сохраненные URL и заголовки получаем двумя запросами на всю пачку, а не по запросу на новость
+    seen_urls, seen_titles = load_existing_keys(session, news_items)
+
+    news_rows = []
     for item_data in news_items:
-        if check_duplicate(session, url=item_data.get('url'), title=item_data.get('title')):
+        url, title = item_data.get('url'), item_data.get('title')
+        if (url and url in seen_urls) or (title and title in seen_titles):
             logger.debug(f"Пропущен дубликат: {item_data.get('title', 'Без названия')}")
             continue
 
         try:
-            news_item = NewsItem(
-                source=item_data.get('source', 'unknown'),
-                title=item_data['title'],
-                summary=item_data.get('summary', ''),
-                url=item_data.get('url'),
-                img=item_data.get('img'),
-                author=item_data.get('author'),
-                published_at=item_data.get('published_at', datetime.now()),
-                raw_text=item_data.get('raw_text'),
-            )
-            # Сначала добавляем news_item, чтобы получить id
-            session.add(news_item)
-            session.flush()  # Получаем id для news_item
-            
-            # Теперь создаем Post с правильным news_id
-            new_post = Post(news_id=news_item.id)
-            session.add(new_post)
-            saved_count += 1
-            logger.debug(f"Добавлена новость: {item_data.get('title', 'Без названия')}")
-        except Exception as e:
-            logger.error(f"Ошибка при сохранении новости '{item_data.get('title', 'Без названия')}': {e}")
+            news_rows.append({
+                # id задаем сами, чтобы сразу связать с ним пост без flush и RETURNING
+                'id': str(uuid4()),
+                'source': item_data.get('source', 'unknown'),
+                'title': item_data['title'],
+                'summary': item_data.get('summary', ''),
+                'url': item_data.get('url'),
+                'img': item_data.get('img'),
+                'author': item_data.get('author'),
+                'published_at': item_data.get('published_at', datetime.now()),
+                'raw_text': item_data.get('raw_text'),
+            })
+        except KeyError as e:
+            logger.error(f"Ошибка при сохранении новости '{item_data.get('title', 'Без названия')}': нет поля {e}")
             continue
 
+        # Дубликаты внутри одной пачки тоже пропускаем
+        seen_urls.add(url)
+        seen_titles.add(title)
+        logger.debug(f"Добавлена новость: {item_data.get('title', 'Без названия')}")
+
+    saved_count = 0
     try:
+        # Новости и посты вставляются двумя пакетными INSERT вместо INSERT + flush на каждую новость.
+        # ON CONFLICT DO NOTHING: новость, которую параллельная задача успела сохранить между
+        # проверкой дубликатов и вставкой, пропускается по уникальному индексу, а не роняет всю пачку
+        if news_rows:
+            dialect_insert = postgresql.insert if session.get_bind().dialect.name == 'postgresql' else sqlite.insert
+            inserted_ids = set(session.scalars(
+                dialect_insert(NewsItem).on_conflict_do_nothing().returning(NewsItem.id),
+                news_rows
+            ))
+            if inserted_ids:
+                session.execute(insert(Post), [{'news_id': news_id} for news_id in inserted_ids])
+            saved_count = len(inserted_ids)
         session.commit()
         logger.info(f"Сохранено новостей: {saved_count} из {len(news_items)}")
     except Exception as e:
@@ -91,111 +129,172 @@ def save_news_items(session: Session, news_items: List[Dict[str, Any]]) -> int:
     return saved_count
 
 
-def parse_site_source(session: Session, source: Source) -> int:
+def save_generated_posts(session: Session, results: Dict[str, str], batch_id: Optional[str] = None) -> int:
     """
-    Парсит новости из веб-источника.
+    Записывает сгенерированные тексты в посты пакетно.
+    
+    Существующие посты в статусе NEW или FAILED обновляются одним bulk UPDATE по первичному ключу,
+    для новостей без постов посты создаются одним bulk INSERT. Посты в остальных статусах
+    (например, уже опубликованные) не трогаются, чтобы не опубликовать их повторно.
+    Коммит выполняет вызывающий код.
     
     Args:
         session: Сессия базы данных
-        source: Объект источника для парсинга
+        results: Словарь {ID новости: сгенерированный текст}
+        batch_id: ID батча Batch API - обновляются только посты, закрепленные за этим батчем,
+            новые посты не создаются
         
     Returns:
-        Количество сохраненных новостей
+        Количество записанных постов
     """
-    if source.type != SourceType.SITE or not source.enabled:
+    if not results:
         return 0
+
+    stmt = select(Post.id, Post.news_id, Post.status).where(Post.news_id.in_(list(results)))
+    if batch_id:
+        stmt = stmt.where(Post.batch_id == batch_id)
+    existing = session.execute(stmt).all()
+
+    updates = [
+        {'id': post_id, 'news_id': news_id, 'generated_text': results[news_id],
+         'status': PostStatus.GENERATED, 'batch_id': None}
+        for post_id, news_id, status in existing
+        if status in (PostStatus.NEW, PostStatus.FAILED)
+    ]
+    existing_news_ids = {news_id for _, news_id, _ in existing}
+
+    now = datetime.now()
+    inserts = [] if batch_id else [
+        {'news_id': news_id, 'generated_text': text, 'status': PostStatus.GENERATED, 'created_at': now}
+        for news_id, text in results.items()
+        if news_id not in existing_news_ids
+    ]
+
+    if updates:
+        session.execute(update(Post), updates)
+    if inserts:
+        session.execute(insert(Post), inserts)
+
+    skipped = len(existing) - len(updates)
+    if skipped:
+        logger.info(f"Пропущено постов с уже обработанным статусом: {skipped}")
+    return len(updates) + len(inserts)
+
+
+def select_news_for_batch(session: Session, news_items: List[NewsItem]) -> List[NewsItem]:
+    """
+    Оставляет новости, которые можно отправить в Batch API.
     
-    # Сохраняем имя источника до обработки
-    source_name = source.name
-    source_url = source.url
+    Пропускаются новости, посты которых уже сгенерированы, опубликованы
+    или ждут результата другого батча, чтобы не платить за генерацию дважды.
     
-    try:
-        parser: SiteParser
-        if 'habr' in source_name.lower() or 'habr' in (source_url or '').lower():
-            parser = HabrParser()
-        elif 'tproger' in source_name.lower() or 'tproger' in (source_url or '').lower():
-            from ai_bot.news_parser.sites import TProgerParser
-            parser = TProgerParser()
-        else:
-            logger.warning(f"Парсер для источника '{source_name}' не найден")
-            return 0
-        
-        logger.info(f"Парсинг новостей с источника: {source_name}")
-        news_items = parser.parse()
-        
-        if not news_items:
-            logger.warning(f"Не найдено новостей с источника: {source_name}")
-            return 0
-        
-        # Фильтруем новости без title
-        valid_news_items = [item for item in news_items if item.get('title')]
-        if len(valid_news_items) < len(news_items):
-            logger.warning(f"Отфильтровано {len(news_items) - len(valid_news_items)} новостей без заголовка")
-        
-        if not valid_news_items:
-            logger.warning(f"Все новости с источника '{source_name}' не имеют заголовка")
-            return 0
-        
-        saved = save_news_items(session, valid_news_items)
-        logger.info(f"Источник '{source_name}': сохранено {saved} новостей")
-        return saved
+    Args:
+        session: Сессия базы данных
+        news_items: Новости, запрошенные для генерации
         
-    except Exception as e:
-        logger.error(f"Ошибка при парсинге источника '{source_name}': {e}", exc_info=True)
-        session.rollback()
-        return 0
+    Returns:
+        Новости без поста или с постом NEW/FAILED, не закрепленным за батчем
+    """
+    busy_news_ids = set(session.scalars(
+        select(Post.news_id).where(
+            Post.news_id.in_([item.id for item in news_items]),
+            (Post.status.notin_((PostStatus.NEW, PostStatus.FAILED))) | (Post.batch_id.is_not(None))
+        )
+    ))
+    return [item for item in news_items if item.id not in busy_news_ids]
 
 
-def parse_telegram_source(session: Session, source: Source) -> int:
+def reserve_posts_for_batch(session: Session, news_ids: List[str], batch_id: str) -> None:
     """
-    Парсит новости из Telegram-канала.
+    Закрепляет посты новостей за батчем Batch API, чтобы их не сгенерировала обычная задача.
+    
+    Новостям без поста создаются посты NEW. Коммит выполняет вызывающий код.
+    
+    Args:
+        session: Сессия базы данных
+        news_ids: ID новостей, отправленных в батч
+        batch_id: ID батча OpenAI
+    """
+    session.execute(
+        update(Post)
+        .where(Post.news_id.in_(news_ids), Post.status.in_((PostStatus.NEW, PostStatus.FAILED)))
+        .values(batch_id=batch_id)
+    )
+    with_posts = set(session.scalars(select(Post.news_id).where(Post.news_id.in_(news_ids))))
+    now = datetime.now()
+    inserts = [
+        {'news_id': news_id, 'status': PostStatus.NEW, 'batch_id': batch_id, 'created_at': now}
+        for news_id in news_ids
+        if news_id not in with_posts
+    ]
+    if inserts:
+        session.execute(insert(Post), inserts)
+
+
+def release_batch_posts(session: Session, batch_id: str) -> int:
+    """
+    Снимает привязку к завершенному батчу с постов, для которых не пришел результат.
+    
+    Такие посты остаются NEW и будут сгенерированы обычной задачей. Коммит выполняет вызывающий код.
     
     Args:
         session: Сессия базы данных
-        source: Объект источника Telegram-канала
+        batch_id: ID батча OpenAI
         
     Returns:
-        Количество сохраненных новостей
+        Количество освобожденных постов
     """
-    if source.type != SourceType.TG or not source.enabled:
-        return 0
+    result = session.execute(
+        update(Post).where(Post.batch_id == batch_id).values(batch_id=None),
+        execution_options={'synchronize_session': False}
+    )
+    return result.rowcount
 
-    # Импортируем здесь чтобы избежать циклических импортов
-    from ai_bot.news_parser.telegram import parse_telegram_channel_sync
 
-    source_name = source.name
-    channel_username = source.url  # URL для TG источников - это username канала
+def get_site_parser(source_name: str, source_url: Optional[str]) -> Optional[SiteParser]:
+    """
+    Подбирает парсер для веб-источника по имени или URL.
+    
+    Args:
+        source_name: Имя источника
+        source_url: URL источника
+        
+    Returns:
+        Парсер сайта или None, если подходящего парсера нет
+    """
+    if 'habr' in source_name.lower() or 'habr' in (source_url or '').lower():
+        return HabrParser()
+    if 'tproger' in source_name.lower() or 'tproger' in (source_url or '').lower():
+        from ai_bot.news_parser.sites import TProgerParser
+        return TProgerParser()
 
-    if not channel_username:
-        logger.warning(f"Не указан username канала для источника: {source_name}")
-        return 0
+    logger.warning(f"Парсер для источника '{source_name}' не найден")
+    return None
 
-    try:
-        logger.info(f"Парсинг Telegram-канала: {channel_username}")
 
-        # Парсим канал (используем синхронную версию, которая создает свой event loop)
-        try:
-            news_items = parse_telegram_channel_sync(channel_username, limit=10)
-        except RuntimeError as e:
-            if "event loop" in str(e).lower():
-                logger.warning(f"Не удалось запустить парсинг Telegram (проблема с event loop): {e}")
-                logger.info("Попробуйте запустить парсинг через Celery задачу")
-                return 0
-            raise
-
-        if not news_items:
-            logger.warning(f"Не найдено новостей в канале: {channel_username}")
-            return 0
-
-        # Сохраняем новости
-        saved = save_news_items(session, news_items)
-        logger.info(f"Источник '{source_name}' ({channel_username}): сохранено {saved} новостей")
-        return saved
+def filter_valid_news(source_name: str, news_items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Отбрасывает новости без заголовка.
+    
+    Args:
+        source_name: Имя источника (для логов)
+        news_items: Список словарей с данными новостей
+        
+    Returns:
+        Список новостей с заголовком
+    """
+    if not news_items:
+        logger.warning(f"Не найдено новостей с источника: {source_name}")
+        return []
 
-    except Exception as e:
-        logger.error(f"Ошибка при парсинге Telegram-канала '{source_name}': {e}", exc_info=True)
-        session.rollback()
-        return 0
+    valid_news_items = [item for item in news_items if item.get('title')]
+    if len(valid_news_items) < len(news_items):
+        logger.warning(f"Отфильтровано {len(news_items) - len(valid_news_items)} новостей без заголовка")
+
+    if not valid_news_items:
+        logger.warning(f"Все новости с источника '{source_name}' не имеют заголовка")
+
+    return valid_news_items
 
 
 def is_advertisement(news_item: NewsItem) -> bool:
@@ -210,19 +309,39 @@ def is_advertisement(news_item: NewsItem) -> bool:
     Returns:
         True если новость является рекламой, False иначе
     """
-    from ai_bot.news_parser.base import BaseParser
-    
-    # Создаем временный экземпляр парсера для использования методов фильтрации
-    parser = BaseParser.__new__(BaseParser)  # Создаем без вызова __init__
-    
-    return parser.is_advertisement(
+    return _news_filter.is_advertisement(
         title=news_item.title,
         summary=news_item.summary,
         author=news_item.author
     )
 
 
-def filter_news_by_keywords(session: Session, news_item: NewsItem) -> bool:
+def load_keywords(session: Session) -> List[str]:
+    """
+    Загружает ключевые слова для фильтрации новостей.
+    
+    Список кэшируется в процессе на KEYWORDS_CACHE_TTL секунд: ключевые слова
+    меняются редко, а задачи генерации запускаются часто.
+    
+    Args:
+        session: Сессия базы данных
+        
+    Returns:
+        Список ключевых слов в нижнем регистре
+    """
+    global _keywords_cache
+    from ai_bot.db.models import Keyword
+
+    now = time.monotonic()
+    if _keywords_cache is not None and now - _keywords_cache[0] < KEYWORDS_CACHE_TTL:
+        return _keywords_cache[1]
+
+    keywords = [word.lower() for word in session.scalars(select(Keyword.word))]
+    _keywords_cache = (now, keywords)
+    return keywords
+
+
+def filter_news_by_keywords(session: Session, news_item: NewsItem, keywords: Optional[List[str]] = None) -> bool:
     """
     Фильтрует новость по ключевым словам.
     
@@ -232,44 +351,37 @@ def filter_news_by_keywords(session: Session, news_item: NewsItem) -> bool:
     Args:
         session: Сессия базы данных
         news_item: Объект новости для фильтрации
+        keywords: Заранее загруженные ключевые слова (см. load_keywords); если не переданы, загружаются из БД
         
     Returns:
         True если новость прошла фильтрацию, False иначе
     """
-    from ai_bot.db.models import Keyword
-    from ai_bot.news_parser.base import BaseParser
+    if keywords is None:
+        keywords = load_keywords(session)
 
-    # Сначала проверяем на рекламу - если это реклама, сразу отфильтровываем
-    if is_advertisement(news_item):
-        logger.info(f"Новость '{news_item.title}' отфильтрована как реклама")
-        return False
-
-    # Получаем все активные ключевые слова
-    keywords = session.query(Keyword).all()
+    # Логи ниже пишутся для каждой новости, поэтому форматирование отложено до обработчика
+    # Сначала дешевая проверка ключевых слов (один поиск по тексту): полный набор
+    # правил рекламы запускаем только для новостей, которые ее прошли
+    if keywords:
+        # Преобразуем новость в словарь для использования метода фильтрации
+        news_dict = {
+            'title': news_item.title,
+            'summary': news_item.summary,
+            'author': news_item.author
+        }
 
-    if not keywords:
+        # Используем метод фильтрации из BaseParser
+        if not _news_filter.filter_by_keywords(news_dict, keywords):
+            logger.info("Новость '%.50s' не прошла фильтрацию по ключевым словам", news_item.title)
+            return False
+    else:
         logger.warning("Нет ключевых слов для фильтрации - пропускаем все новости")
-        return True  # Если нет ключевых слов, пропускаем все
 
-    # Создаем временный экземпляр парсера для использования методов фильтрации
-    parser = BaseParser.__new__(BaseParser)
-    
-    # Преобразуем новость в словарь для использования метода фильтрации
-    news_dict = {
-        'title': news_item.title,
-        'summary': news_item.summary,
-        'author': news_item.author
-    }
-    
-    # Получаем список ключевых слов
-    keyword_words = [kw.word for kw in keywords]
-    
-    # Используем метод фильтрации из BaseParser
-    result = parser.filter_by_keywords(news_dict, keyword_words)
-    
-    if result:
-        logger.info(f"Новость '{news_item.title}' прошла фильтрацию по ключевым словам")
-    else:
-        logger.info(f"Новость '{news_item.title}' не прошла фильтрацию по ключевым словам")
-    
-    return result
+    # Реклама отфильтровывается даже при совпадении ключевых слов
+    if is_advertisement(news_item):
+        logger.info("Новость '%.50s' отфильтрована как реклама", news_item.title)
+        return False
+
+    if keywords:
+        logger.info("Новость '%.50s' прошла фильтрацию по ключевым словам", news_item.title)
+    return True
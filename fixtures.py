@@ -6,12 +6,54 @@
 import logging
 from datetime import datetime
 
+from sqlalchemy.dialects import postgresql, sqlite
+
 from ai_bot.db.db_manager import sync_session_factory
 from ai_bot.db.models import Source
 from ai_bot.db.models_utils import SourceType
 
 logger = logging.getLogger(__name__)
 
+# Начальные источники новостей
+SOURCES_FIXTURE: tuple[dict, ...] = (
+    {
+        'name': 'Habr',
+        'type': SourceType.SITE,
+        'url': 'https://habr.com/',
+        'enabled': True
+    },
+    {
+        'name': 'tproger',
+        'type': SourceType.SITE,
+        'url': 'https://tproger.ru/',
+        'enabled': False
+    },
+    # {
+    #     'name': 'Reddit',
+    #     'type': SourceType.SITE,
+    #     'url': 'https://www.reddit.com/',
+    #     'enabled': False
+    # },
+    {
+        'name': 'Free Gaming',
+        'type': SourceType.TG,
+        'url': '@free_gaming',
+        'enabled': True
+    },
+    {
+        'name': 'Varlamov',
+        'type': SourceType.TG,
+        'url': '@varlamov',
+        'enabled': False
+    },
+    {
+        'name': 'Ateo Breaking',
+        'type': SourceType.TG,
+        'url': '@Ateobreaking',
+        'enabled': False
+    }
+)
+
 
 def create_fixtures_sync():
     """
@@ -21,67 +63,22 @@ def create_fixtures_sync():
     """
     session = sync_session_factory()
     try:
-        sources_to_create = [
-            {
-                'name': 'Habr',
-                'type': SourceType.SITE,
-                'url': 'https://habr.com/',
-                'enabled': True
-            },
-            {
-                'name': 'tproger',
-                'type': SourceType.SITE,
-                'url': 'https://tproger.ru/',
-                'enabled': False
-            },
-            # {
-            #     'name': 'Reddit',
-            #     'type': SourceType.SITE,
-            #     'url': 'https://www.reddit.com/',
-            #     'enabled': False
-            # },
-            {
-                'name': 'Free Gaming',
-                'type': SourceType.TG,
-                'url': '@free_gaming',
-                'enabled': True
-            },
-            {
-                'name': 'Varlamov',
-                'type': SourceType.TG,
-                'url': '@varlamov',
-                'enabled': False
-            },
-            {
-                'name': 'Ateo Breaking',
-                'type': SourceType.TG,
-                'url': '@Ateobreaking',
-                'enabled': False
-            }
-        ]
-        
-        created_count = 0
-        skipped_count = 0
-        for source_data in sources_to_create:
-            existing = session.query(Source).filter(Source.name.ilike(f"%{source_data['name']}%")).first()
-            if existing:
-                logger.info(f"Источник '{source_data['name']}' уже существует: {existing.name} (id: {existing.id}, enabled: {existing.enabled})")
-                skipped_count += 1
-                continue
-            
-            source = Source(
-                type=source_data['type'],
-                name=source_data['name'],
-                url=source_data['url'],
-                enabled=source_data['enabled'],
-                created_at=datetime.now()
-            )
-            session.add(source)
-            created_count += 1
-            logger.info(f"Создан источник: {source.name} (id: {source.id}, enabled: {source.enabled})")
-        
+        # Один INSERT ... ON CONFLICT DO NOTHING: уже существующие источники (уникальный индекс
+        # по lower(name)) пропускает сама БД, без предварительной проверки SELECT
+        now = datetime.now()
+        dialect_insert = postgresql.insert if session.get_bind().dialect.name == 'postgresql' else sqlite.insert
+        created_names = set(session.scalars(
+            dialect_insert(Source).on_conflict_do_nothing().returning(Source.name),
+            [{**source_data, 'created_at': now} for source_data in SOURCES_FIXTURE]
+        ))
         session.commit()
-        logger.info(f"Создано источников: {created_count}, пропущено: {skipped_count}, всего: {len(sources_to_create)}")
+        
+        for source_data in SOURCES_FIXTURE:
+            if source_data['name'] in created_names:
+                logger.info(f"Создан источник: {source_data['name']} (enabled: {source_data['enabled']})")
+            else:
+                logger.info(f"Источник '{source_data['name']}' уже существует")
+        logger.info(f"Создано источников: {len(created_names)}, пропущено: {len(SOURCES_FIXTURE) - len(created_names)}, всего: {len(SOURCES_FIXTURE)}")
     except Exception as e:
         session.rollback()
         logger.error(f"Ошибка при создании фикстур: {e}", exc_info=True)
@@ -0,0 +1,27 @@
+"""Общие настройки тестов."""
+
+import os
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# Обязательные настройки без значений по умолчанию; для импорта достаточно заглушек
+os.environ.setdefault('PROXY_URL', 'http://localhost:3128')
+os.environ.setdefault('OPENAI_API_KEY', 'test')
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+
+@pytest.fixture
+def db_session():
+    """Сессия чистой SQLite БД в памяти со всеми таблицами и индексами моделей."""
+    from ai_bot.db.models import Base
+
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    session = sessionmaker(engine, expire_on_commit=False)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
@@ -0,0 +1,240 @@
+"""Тесты ограничителей параллельности, повторов и предохранителя AI клиента."""
+
+import asyncio
+
+import pytest
+
+from ai_bot.ai import backpressure
+from ai_bot.ai.backpressure import (
+    AIMDLimiter, CircuitBreaker, SlidingWindowLimiter, TransientProviderError, parse_duration, with_retry
+)
+
+
+class FakeClock:
+    """Управляемая замена time.monotonic."""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(backpressure.time, 'monotonic', fake)
+    return fake
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('20', 20.0),
+    ('1s', 1.0),
+    ('6m0s', 360.0),
+    ('250ms', 0.25),
+    ('1h2m', 3720.0),
+    (None, None),
+    ('', None),
+    ('soon', None),
+])
+def test_parse_duration(value, expected):
+    assert parse_duration(value) == expected
+
+
+def test_aimd_starts_from_half_of_max():
+    assert AIMDLimiter(c_min=1, c_max=32).concurrency == 16
+    assert AIMDLimiter(c_min=4, c_max=5).concurrency == 4
+    assert AIMDLimiter(c_max=32, initial=3).concurrency == 3
+
+
+def test_aimd_adjusts_limit_by_latency():
+    limiter = AIMDLimiter(c_min=1, c_max=4, alpha=1, beta=0.5, latency_target_ms=100, initial=2)
+
+    limiter.record_latency(0.05)
+    assert limiter.concurrency == 3
+    limiter.record_latency(0.05)
+    limiter.record_latency(0.05)
+    assert limiter.concurrency == 4  # Не выше c_max
+
+    limiter.record_latency(0.5)
+    assert limiter.concurrency == 2
+    for _ in range(5):
+        limiter.record_latency(0.5)
+    assert limiter.concurrency == 1  # Не ниже c_min
+
+
+def test_aimd_overload_decreases_and_pauses(clock):
+    limiter = AIMDLimiter(c_max=8, beta=0.5, initial=8)
+
+    limiter.record_overload(retry_after=5)
+
+    assert limiter.concurrency == 4
+    assert limiter._paused_until == clock.now + 5
+
+
+def test_aimd_pauses_when_rate_limit_almost_exhausted(clock):
+    limiter = AIMDLimiter()
+
+    limiter.update_from_headers({'x-ratelimit-remaining-requests': '50', 'x-ratelimit-limit-requests': '1000',
+                                 'x-ratelimit-reset-requests': '2s'})
+    assert limiter._paused_until == clock.now + 2
+
+    limiter = AIMDLimiter()
+    limiter.update_from_headers({'x-ratelimit-remaining-requests': '500', 'x-ratelimit-limit-requests': '1000',
+                                 'x-ratelimit-reset-requests': '2s'})
+    assert limiter._paused_until == 0.0
+
+
+def test_aimd_slot_is_released_on_exception():
+    limiter = AIMDLimiter(c_min=1, c_max=1, initial=1)
+
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            async with limiter.slot(measure_latency=False):
+                raise RuntimeError('provider failed')
+        assert limiter._in_flight == 0
+
+        # Слот снова доступен: следующий запрос не зависает
+        async with limiter.slot(measure_latency=False):
+            assert limiter._in_flight == 1
+
+    asyncio.run(asyncio.wait_for(scenario(), timeout=1))
+
+
+def test_aimd_slot_waits_for_free_slot():
+    limiter = AIMDLimiter(c_min=1, c_max=1, initial=1)
+    order = []
+
+    async def worker(name: str):
+        async with limiter.slot(measure_latency=False):
+            order.append(f'{name} start')
+            await asyncio.sleep(0.01)
+            order.append(f'{name} end')
+
+    async def scenario():
+        await asyncio.gather(worker('a'), worker('b'))
+
+    asyncio.run(asyncio.wait_for(scenario(), timeout=1))
+    assert order == ['a start', 'a end', 'b start', 'b end']
+
+
+def test_aimd_slot_without_latency_keeps_limit():
+    limiter = AIMDLimiter(c_max=8, initial=2, latency_target_ms=0)
+
+    async def scenario():
+        async with limiter.slot(measure_latency=False):
+            await asyncio.sleep(0.01)
+
+    asyncio.run(scenario())
+    assert limiter.concurrency == 2
+
+
+def test_sliding_window_waits_when_rpm_exhausted():
+    limiter = SlidingWindowLimiter(rpm=2)
+    limiter.WINDOW_SECONDS = 0.1
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        for _ in range(3):
+            await limiter.wait_if_throttled()
+        return loop.time() - started
+
+    assert asyncio.run(scenario()) >= 0.05
+    assert len(limiter._events) <= 2
+
+
+def test_sliding_window_counts_tokens():
+    limiter = SlidingWindowLimiter(tpm=100)
+
+    async def scenario():
+        # Одиночный запрос больше TPM пропускается, иначе он ждал бы вечно
+        await limiter.wait_if_throttled(500)
+        assert limiter._tokens == 500
+        return limiter._is_throttled(1)
+
+    assert asyncio.run(scenario())
+
+
+def test_with_retry_retries_until_success():
+    calls = []
+
+    @with_retry(retry_on=(TransientProviderError,), attempts=3, min_wait=0, max_wait=0)
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise TransientProviderError('overloaded')
+        return 'ok'
+
+    assert flaky() == 'ok'
+    assert len(calls) == 3
+
+
+def test_with_retry_gives_up_with_last_error():
+    calls = []
+
+    @with_retry(retry_on=(TransientProviderError,), attempts=3, min_wait=0, max_wait=0)
+    def always_fails():
+        calls.append(1)
+        raise TransientProviderError(f'attempt {len(calls)}')
+
+    with pytest.raises(TransientProviderError, match='attempt 3'):
+        always_fails()
+    assert len(calls) == 3
+
+
+def test_with_retry_does_not_retry_other_errors():
+    calls = []
+
+    @with_retry(retry_on=(TransientProviderError,), attempts=3, min_wait=0, max_wait=0)
+    def bad_request():
+        calls.append(1)
+        raise ValueError('bad request')
+
+    with pytest.raises(ValueError):
+        bad_request()
+    assert len(calls) == 1
+
+
+def test_with_retry_async():
+    calls = []
+
+    @with_retry(retry_on=(TransientProviderError,), attempts=2, min_wait=0, max_wait=0)
+    async def flaky():
+        calls.append(1)
+        raise TransientProviderError('overloaded')
+
+    assert asyncio.iscoroutinefunction(flaky)
+    with pytest.raises(TransientProviderError):
+        asyncio.run(flaky())
+    assert len(calls) == 2
+
+
+def test_circuit_breaker_opens_after_threshold(clock):
+    breaker = CircuitBreaker('test', fail_threshold=3, reset_timeout=60)
+
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == 'closed' and breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    assert not breaker.allow()
+
+
+def test_circuit_breaker_half_open_probe(clock):
+    breaker = CircuitBreaker('test', fail_threshold=1, reset_timeout=60)
+    breaker.record_failure()
+
+    clock.now += 60
+    assert breaker.state == 'half_open'
+    assert breaker.allow()
+
+    # Неудачная пробная попытка снова открывает предохранитель на reset_timeout
+    breaker.record_failure()
+    assert breaker.state == 'open'
+
+    clock.now += 60
+    breaker.record_success()
+    assert breaker.state == 'closed'
+    assert breaker.failures == 0
@@ -0,0 +1,99 @@
+"""Тесты кэша ответов LLM."""
+
+import threading
+
+from ai_bot.ai import cache as cache_module
+from ai_bot.ai.cache import LLMCache, MemoryCache
+
+
+class BrokenBackend:
+    """Хранилище, которое всегда падает (например, Redis недоступен)."""
+
+    def get(self, key):
+        raise ConnectionError('redis down')
+
+    def set(self, key, value, ttl=None):
+        raise ConnectionError('redis down')
+
+    def delete(self, key):
+        raise ConnectionError('redis down')
+
+    def clear(self):
+        raise ConnectionError('redis down')
+
+    def incr_stat(self, name):
+        raise ConnectionError('redis down')
+
+    def get_stats(self):
+        raise ConnectionError('redis down')
+
+
+def test_memory_cache_evicts_least_recently_used():
+    backend = MemoryCache(max_size=2)
+    backend.set('a', '1')
+    backend.set('b', '2')
+    backend.get('a')
+    backend.set('c', '3')
+
+    assert backend.get('a') == '1'
+    assert backend.get('b') is None
+    assert backend.get('c') == '3'
+
+
+def test_memory_cache_expires_by_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cache_module.time, 'monotonic', lambda: now[0])
+    backend = MemoryCache()
+    backend.set('a', '1', ttl=10)
+
+    now[0] += 9
+    assert backend.get('a') == '1'
+    now[0] += 2
+    assert backend.get('a') is None
+
+
+def test_memory_cache_is_thread_safe():
+    backend = MemoryCache(max_size=50)
+
+    def worker(n):
+        for i in range(500):
+            backend.set(f'{n}-{i}', 'value')
+            backend.get(f'{n}-{i - 1}')
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(backend._data) == 50
+
+
+def test_llm_cache_counts_hits_and_misses():
+    llm_cache = LLMCache(MemoryCache())
+    llm_cache.set('key', 'answer')
+
+    assert llm_cache.get('key') == 'answer'
+    assert llm_cache.get('other') is None
+    assert llm_cache.get_stats() == {'backend': 'MemoryCache', 'hits': 1, 'misses': 1}
+
+
+def test_llm_cache_swallows_backend_errors():
+    llm_cache = LLMCache(BrokenBackend())
+
+    llm_cache.set('key', 'answer')
+    assert llm_cache.get('key') is None
+    llm_cache.delete('key')
+    llm_cache.clear()
+    assert llm_cache.get_stats() == {'backend': 'BrokenBackend'}
+
+
+def test_make_key_depends_on_all_parameters():
+    base = ('gpt', 'instructions', 'prompt', 0.0, 500)
+    key = LLMCache.make_key(*base)
+
+    assert key == LLMCache.make_key(*base)
+    for index, value in enumerate(('other', 'other', 'other', 0.1, 100)):
+        changed = list(base)
+        changed[index] = value
+        assert LLMCache.make_key(*changed) != key
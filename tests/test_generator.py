@@ -0,0 +1,42 @@
+"""Тесты обработки текста постов."""
+
+from ai_bot.ai.generator import relink_post
+
+POST = (
+    "💻 Python 3.13 учится работать без GIL\n"
+    "\n"
+    "Вышла новая версия Python.\n"
+    "\n"
+    "Подробнее: https://habr.com/ru/articles/000001/\n"
+    "\n"
+    "А вы уже пробовали новую версию?\n"
+    "#python"
+)
+
+
+def test_relink_post_replaces_link():
+    text = relink_post(POST, 'https://tproger.ru/news/000002')
+
+    assert 'Подробнее: https://tproger.ru/news/000002\n' in text
+    assert 'habr.com' not in text
+    assert text.endswith('#python')
+
+
+def test_relink_post_replaces_link_on_last_line():
+    text = relink_post('Текст\n\nПодробнее: https://old.example', 'https://new.example')
+
+    assert text == 'Текст\n\nПодробнее: https://new.example'
+
+
+def test_relink_post_appends_missing_link():
+    text = relink_post('Текст поста\n', 'https://new.example')
+
+    assert text == 'Текст поста\n\nПодробнее: https://new.example'
+
+
+def test_relink_post_removes_link_without_url():
+    text = relink_post(POST, None)
+
+    assert 'Подробнее' not in text
+    assert '\n\n\n' not in text
+    assert 'Вышла новая версия Python.\n\nА вы уже пробовали новую версию?' in text
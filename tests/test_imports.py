@@ -0,0 +1,22 @@
+"""Smoke тест: основные модули приложения импортируются без ошибок."""
+
+import importlib
+
+import pytest
+
+
+@pytest.mark.parametrize('module_name', [
+    'ai_bot.utils',
+    'ai_bot.celery.tasks',
+    'ai_bot.api.endpoints',
+    'ai_bot.main',
+])
+def test_module_imports(module_name):
+    importlib.import_module(module_name)
+
+
+def test_news_filter_is_usable():
+    from ai_bot.utils import _news_filter
+
+    assert _news_filter.is_advertisement(title='Купить со скидкой', summary='')
+    assert _news_filter.filter_by_keywords({'title': 'Новости Python', 'summary': ''}, ['python'])
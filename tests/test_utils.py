@@ -0,0 +1,124 @@
+"""Тесты сохранения новостей и постов."""
+
+from ai_bot import utils
+from ai_bot.db.models import NewsItem, Post
+from ai_bot.db.models_utils import PostStatus
+from ai_bot.utils import save_generated_posts, save_news_items
+
+
+def news_data(n: int, **overrides) -> dict:
+    data = {
+        'source': 'habr',
+        'title': f'Новость {n}',
+        'summary': 'Описание',
+        'url': f'https://habr.com/ru/news/{n}/',
+        'author': 'habr',
+    }
+    data.update(overrides)
+    return data
+
+
+def add_news(session, news_id: str, status: PostStatus | None = PostStatus.NEW) -> None:
+    session.add(NewsItem(id=news_id, source='habr', title=f'Новость {news_id}', summary='',
+                         url=f'https://habr.com/{news_id}', author='habr'))
+    if status is not None:
+        session.add(Post(id=f'post-{news_id}', news_id=news_id, status=status, generated_text='old'))
+    session.commit()
+
+
+def post_of(session, news_id: str) -> Post:
+    session.expire_all()
+    return session.query(Post).filter(Post.news_id == news_id).one()
+
+
+def test_save_news_items_creates_news_and_posts(db_session):
+    saved = save_news_items(db_session, [news_data(1), news_data(2)])
+
+    assert saved == 2
+    assert db_session.query(NewsItem).count() == 2
+    assert {post.status for post in db_session.query(Post)} == {PostStatus.NEW}
+
+
+def test_save_news_items_skips_duplicates(db_session):
+    save_news_items(db_session, [news_data(1)])
+
+    saved = save_news_items(db_session, [
+        news_data(1),  # Уже в БД
+        news_data(2, url='https://habr.com/ru/news/1/'),  # Тот же URL
+        news_data(3, title='Новость 1'),  # Тот же заголовок
+        news_data(4),
+        news_data(4),  # Дубликат внутри пачки
+    ])
+
+    assert saved == 1
+    assert db_session.query(NewsItem).count() == 2
+
+
+def test_save_news_items_on_conflict_skips_concurrent_insert(db_session, monkeypatch):
+    save_news_items(db_session, [news_data(1)])
+    # Параллельная задача сохранила новость между проверкой дубликатов и вставкой
+    monkeypatch.setattr(utils, 'load_existing_keys', lambda session, items: (set(), set()))
+
+    saved = save_news_items(db_session, [news_data(1), news_data(2)])
+
+    assert saved == 1
+    assert db_session.query(NewsItem).count() == 2
+    assert db_session.query(Post).count() == 2
+
+
+def test_save_generated_posts_updates_only_pending_posts(db_session):
+    add_news(db_session, 'new', PostStatus.NEW)
+    add_news(db_session, 'failed', PostStatus.FAILED)
+    add_news(db_session, 'published', PostStatus.PUBLISHED)
+    add_news(db_session, 'no-post', None)
+
+    written = save_generated_posts(db_session, {
+        'new': 'text new', 'failed': 'text failed', 'published': 'text published', 'no-post': 'text no-post'
+    })
+    db_session.commit()
+
+    assert written == 3
+    for news_id in ('new', 'failed', 'no-post'):
+        post = post_of(db_session, news_id)
+        assert post.status == PostStatus.GENERATED
+        assert post.generated_text == f'text {news_id}'
+    published = post_of(db_session, 'published')
+    assert published.status == PostStatus.PUBLISHED
+    assert published.generated_text == 'old'
+
+
+def test_save_generated_posts_for_batch_touches_only_reserved_posts(db_session):
+    add_news(db_session, 'reserved', PostStatus.NEW)
+    add_news(db_session, 'other', PostStatus.NEW)
+    add_news(db_session, 'no-post', None)
+    db_session.query(Post).filter(Post.news_id == 'reserved').update({'batch_id': 'batch-1'})
+    db_session.commit()
+
+    written = save_generated_posts(db_session, {'reserved': 'a', 'other': 'b', 'no-post': 'c'}, batch_id='batch-1')
+    db_session.commit()
+
+    assert written == 1
+    reserved = post_of(db_session, 'reserved')
+    assert reserved.status == PostStatus.GENERATED
+    assert reserved.batch_id is None
+    assert post_of(db_session, 'other').status == PostStatus.NEW
+    assert db_session.query(Post).filter(Post.news_id == 'no-post').count() == 0
+
+
+def test_chunked_query_yields_all_rows_across_commits(db_session, monkeypatch):
+    from ai_bot.celery import tasks
+
+    monkeypatch.setattr(tasks, 'PENDING_CHUNK_SIZE', 2)
+    for n in range(5):
+        add_news(db_session, f'n{n}', PostStatus.NEW)
+
+    posts = tasks._ChunkedQuery(db_session.query(Post).filter(Post.status == PostStatus.NEW))
+    seen = []
+    for post in posts:
+        seen.append(post.id)
+        # Задачи меняют статус и коммитят внутри цикла: строки не должны пропускаться
+        post.status = PostStatus.GENERATED
+        db_session.commit()
+
+    assert seen == sorted(f'post-n{n}' for n in range(5))
+    assert posts.processed == 5